@@ -6,6 +6,7 @@ import sys
 import json
 import requests
 from pprint import pprint
+from storage import upsert_rows
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 PARAM_DB = 'src/parameter.db'
@@ -125,7 +126,8 @@ def display_proposed_analysis(dataframe, json_file: str):
         print(f"Error reading {json_file}: {e}")
 
 # Function 5: Save to DuckDB
-def save_df_tofile(dataframe: pd.DataFrame, parameters: dict):
+def save_df_tofile(dataframe: pd.DataFrame, parameters: dict, upsert: bool = False, key: str = 'transaction_id'):
+    """Save the analyzed DataFrame; with upsert=True rows are added to the table keyed on key instead of replacing it"""
     try:
         with duckdb.connect(ANALYZED_DB) as con:
             columns = dataframe.columns.tolist()
@@ -142,10 +144,15 @@ def save_df_tofile(dataframe: pd.DataFrame, parameters: dict):
                     column_definitions.append(f"{col} BOOLEAN")
                 else:
                     column_definitions.append(f"{col} VARCHAR")
+            if upsert and key in columns:
+                con.execute(f"CREATE TABLE IF NOT EXISTS {ANALYZED_TABLE} ({', '.join(column_definitions)})")
+                inserted, skipped = upsert_rows(con, ANALYZED_TABLE, dataframe, key=key)
+                print(f"✅ {inserted:,} new rows saved to {ANALYZED_TABLE}, {skipped:,} already present")
+                return
             con.execute(f"CREATE OR REPLACE TABLE {ANALYZED_TABLE} ({', '.join(column_definitions)})")
-            data_tuples = [tuple(row.tolist()) for _, row in dataframe.iterrows()]
-            placeholders = ', '.join(['?' for _ in columns])
-            con.executemany(f"INSERT INTO {ANALYZED_TABLE} ({', '.join(columns)}) VALUES ({placeholders})", data_tuples)
+            con.register('analyzed_df', dataframe)
+            con.execute(f"INSERT INTO {ANALYZED_TABLE} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM analyzed_df")
+            con.unregister('analyzed_df')
     except Exception as e:
         print(f"Error saving DataFrame to database: {e}")
 
@@ -1,11 +1,23 @@
-from fastapi import FastAPI, HTTPException, Query, Path
-from fastapi.responses import RedirectResponse
+from fastapi import Depends, FastAPI, HTTPException, Query, Path
+from fastapi.responses import RedirectResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List
-import duckdb
+from typing import Literal, Optional, List
+import base64
+import binascii
+import json
+import os
 import uvicorn
+from contextlib import asynccontextmanager
 from datetime import datetime
 
+from connection_pool import DEFAULT_POOL_SIZE, RELEASE_AFTER, ReadOnlyPool
+from exports import EXPORT_FORMATS, arrow_available, iter_export
+from query_router import TIME_GRAINS, plan_query, report_plan
+from result_cache import DEFAULT_CACHE_MB, ResultCache, cached_endpoint, file_version
+from sql_filters import SALES_FACT_FILTERS, compile_filters, execute
+from json_results import SALE_JSON_COLUMNS, fetch_json, json_document, json_response
+from storage import SALES_DATA_SELECT_SQL, last_write, read_table_stats
+
 class Customer(BaseModel):
     customer_id: Optional[str]
     age: Optional[int]
@@ -39,10 +51,11 @@ class Sale(BaseModel):
     income: Optional[float]
 
 class SalesResponse(BaseModel):
-    total_records: int
+    total_records: Optional[int] = None
     page: int
     page_size: int
     sales: List[Sale]
+    next_cursor: Optional[str] = None
 
 class SalesSummary(BaseModel):
     total_records: int
@@ -52,6 +65,8 @@ class SalesSummary(BaseModel):
     date_range_start: str
     date_range_end: str
     top_products: List[dict]
+    # Fields that are estimates (HyperLogLog, ~0.8% error) rather than exact counts
+    approximate: List[str] = []
 
 class ProductSales(BaseModel):
     product_id: str
@@ -107,15 +122,159 @@ class IncomeLevelAnalysis(BaseModel):
     avg_transaction_value: float
     avg_spent_per_customer: float
 
+DB_PATH = 'src/sales_timeseries.db'
+
+# One read-only instance shared by the requests, which borrow cursors from it. It stays
+# open, keeping its cache warm; with APP_DB_RELEASE_AFTER set it is closed after that many
+# idle seconds so writers can get the file lock. Size, threads and memory limit can be set
+# with the other APP_DB_* environment variables.
+db_pool = ReadOnlyPool(
+    DB_PATH,
+    size=int(os.environ.get('APP_DB_POOL_SIZE', DEFAULT_POOL_SIZE)),
+    threads=int(os.environ['APP_DB_THREADS']) if os.environ.get('APP_DB_THREADS') else None,
+    memory_limit=os.environ.get('APP_DB_MEMORY_LIMIT'),
+    release_after=float(os.environ['APP_DB_RELEASE_AFTER']) if os.environ.get('APP_DB_RELEASE_AFTER') else RELEASE_AFTER,
+)
+
+# Aggregation results are cached per data version; APP_CACHE_DIR adds an on-disk tier
+result_cache = ResultCache(
+    max_bytes=int(os.environ.get('APP_CACHE_MB', DEFAULT_CACHE_MB)) * 1024 * 1024,
+    disk_dir=os.environ.get('APP_CACHE_DIR') or None,
+)
+
+# Last append time read for each database, with the file version it was read at
+_last_writes = {}
+
+def data_version(con=None):
+    """Changes whenever sales are appended (table_stats.updated_at) or the database file is rewritten.
+
+    Without con, a file unchanged since the last read reuses that read's append
+    time, so a cache hit does not reopen a released pool.
+    """
+    path = db_pool.db_path
+    version = file_version(path)
+    seen = _last_writes.get(path)
+    if con is None:
+        if seen is not None and seen[0] == version:
+            return (path, version, seen[1])
+        with get_db_connection() as con:
+            return data_version(con)
+    write = last_write(con)
+    _last_writes[path] = (version, write)
+    return (path, version, write)
+
+def sales_filters(
+    start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format", examples=["2024-01-01"]),
+    end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format", examples=["2024-12-31"]),
+    product_id: Optional[str] = Query(None, description="Filter by product ID", examples=["100"]),
+    customer_id: Optional[str] = Query(None, description="Filter by customer ID", examples=["C001"]),
+    min_age: Optional[int] = Query(None, ge=18, le=100, description="Minimum customer age", examples=[25]),
+    max_age: Optional[int] = Query(None, ge=18, le=100, description="Maximum customer age", examples=[65])
+) -> dict:
+    """Filter query parameters shared by /sales/ and /sales/export, validated for SALES_FACT_FILTERS"""
+    # Validate date formats if provided
+    if start_date:
+        try:
+            datetime.strptime(start_date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(
+                status_code=400, 
+                detail="Invalid start_date format. Please use YYYY-MM-DD format (e.g., 2024-01-01)"
+            )
+    
+    if end_date:
+        try:
+            datetime.strptime(end_date, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(
+                status_code=400, 
+                detail="Invalid end_date format. Please use YYYY-MM-DD format (e.g., 2024-12-31)"
+            )
+
+    return {'start_date': start_date, 'end_date': end_date, 'product_id': product_id,
+            'customer_id': customer_id, 'min_age': min_age, 'max_age': max_age}
+
+def encode_cursor(date, transaction_id, row_key) -> str:
+    """Opaque keyset cursor for the row (date, transaction_id, rowid); a NULL date or id is kept as null"""
+    date = None if date is None else str(date)
+    transaction_id = None if transaction_id is None else int(transaction_id)
+    return base64.urlsafe_b64encode(json.dumps([date, transaction_id, int(row_key)]).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    """(date, transaction_id, rowid) of a cursor made by encode_cursor; ValueError if it is malformed"""
+    try:
+        date, transaction_id, row_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if date is not None:
+            datetime.fromisoformat(date)
+        return date, None if transaction_id is None else int(transaction_id), int(row_key)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+def keyset_after(cursor: tuple) -> tuple:
+    """(SQL condition, params) on sales_fact for the rows after cursor in SALES_PAGE_ORDER"""
+    date, transaction_id, row_key = cursor
+    if transaction_id is None:
+        same_date, params = "transaction_id IS NULL AND rowid < ?", [row_key]
+    else:
+        same_date = "transaction_id < ? OR transaction_id IS NULL OR (transaction_id = ? AND rowid < ?)"
+        params = [transaction_id, transaction_id, row_key]
+    if date is None:
+        return f"(date IS NOT NULL OR (date IS NULL AND ({same_date})))", params
+    return f"(date < CAST(? AS TIMESTAMP) OR (date = CAST(? AS TIMESTAMP) AND ({same_date})))", [date, date] + params
+
+# Order of /sales/ pages. NULL dates (possible after a CSV load) sort first and NULL ids
+# last; rowid breaks the ties between them, so every row is reachable and counted
+SALES_PAGE_ORDER = "date DESC NULLS FIRST, transaction_id DESC NULLS LAST, {rowid} DESC"
+
+# Customer fields as the API has always returned them
+CUSTOMER_JSON_COLUMNS = [
+    ('customer_id', 'CAST(customer_id AS VARCHAR)'),
+    ('age', 'age'),
+    ('country', 'country'),
+]
+CUSTOMER_SUMMARY_JSON_COLUMNS = CUSTOMER_JSON_COLUMNS + [
+    ('total_sales', 'total_sales'),
+    ('total_amount', 'CAST(total_amount_cents / 100 AS DOUBLE)'),
+]
+CUSTOMER_PAGE_MAX = 10000
+
+def customer_page(select: list, columns: list, page_size: int, after: Optional[int], layout: str):
+    """One keyset page of customer_summary rendered as JSON, with X-Next-Cursor unless it is the last page"""
+    try:
+        with get_db_connection() as con:
+            # customer_summary is stored in customer_id order, so zone maps skip the rows before the cursor
+            where_clause = " WHERE customer_id > ?" if after is not None else ""
+            query = f"""
+                SELECT {', '.join(select)} FROM customer_summary{where_clause}
+                ORDER BY customer_id
+                LIMIT {page_size}
+            """
+            customers_json, rows, last_id = fetch_json(
+                con, query, [after] if after is not None else None, columns, layout,
+                order_by="customer_id", extra=["MAX(customer_id)"]
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    headers = {'X-Next-Cursor': str(last_id)} if rows == page_size else None
+    return json_response(customers_json, headers)
+
 # Database connection helper
 def get_db_connection():
-    return duckdb.connect('src/sales_timeseries.db', read_only=True)
+    """Pooled read-only cursor for one request, returned to the pool when the with-block ends"""
+    return db_pool.cursor()
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # Release the database file when the server stops
+    db_pool.close()
 
 def main():
     app = FastAPI(
         title="Retail Sales API",
         description="API for retail sales time series data",
-        version="1.0.0"
+        version="1.0.0",
+        lifespan=lifespan
     )
 
     @app.get("/", tags=["Root"])
@@ -127,228 +286,208 @@ def main():
     def get_sales(
         page: int = Query(1, ge=1, description="Page number"),
         page_size: int = Query(50, ge=1, le=1000, description="Items per page"),
-        start_date: Optional[str] = Query(None, description="Start date in YYYY-MM-DD format", examples=["2024-01-01"]),
-        end_date: Optional[str] = Query(None, description="End date in YYYY-MM-DD format", examples=["2024-12-31"]),
-        product_id: Optional[str] = Query(None, description="Filter by product ID", examples=["P001"]),
-        customer_id: Optional[str] = Query(None, description="Filter by customer ID", examples=["C001"]),
-        min_age: Optional[int] = Query(None, ge=18, le=100, description="Minimum customer age", examples=[25]),
-        max_age: Optional[int] = Query(None, ge=18, le=100, description="Maximum customer age", examples=[65])
+        filters: dict = Depends(sales_filters),
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page; pages after it without OFFSET"),
+        include_total: bool = Query(False, description="Also return the number of matching records"),
+        layout: Literal['rows', 'columns'] = Query('rows', alias='format', description="rows: list of sales; columns: one list per field")
     ):
         """
         Get sales data with pagination and filtering
         
         Args:
-            page: Page number (starts from 1)
+            page: Page number (starts from 1); ignored when cursor is given
             page_size: Number of items per page (1-1000)
-            start_date: Start date filter in YYYY-MM-DD format
-            end_date: End date filter in YYYY-MM-DD format
-            product_id: Filter by specific product ID (P001, P002, etc.)
-            customer_id: Filter by specific customer ID
-            min_age: Minimum customer age filter (18-100)
-            max_age: Maximum customer age filter (18-100)
+            filters: start_date, end_date, product_id, customer_id, min_age, max_age (see sales_filters)
+            cursor: Opaque keyset cursor from next_cursor; constant cost at any depth
+            include_total: Return total_records (from table_stats, or a cached count when filtered)
+            format: 'rows' (list of sale objects) or 'columns' (field name -> list of values)
             
         Returns:
-            Paginated sales data with filtering applied
+            Paginated sales data with filtering applied, newest first
         """
-        # Validate date formats if provided
-        if start_date:
+        after = None
+        if cursor:
             try:
-                datetime.strptime(start_date, "%Y-%m-%d")
+                after = decode_cursor(cursor)
             except ValueError:
-                raise HTTPException(
-                    status_code=400, 
-                    detail="Invalid start_date format. Please use YYYY-MM-DD format (e.g., 2024-01-01)"
-                )
-        
-        if end_date:
-            try:
-                datetime.strptime(end_date, "%Y-%m-%d")
-            except ValueError:
-                raise HTTPException(
-                    status_code=400, 
-                    detail="Invalid end_date format. Please use YYYY-MM-DD format (e.g., 2024-12-31)"
-                )
+                raise HTTPException(status_code=400, detail="Invalid cursor. Use the next_cursor value of a previous page")
         
         try:
             with get_db_connection() as con:
-                # Build WHERE clause
-                where_conditions = []
-                if start_date:
-                    where_conditions.append(f"date >= '{start_date}'")
-                if end_date:
-                    where_conditions.append(f"date <= '{end_date}'")
-                if product_id:
-                    where_conditions.append(f"product_id = '{product_id}'")
-                if customer_id:
-                    where_conditions.append(f"customer_id = '{customer_id}'")
-                if min_age:
-                    where_conditions.append(f"age >= {min_age}")
-                if max_age:
-                    where_conditions.append(f"age <= {max_age}")
-                
-                where_clause = " WHERE " + " AND ".join(where_conditions) if where_conditions else ""
-                
-                # Get total count
-                count_query = f"SELECT COUNT(*) FROM sales_data{where_clause}"
-                total_records = con.execute(count_query).fetchone()[0]
-                
-                # Get paginated data
+                # WHERE clause on sales_fact with bound values; dimension filters become key semi-joins
+                filter_clause, filter_params = compile_filters(SALES_FACT_FILTERS, filters)
+
+                # Total only on request: O(1) from table_stats when unfiltered, else a count cached per data version
+                total_records = None
+                if include_total:
+                    stats = None if filter_clause else read_table_stats(con)
+                    if stats is not None:
+                        total_records = stats['row_count']
+                    else:
+                        count_query = f"SELECT COUNT(*) FROM sales_fact{filter_clause}"
+                        total_records = result_cache.get_or_compute(
+                            ('/sales/count', filter_clause, tuple(filter_params), data_version(con)),
+                            lambda: execute(con, count_query, filter_params).fetchone()[0]
+                        )
+
+                # Keyset pagination: continue strictly after the cursor's (date, transaction_id, rowid)
+                where_clause, params = filter_clause, list(filter_params)
                 offset = (page - 1) * page_size
+                if after is not None:
+                    keyset, keyset_params = keyset_after(after)
+                    where_clause += (" AND " if where_clause else " WHERE ") + keyset
+                    params += keyset_params
+                    offset = 0
+
+                # Pick the page on sales_fact alone (top-N with zone-map pruning), then join the dimensions
+                # to its rows; row_key carries each row's rowid through the join for the cursor
+                page_query = SALES_DATA_SELECT_SQL.format(fact='page').replace("SELECT", "SELECT f.row_key,", 1)
                 data_query = f"""
-                    SELECT 
-                        date, transaction_id, transaction_desc, customer_id, age, gender,
-                        receipt_number, product_id, product_name, units_sold, 
-                        unit_price_sgd, total_amount_per_product_sgd, receipt_total_sgd,
-                        country_id, country, city, income
-                    FROM sales_data{where_clause}
-                    ORDER BY date DESC
-                    LIMIT {page_size} OFFSET {offset}
-                """
-                
-                results = con.execute(data_query).fetchall()
-                
-                # Convert to list of Sale objects
-                sales = []
-                for row in results:
-                    sale = Sale(
-                        date=str(row[0]) if row[0] is not None else None,
-                        transaction_id=str(row[1]) if row[1] is not None else None,
-                        transaction_desc=str(row[2]) if row[2] is not None else None,
-                        customer_id=str(row[3]) if row[3] is not None else None,
-                        age=int(row[4]) if row[4] is not None else None,
-                        gender=str(row[5]) if row[5] is not None else None,
-                        receipt_number=str(row[6]) if row[6] is not None else None,
-                        product_id=str(row[7]) if row[7] is not None else None,
-                        product_name=str(row[8]) if row[8] is not None else None,
-                        units_sold=int(row[9]) if row[9] is not None else None,
-                        unit_price_sgd=float(row[10]) if row[10] is not None else None,
-                        total_amount_per_product_sgd=float(row[11]) if row[11] is not None else None,
-                        receipt_total_sgd=float(row[12]) if row[12] is not None else None,
-                        country_id=str(row[13]) if row[13] is not None else None,
-                        country=str(row[14]) if row[14] is not None else "Unknown",
-                        city=str(row[15]) if row[15] is not None else None,
-                        income=float(row[16]) if row[16] is not None else None
+                    WITH page AS (
+                        SELECT *, rowid AS row_key FROM sales_fact{where_clause}
+                        ORDER BY {SALES_PAGE_ORDER.format(rowid='rowid')}
+                        LIMIT {page_size} OFFSET {offset}
                     )
-                    sales.append(sale)
-                
-                return SalesResponse(
-                    total_records=total_records,
-                    page=page,
-                    page_size=page_size,
-                    sales=sales
+                    {page_query}
+                """
+
+                # DuckDB renders the page as JSON along with its last (date, transaction_id, rowid)
+                order = SALES_PAGE_ORDER.format(rowid='row_key')
+                sales_json, rows, last = fetch_json(
+                    con, data_query, params, SALE_JSON_COLUMNS, layout, order_by=order,
+                    extra=[f"LAST({{'date': date, 'transaction_id': transaction_id, 'row_key': row_key}} ORDER BY {order})"]
                 )
+
+                next_cursor = None
+                if rows == page_size:
+                    next_cursor = encode_cursor(last['date'], last['transaction_id'], last['row_key'])
+
+                return json_response(json_document(
+                    {'total_records': total_records, 'page': page, 'page_size': page_size, 'next_cursor': next_cursor},
+                    {'sales': sales_json}
+                ))
                 
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    @app.get("/sales/export", tags=["Sales"])
+    def export_sales(
+        fmt: Literal['ndjson', 'arrow', 'csv', 'parquet'] = Query('ndjson', alias='format', description="ndjson, arrow (IPC stream), csv (gzip) or parquet"),
+        filters: dict = Depends(sales_filters)
+    ):
+        """
+        Stream every sale matching the /sales/ filters as one download
+        
+        The result is produced in record batches of EXPORT_BATCH_ROWS, so memory
+        stays bounded however many rows match.
+        """
+        if fmt == 'arrow' and not arrow_available():
+            raise HTTPException(status_code=501, detail="Arrow export requires pyarrow; use format=parquet or ndjson")
+        where_clause, params = compile_filters(SALES_FACT_FILTERS, filters)
+        query = SALES_DATA_SELECT_SQL.format(fact=f"(SELECT * FROM sales_fact{where_clause})")
+        media_type, extension = EXPORT_FORMATS[fmt]
+        return StreamingResponse(
+            iter_export(get_db_connection, query, params, fmt),
+            media_type=media_type,
+            headers={'Content-Disposition': f'attachment; filename="sales.{extension}"'}
+        )
+
     @app.get("/customers/", response_model=List[Customer], tags=["Customers"])
-    def get_customers():
-        """Get list of unique customers"""
-        try:
-            with get_db_connection() as con:
-                # Get unique customers only
-                query = """
-                    SELECT DISTINCT 
-                        customer_id,
-                        age,
-                        country
-                    FROM sales_data 
-                    ORDER BY customer_id
-                """
-                results = con.execute(query).fetchall()
-                customers = []
-                for row in results:
-                    customer = Customer(
-                        customer_id=str(row[0]) if row[0] is not None else None,
-                        age=int(row[1]) if row[1] is not None else None,
-                        country=str(row[2]) if row[2] is not None else None
-                    )
-                    customers.append(customer)
-                return customers
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    def get_customers(
+        page_size: int = Query(1000, ge=1, le=CUSTOMER_PAGE_MAX, description="Customers per page"),
+        after: Optional[int] = Query(None, description="X-Next-Cursor of the previous page: list customers after this customer_id"),
+        layout: Literal['rows', 'columns'] = Query('rows', alias='format', description="rows: list of customers; columns: one list per field")
+    ):
+        """
+        Get one page of unique customers, ordered by customer_id
+
+        The next page starts after the X-Next-Cursor response header, which is
+        missing on the last page. Use /customers/export for all of them at once.
+        """
+        return customer_page(["customer_id", "age", "country"], CUSTOMER_JSON_COLUMNS, page_size, after, layout)
 
     @app.get("/customers/summary/", response_model=List[CustomerSummary], tags=["Customers"])
-    def get_customers_summary():
-        """Get customer summary with total sales and amount"""
-        try:
-            with get_db_connection() as con:
-                query = """
-                    SELECT 
-                        customer_id,
-                        age,
-                        country,
-                        COUNT(*) as total_sales,
-                        SUM(total_amount_per_product_sgd) as total_amount
-                    FROM sales_data 
-                    GROUP BY customer_id, age, country
-                    ORDER BY customer_id
-                """
-                results = con.execute(query).fetchall()
-                customers = []
-                for row in results:
-                    customer = CustomerSummary(
-                        customer_id=str(row[0]) if row[0] is not None else None,
-                        age=int(row[1]) if row[1] is not None else None,
-                        country=str(row[2]) if row[2] is not None else None,
-                        total_sales=int(row[3]) if row[3] is not None else 0,
-                        total_amount=float(row[4]) if row[4] is not None else 0.0
-                    )
-                    customers.append(customer)
-                return customers
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    def get_customers_summary(
+        page_size: int = Query(1000, ge=1, le=CUSTOMER_PAGE_MAX, description="Customers per page"),
+        after: Optional[int] = Query(None, description="X-Next-Cursor of the previous page: list customers after this customer_id"),
+        layout: Literal['rows', 'columns'] = Query('rows', alias='format', description="rows: list of customers; columns: one list per field")
+    ):
+        """Get one page of customers with total sales and amount, paged like /customers/"""
+        return customer_page(
+            ["customer_id", "age", "country", "total_sales", "total_amount_cents"],
+            CUSTOMER_SUMMARY_JSON_COLUMNS, page_size, after, layout
+        )
+
+    @app.get("/customers/export", tags=["Customers"])
+    def export_customers(
+        fmt: Literal['ndjson', 'arrow', 'csv', 'parquet'] = Query('ndjson', alias='format', description="ndjson, arrow (IPC stream), csv (gzip) or parquet")
+    ):
+        """Stream every customer with their totals and first/last sale, ordered by customer_id"""
+        if fmt == 'arrow' and not arrow_available():
+            raise HTTPException(status_code=501, detail="Arrow export requires pyarrow; use format=parquet or ndjson")
+        query = """
+            SELECT
+                customer_id, age, country, total_sales,
+                CAST(total_amount_cents / 100 AS DECIMAL(18,2)) AS total_amount,
+                first_date, last_date
+            FROM customer_summary
+            ORDER BY customer_id
+        """
+        media_type, extension = EXPORT_FORMATS[fmt]
+        return StreamingResponse(
+            iter_export(get_db_connection, query, None, fmt),
+            media_type=media_type,
+            headers={'Content-Disposition': f'attachment; filename="customers.{extension}"'}
+        )
 
     @app.get("/summary/", response_model=SalesSummary, tags=["Analytics"])
+    @cached_endpoint(result_cache, "/summary/", data_version)
     def get_sales_summary():
         """Get overall sales summary statistics"""
         try:
             with get_db_connection() as con:
-                # Basic statistics
+                # Basic statistics: O(1) from table_stats, full scan only for databases without it
+                stats = read_table_stats(con)
                 summary_query = """
                     SELECT 
                         COUNT(*) as total_records,
-                        SUM(total_amount_per_product_sgd) as total_revenue,
+                        SUM(total_amount_cents) / 100.0 as total_revenue,
                         COUNT(DISTINCT customer_id) as unique_customers,
                         COUNT(DISTINCT receipt_number) as unique_receipts,
                         MIN(date) as date_start,
                         MAX(date) as date_end
-                    FROM sales_data
+                    FROM sales_fact
                 """
-                summary_result = con.execute(summary_query).fetchone()
+                approximate = []
+                if stats is not None:
+                    summary_result = (stats['row_count'], stats['revenue_cents'] / 100, stats['unique_customers'],
+                                      stats['unique_receipts'], stats['min_date'], stats['max_date'])
+                    approximate = ['unique_customers', 'unique_receipts']
+                else:
+                    summary_result = con.execute(summary_query).fetchone()
                 
-                # Top products
-                top_products_query = """
-                    SELECT 
-                        product_id,
-                        product_name,
-                        SUM(units_sold) as total_units,
-                        SUM(total_amount_per_product_sgd) as total_revenue,
-                        AVG(unit_price_sgd) as avg_price
-                    FROM sales_data
-                    GROUP BY product_id, product_name
-                    ORDER BY total_revenue DESC
-                    LIMIT 10
-                """
-                top_products_results = con.execute(top_products_query).fetchall()
+                # Top products, from the smallest aggregate that has them
+                plan = report_plan(con, 'top_products')
+                top_products_results = execute(con, plan.sql, plan.params).fetchmany(10)
                 
                 top_products = []
                 for row in top_products_results:
                     top_products.append({
-                        "product_id": row[0],
+                        "product_id": str(row[0]),
                         "product_name": row[1],
-                        "total_units": int(row[2]),
-                        "total_revenue": float(row[3]),
-                        "avg_price": float(row[4])
+                        "total_units": int(row[3]),
+                        "total_revenue": float(row[4]),
+                        "avg_price": float(row[5])
                     })
                 
                 return SalesSummary(
                     total_records=int(summary_result[0]),
-                    total_revenue=float(summary_result[1]),
+                    total_revenue=float(summary_result[1] or 0),
                     unique_customers=int(summary_result[2]),
                     unique_receipts=int(summary_result[3]),
                     date_range_start=str(summary_result[4]),
                     date_range_end=str(summary_result[5]),
-                    top_products=top_products
+                    top_products=top_products,
+                    approximate=approximate
                 )
                 
         except Exception as e:
@@ -359,25 +498,13 @@ def main():
         """Top Products by Revenue - Shows the best-selling products with sales metrics"""
         try:
             with get_db_connection() as con:
-                query = """
-                    SELECT 
-                        product_id,
-                        product_name,
-                        COUNT(*) AS transaction_count,
-                        SUM(units_sold) AS total_units_sold,
-                        SUM(total_amount_per_product_sgd) AS total_revenue,
-                        AVG(unit_price_sgd) AS avg_price
-                    FROM sales_data
-                    GROUP BY product_id, product_name
-                    ORDER BY total_revenue DESC
-                    LIMIT 20
-                """
-                results = con.execute(query).fetchall()
+                plan = report_plan(con, 'top_products')
+                results = execute(con, plan.sql, plan.params).fetchall()
                 
                 products = []
                 for row in results:
                     product = ProductSales(
-                        product_id=row[0],
+                        product_id=str(row[0]),
                         product_name=row[1],
                         total_units_sold=int(row[3]),
                         total_revenue=float(row[4]),
@@ -391,57 +518,13 @@ def main():
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
     @app.get("/analytics/monthly-trends/", response_model=List[MonthlySalesTrend], tags=["Analytics"])
+    @cached_endpoint(result_cache, "/analytics/monthly-trends/", data_version)
     def get_monthly_sales_trends():
-        """Monthly Sales Trends - Shows revenue and customer trends by month with growth percentages"""
+        """Monthly Sales Trends - Shows revenue and customer trends by month with growth percentages (customer counts are HyperLogLog estimates)"""
         try:
             with get_db_connection() as con:
-                query = """
-                    WITH monthly_sales AS (
-                        SELECT 
-                            DATE_TRUNC('month', date) AS month,
-                            SUM(total_amount_per_product_sgd) AS revenue,
-                            COUNT(DISTINCT customer_id) AS customers
-                        FROM sales_data
-                        GROUP BY DATE_TRUNC('month', date)
-                        ORDER BY month
-                    ),
-                    with_prev AS (
-                        SELECT 
-                            month, 
-                            revenue,
-                            customers,
-                            LAG(revenue) OVER (ORDER BY month) AS prev_revenue,
-                            LAG(customers) OVER (ORDER BY month) AS prev_customers
-                        FROM monthly_sales
-                    )
-                    SELECT 
-                        month,
-                        revenue,
-                        customers,
-                        prev_revenue,
-                        prev_customers,
-                        CASE 
-                            WHEN prev_revenue IS NULL THEN NULL
-                            WHEN prev_revenue = 0 THEN 
-                                CASE 
-                                    WHEN revenue = 0 THEN 0
-                                    ELSE 100 -- from zero to something is 100% growth
-                                END
-                            ELSE ((revenue - prev_revenue) / prev_revenue) * 100 
-                        END AS revenue_change_pct,
-                        CASE
-                            WHEN prev_customers IS NULL THEN NULL
-                            WHEN prev_customers = 0 THEN 
-                                CASE
-                                    WHEN customers = 0 THEN 0
-                                    ELSE 100
-                                END
-                            ELSE ((customers - prev_customers) / prev_customers) * 100
-                        END AS customer_change_pct
-                    FROM with_prev
-                    ORDER BY month
-                """
-                results = con.execute(query).fetchall()
+                plan = report_plan(con, 'monthly_trends')
+                results = execute(con, plan.sql, plan.params).fetchall()
                 
                 trends = []
                 for row in results:
@@ -461,31 +544,13 @@ def main():
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
     @app.get("/analytics/customer-demographics/", response_model=List[CustomerDemographics], tags=["Analytics"])
+    @cached_endpoint(result_cache, "/analytics/customer-demographics/", data_version)
     def get_customer_demographics():
-        """Customer Demographics Analysis - Segments customers by age groups and gender with spending patterns"""
+        """Customer Demographics Analysis - Segments customers by age groups and gender with spending patterns (estimated customer counts)"""
         try:
             with get_db_connection() as con:
-                query = """
-                    SELECT 
-                        CASE 
-                            WHEN age BETWEEN 18 AND 25 THEN '18-25'
-                            WHEN age BETWEEN 26 AND 35 THEN '26-35'
-                            WHEN age BETWEEN 36 AND 45 THEN '36-45'
-                            WHEN age BETWEEN 46 AND 55 THEN '46-55'
-                            WHEN age BETWEEN 56 AND 65 THEN '56-65'
-                            WHEN age > 65 THEN '65+'
-                            ELSE 'Unknown'
-                        END AS age_group,
-                        gender,
-                        COUNT(DISTINCT customer_id) AS customer_count,
-                        AVG(income) AS avg_income,
-                        SUM(total_amount_per_product_sgd) AS total_spent,
-                        SUM(total_amount_per_product_sgd) / COUNT(DISTINCT customer_id) AS avg_spent_per_customer
-                    FROM sales_data
-                    GROUP BY age_group, gender
-                    ORDER BY age_group, gender
-                """
-                results = con.execute(query).fetchall()
+                plan = report_plan(con, 'customer_demographics')
+                results = execute(con, plan.sql, plan.params).fetchall()
                 
                 demographics = []
                 for row in results:
@@ -505,20 +570,11 @@ def main():
 
     @app.get("/analytics/hourly-distribution/", response_model=List[HourlySalesDistribution], tags=["Analytics"])
     def get_hourly_sales_distribution():
-        """Hourly Sales Distribution - Analyzes sales patterns by hour of day"""
+        """Hourly Sales Distribution - Analyzes sales patterns by hour of day (estimated unique customers)"""
         try:
             with get_db_connection() as con:
-                query = """
-                    SELECT 
-                        EXTRACT(hour FROM date) AS hour_of_day,
-                        COUNT(*) AS transaction_count,
-                        SUM(total_amount_per_product_sgd) AS total_revenue,
-                        COUNT(DISTINCT customer_id) AS unique_customers
-                    FROM sales_data
-                    GROUP BY hour_of_day
-                    ORDER BY hour_of_day
-                """
-                results = con.execute(query).fetchall()
+                plan = report_plan(con, 'hourly_distribution')
+                results = execute(con, plan.sql, plan.params).fetchall()
                 
                 hourly_data = []
                 for row in results:
@@ -535,40 +591,13 @@ def main():
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
     @app.get("/analytics/geographic-distribution/", response_model=List[GeographicSalesDistribution], tags=["Analytics"])
+    @cached_endpoint(result_cache, "/analytics/geographic-distribution/", data_version)
     def get_geographic_sales_distribution():
-        """Geographic Sales Distribution - Shows sales by country and city with rankings"""
+        """Geographic Sales Distribution - Shows sales by country and city with rankings (estimated customer counts)"""
         try:
             with get_db_connection() as con:
-                query = """
-                    WITH country_sales AS (
-                        SELECT 
-                            country,
-                            COUNT(*) AS transactions,
-                            COUNT(DISTINCT customer_id) AS customers,
-                            SUM(total_amount_per_product_sgd) AS total_revenue
-                        FROM sales_data
-                        GROUP BY country
-                    ),
-                    ranked_countries AS (
-                        SELECT 
-                            country,
-                            transactions,
-                            customers,
-                            total_revenue,
-                            RANK() OVER (ORDER BY total_revenue DESC) as revenue_rank
-                        FROM country_sales
-                    )
-                    SELECT
-                        country,
-                        transactions,
-                        customers,
-                        total_revenue,
-                        revenue_rank
-                    FROM ranked_countries
-                    ORDER BY revenue_rank
-                    LIMIT 15
-                """
-                results = con.execute(query).fetchall()
+                plan = report_plan(con, 'geographic_distribution')
+                results = execute(con, plan.sql, plan.params).fetchall()
                 
                 geographic_data = []
                 for row in results:
@@ -586,6 +615,7 @@ def main():
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
     @app.get("/analytics/value-transactions/", response_model=List[ValueTransaction], tags=["Analytics"])
+    @cached_endpoint(result_cache, "/analytics/value-transactions/", data_version)
     def get_value_transactions():
         """High-Value vs Low-Value Transactions - Compares highest and lowest value transactions by various dimensions"""
         try:
@@ -593,16 +623,12 @@ def main():
                 query = """
                     WITH transaction_values AS (
                         SELECT
-                            date,
-                            transaction_id,
-                            customer_id,
-                            age,
-                            gender,
-                            country,
-                            city,
-                            total_amount_per_product_sgd,
-                            NTILE(10) OVER (ORDER BY total_amount_per_product_sgd) AS value_decile
-                        FROM sales_data
+                            f.customer_id,
+                            c.age,
+                            f.total_amount_cents,
+                            NTILE(10) OVER (ORDER BY f.total_amount_cents) AS value_decile
+                        FROM sales_fact f
+                        LEFT JOIN dim_customer c ON c.customer_id = f.customer_id
                     )
                     SELECT
                         CASE 
@@ -612,10 +638,10 @@ def main():
                         COUNT(*) AS transaction_count,
                         COUNT(DISTINCT customer_id) AS unique_customers,
                         AVG(age) AS avg_customer_age,
-                        AVG(total_amount_per_product_sgd) AS avg_transaction_value,
-                        SUM(total_amount_per_product_sgd) AS total_revenue,
-                        (SUM(total_amount_per_product_sgd) / COUNT(*)) / 
-                            (SELECT AVG(total_amount_per_product_sgd) FROM sales_data) AS relative_to_average
+                        AVG(total_amount_cents) / 100.0 AS avg_transaction_value,
+                        SUM(total_amount_cents) / 100.0 AS total_revenue,
+                        (SUM(total_amount_cents) / 100.0 / COUNT(*)) / 
+                            (SELECT AVG(total_amount_cents) / 100.0 FROM sales_fact) AS relative_to_average
                     FROM transaction_values
                     WHERE value_decile IN (1, 10)
                     GROUP BY value_segment
@@ -641,8 +667,9 @@ def main():
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
     @app.get("/analytics/income-levels/", response_model=List[IncomeLevelAnalysis], tags=["Analytics"])
+    @cached_endpoint(result_cache, "/analytics/income-levels/", data_version)
     def get_income_level_analysis():
-        """Income Level Analysis - Segments customers by income levels with purchasing patterns"""
+        """Income Level Analysis - Segments customers by income levels with purchasing patterns (estimated customer counts)"""
         try:
             with get_db_connection() as con:
                 # First check if income column exists
@@ -651,39 +678,10 @@ def main():
                 column_names = [row[0] for row in schema_result]
                 has_income = 'income' in column_names
                 
+                params = []
                 if has_income:
-                    query = """
-                        WITH income_segments AS (
-                            SELECT
-                                CASE
-                                    WHEN income < 30000 THEN 'Low Income (< 30k)'
-                                    WHEN income BETWEEN 30000 AND 60000 THEN 'Middle Income (30k-60k)'
-                                    WHEN income BETWEEN 60001 AND 100000 THEN 'Upper Middle (60k-100k)'
-                                    WHEN income > 100000 THEN 'High Income (>100k)'
-                                    ELSE 'Unknown'
-                                END AS income_segment,
-                                customer_id,
-                                total_amount_per_product_sgd
-                            FROM sales_data
-                        )
-                        SELECT
-                            income_segment,
-                            COUNT(DISTINCT customer_id) AS customer_count,
-                            COUNT(*) AS transaction_count,
-                            SUM(total_amount_per_product_sgd) AS total_revenue,
-                            AVG(total_amount_per_product_sgd) AS avg_transaction_value,
-                            SUM(total_amount_per_product_sgd) / COUNT(DISTINCT customer_id) AS avg_spent_per_customer
-                        FROM income_segments
-                        GROUP BY income_segment
-                        ORDER BY 
-                            CASE 
-                                WHEN income_segment = 'Low Income (< 30k)' THEN 1
-                                WHEN income_segment = 'Middle Income (30k-60k)' THEN 2
-                                WHEN income_segment = 'Upper Middle (60k-100k)' THEN 3
-                                WHEN income_segment = 'High Income (>100k)' THEN 4
-                                ELSE 5
-                            END
-                    """
+                    plan = report_plan(con, 'income_levels')
+                    query, params = plan.sql, plan.params
                 else:
                     # Fallback to age-based income estimation if income column doesn't exist
                     query = """
@@ -719,7 +717,7 @@ def main():
                             END
                     """
                 
-                results = con.execute(query).fetchall()
+                results = execute(con, query, params).fetchall()
                 
                 income_data = []
                 for row in results:
@@ -737,6 +735,55 @@ def main():
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+    @app.get("/analytics/query", tags=["Analytics"])
+    def query_analytics(
+        measures: List[str] = Query(..., description="transactions, units_sold, revenue, customers, receipts, avg_price, avg_income, avg_receipt_total, avg_transaction_value, avg_age, min_age, max_age"),
+        group_by: List[str] = Query([], description="Dimensions, e.g. country, city, product_name, age_group, gender, income_band, hour_of_day, day_of_week"),
+        grain: Optional[Literal[TIME_GRAINS]] = Query(None, description="Time grain of a leading period column"),
+        start_date: Optional[str] = Query(None, description="First day (YYYY-MM-DD)"),
+        end_date: Optional[str] = Query(None, description="Last day (YYYY-MM-DD), inclusive"),
+        country: Optional[str] = Query(None),
+        city: Optional[str] = Query(None),
+        product_id: Optional[int] = Query(None),
+        gender: Optional[str] = Query(None),
+        transaction_desc: Optional[str] = Query(None),
+        exact: bool = Query(True, description="Only use sources that compute every measure exactly; false also allows the rollup's customer and receipt estimates"),
+        layout: Literal['rows', 'columns'] = Query('rows', alias='format', description="rows: list of objects; columns: one list per field")
+    ):
+        """
+        Ad-hoc report: measures by dimensions and time grain, answered from the
+        smallest aggregate that covers the request (sales_data when none does).
+        The source used is returned with the data.
+        """
+        for value in (start_date, end_date):
+            if value is not None:
+                try:
+                    datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    raise HTTPException(status_code=400, detail="Invalid date format. Please use YYYY-MM-DD format (e.g., 2024-01-01)")
+        filters = {'start_date': start_date, 'end_date': end_date, 'country': country, 'city': city,
+                   'product_id': product_id, 'gender': gender, 'transaction_desc': transaction_desc}
+        filters = {name: value for name, value in filters.items() if value is not None}
+
+        def compute():
+            with get_db_connection() as con:
+                plan = plan_query(con, measures, group_by, filters, grain, exact)
+                groups = ([grain] if grain else []) + list(group_by)
+                data_json, rows = fetch_json(
+                    con, plan.sql, plan.params, [(c, c) for c in groups + list(measures)], layout,
+                    order_by=', '.join(groups) or None
+                )
+                return json_document({'source': plan.source, 'rows': rows}, {'data': data_json})
+
+        try:
+            key = ('/analytics/query', tuple(measures), tuple(group_by), grain, tuple(sorted(filters.items())),
+                   exact, layout, data_version())
+            return json_response(result_cache.get_or_compute(key, compute))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
     @app.get("/sales/by-date/{target_date}", tags=["Sales"])
     def get_sales_by_date(target_date: str = Path(..., description="Date in YYYY-MM-DD format", examples=["2024-01-01"])):
         """
@@ -767,9 +814,10 @@ def main():
                         COUNT(DISTINCT receipt_number) as unique_receipts,
                         AVG(receipt_total_sgd) as avg_receipt_value
                     FROM sales_data
-                    WHERE DATE(date) = ?
+                    WHERE date >= CAST($1 AS DATE) AND date < CAST($1 AS DATE) + INTERVAL 1 DAY
                 """
-                result = con.execute(query, [target_date]).fetchone()
+                # A range on the raw column (not DATE(date)) lets zone maps skip other days
+                result = execute(con, query, [target_date]).fetchone()
                 
                 if result[0] == 0:
                     raise HTTPException(status_code=404, detail=f"No sales found for date {target_date}")
@@ -787,7 +835,7 @@ def main():
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
     @app.get("/customers/{customer_id}", tags=["Customers"])
-    def get_customer_history(customer_id: str = Path(..., description="Customer ID", examples=["CUST001"])):
+    def get_customer_history(customer_id: int = Path(..., description="Customer ID", examples=[100001])):
         """Get purchase history for a specific customer"""
         try:
             with get_db_connection() as con:
@@ -802,7 +850,7 @@ def main():
                     FROM sales_data
                     WHERE customer_id = ?
                 """
-                summary_result = con.execute(summary_query, [customer_id]).fetchone()
+                summary_result = execute(con, summary_query, [customer_id]).fetchone()
                 
                 if summary_result[0] == 0:
                     raise HTTPException(status_code=404, detail=f"Customer {customer_id} not found")
@@ -815,7 +863,7 @@ def main():
                     ORDER BY date DESC
                     LIMIT 10
                 """
-                recent_results = con.execute(recent_query, [customer_id]).fetchall()
+                recent_results = execute(con, recent_query, [customer_id]).fetchall()
                 
                 recent_purchases = []
                 for row in recent_results:
@@ -853,7 +901,7 @@ def main():
                     WHERE receipt_number = ?
                     ORDER BY product_name
                 """
-                results = con.execute(query, [receipt_number]).fetchall()
+                results = execute(con, query, [receipt_number]).fetchall()
                 
                 if not results:
                     raise HTTPException(status_code=404, detail=f"Receipt {receipt_number} not found")
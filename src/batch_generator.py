@@ -0,0 +1,212 @@
+import json
+import os
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+CITIES_JSON = os.path.join(SOURCE_DIR, 'cities.json')
+
+# Column order of the sales_data table
+SALES_COLUMNS = [
+    'date', 'transaction_id', 'transaction_desc', 'customer_id',
+    'age', 'gender', 'receipt_number', 'product_id', 'product_name',
+    'units_sold', 'unit_price_sgd', 'total_amount_per_product_sgd',
+    'receipt_total_sgd', 'country_id', 'country', 'city', 'income'
+]
+
+# Static catalog used by the generator
+GENDERS = ["M", "F"]
+PRODUCTS = [
+    {'product_id': 100, 'product_name': 'iPhone 13', 'unit_price': 999.00},
+    {'product_id': 200, 'product_name': 'Samsung Galaxy S21', 'unit_price': 899.00},
+    {'product_id': 300, 'product_name': 'Google Pixel 6', 'unit_price': 599.00},
+    {'product_id': 400, 'product_name': 'OnePlus 9', 'unit_price': 729.00},
+    {'product_id': 500, 'product_name': 'Xiaomi Mi 11', 'unit_price': 749.00},
+    {'product_id': 600, 'product_name': 'Sony Xperia 5', 'unit_price': 899.00},
+    {'product_id': 700, 'product_name': 'Oppo Find X3', 'unit_price': 1149.00},
+    {'product_id': 800, 'product_name': 'Nokia 8.3', 'unit_price': 699.00},
+    {'product_id': 900, 'product_name': 'Realme GT', 'unit_price': 599.00},
+    {'product_id': 1000, 'product_name': 'Water', 'unit_price': 2.00},
+    {'product_id': 1100, 'product_name': 'Sparkling Water', 'unit_price': 2.50},
+    {'product_id': 1200, 'product_name': 'Iced Tea', 'unit_price': 3.00},
+    {'product_id': 1300, 'product_name': 'MacBook Pro', 'unit_price': 2399.00},
+    {'product_id': 1400, 'product_name': 'Dell XPS 13', 'unit_price': 1499.00},
+    {'product_id': 1500, 'product_name': 'HP Spectre x360', 'unit_price': 1699.00},
+    {'product_id': 1600, 'product_name': 'Lenovo ThinkPad X1', 'unit_price': 1899.00},
+    {'product_id': 1700, 'product_name': 'iPad Pro', 'unit_price': 1099.00},
+    {'product_id': 1800, 'product_name': 'Samsung Galaxy Tab S7', 'unit_price': 849.00},
+    {'product_id': 1900, 'product_name': 'Microsoft Surface Pro 7', 'unit_price': 999.00},
+    {'product_id': 2000, 'product_name': 'Amazon Kindle', 'unit_price': 89.00}
+]
+TRANSACTION_TYPES = ['Product Sale', 'Product Refund', 'Product Exchange']
+TRANSACTION_TYPE_WEIGHTS = [0.95, 0.025, 0.025]
+AGE_RANGES = [18, 25, 35, 45, 55, 65, 75]
+AGE_WEIGHTS = [0.05, 0.20, 0.25, 0.25, 0.15, 0.08, 0.02]
+INCOMES = [30_000, 40_000, 50_000, 60_000, 70_000, 80_000, 90_000, 100_000, 120_000, 150_000, 200_000]
+UNIT_PRICES = [2345, 3398, 1234, 2234, 678, 890, 456, 234, 567, 890, 345, 1234, 5678, 2345, 3787]
+MAX_UNITS_SOLD = 13
+
+DEFAULT_SEED = 142
+MAX_TRANSACTIONS_PER_DAY = 120
+
+# Identifiers are derived from (day, slot) so that every chunk can be generated independently
+ID_EPOCH = datetime(1900, 1, 1)
+CUSTOMER_ID_BASE = 100001
+RECEIPT_ID_BASE = 200001
+TRANSACTION_ID_BASE = 300001
+
+# Independent random streams, one per generated attribute
+_STREAM_TX_COUNT = 1
+_STREAM_AGE_BAND = 2
+_STREAM_AGE = 3
+_STREAM_CITY = 4
+_STREAM_TX_TYPE = 5
+_STREAM_INCOME = 6
+_STREAM_PRODUCT = 7
+_STREAM_UNITS = 8
+_STREAM_PRICE = 9
+_STREAM_GENDER = 10
+
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+
+def _splitmix64_scalar(x: int) -> int:
+    """SplitMix64 finalizer for a single Python integer"""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return x ^ (x >> 31)
+
+
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer applied element-wise to a uint64 array (wrapping arithmetic)"""
+    with np.errstate(over='ignore'):
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def _uniform(seed: int, stream: int, keys: np.ndarray) -> np.ndarray:
+    """Uniform floats in [0, 1) that depend only on (seed, stream, key)"""
+    stream_key = np.uint64(_splitmix64_scalar((seed * 1_000_003 + stream) & _MASK64))
+    hashed = _splitmix64(keys.astype(np.uint64) ^ stream_key)
+    return (hashed >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+def _randint(seed: int, stream: int, keys: np.ndarray, low: int, high: int) -> np.ndarray:
+    """Integers in [low, high] (inclusive), like random.randint"""
+    return low + (_uniform(seed, stream, keys) * (high - low + 1)).astype(np.int64)
+
+
+def _weighted_choice(seed: int, stream: int, keys: np.ndarray, weights) -> np.ndarray:
+    """Indices drawn with the given relative weights, like random.choices"""
+    cumulative = np.cumsum(np.asarray(weights, dtype=np.float64))
+    cumulative /= cumulative[-1]
+    picks = np.searchsorted(cumulative, _uniform(seed, stream, keys), side='right')
+    return np.minimum(picks, len(cumulative) - 1)
+
+
+def _categorical(codes: np.ndarray, categories: list) -> pd.Categorical:
+    """Build a categorical column from lookup codes without copying strings per row"""
+    unique_values, inverse = np.unique(np.asarray(categories, dtype=object), return_inverse=True)
+    return pd.Categorical.from_codes(inverse[codes], categories=unique_values)
+
+
+@lru_cache(maxsize=4)
+def load_city_index(cities_path: str = CITIES_JSON) -> dict:
+    """Load cities.json once and pre-index it into parallel lists"""
+    with open(cities_path) as f:
+        cities = json.load(f)
+    return {
+        'city': [c['name'] for c in cities],
+        'country': [c['country'] for c in cities],
+        'country_id': [c['country_id'] for c in cities],
+    }
+
+
+def count_days(start_date: datetime, end_date: datetime) -> int:
+    """Number of generation days in [start_date, end_date], stepping one day from start_date"""
+    if end_date < start_date:
+        return 0
+    return (end_date - start_date).days + 1
+
+
+def generate_batch(start_date: datetime, end_date: datetime, seed: int = DEFAULT_SEED,
+                   max_transactions_per_day: int = MAX_TRANSACTIONS_PER_DAY,
+                   cities_path: str = CITIES_JSON) -> pd.DataFrame:
+    """Generate all transactions between start_date and end_date as one columnar DataFrame.
+
+    Each day draws its attributes (customer profile, city, product, price) and a
+    transaction count of 1..max_transactions_per_day; every transaction of that day
+    gets its own identifiers and gender. All values are hashed from
+    (seed, day, slot), so a day always yields the same rows no matter how the
+    overall range is split into chunks.
+    """
+    num_days = count_days(start_date, end_date)
+    if num_days == 0:
+        return pd.DataFrame({col: [] for col in SALES_COLUMNS})
+
+    city_index = load_city_index(cities_path)
+
+    # Day-level attributes
+    first_ordinal = (start_date.date() - ID_EPOCH.date()).days
+    day_keys = np.arange(first_ordinal, first_ordinal + num_days, dtype=np.int64)
+
+    day_counts = _randint(seed, _STREAM_TX_COUNT, day_keys, 1, max_transactions_per_day)
+    age_band = _weighted_choice(seed, _STREAM_AGE_BAND, day_keys, AGE_WEIGHTS)
+    age_start = np.asarray(AGE_RANGES, dtype=np.int64)[age_band]
+    age_span = np.minimum(age_start + 10, 80) - age_start + 1
+    day_age = age_start + (_uniform(seed, _STREAM_AGE, day_keys) * age_span).astype(np.int64)
+    day_city = _randint(seed, _STREAM_CITY, day_keys, 0, len(city_index['city']) - 1)
+    day_tx_type = _weighted_choice(seed, _STREAM_TX_TYPE, day_keys, TRANSACTION_TYPE_WEIGHTS)
+    day_income = _randint(seed, _STREAM_INCOME, day_keys, min(INCOMES), max(INCOMES) - 1)
+    day_product = _randint(seed, _STREAM_PRODUCT, day_keys, 0, len(PRODUCTS) - 1)
+    day_units = _randint(seed, _STREAM_UNITS, day_keys, 1, MAX_UNITS_SOLD)
+    day_price = np.asarray(UNIT_PRICES, dtype=np.float64)[
+        _randint(seed, _STREAM_PRICE, day_keys, 0, len(UNIT_PRICES) - 1)
+    ]
+
+    # Expand days into transactions
+    total_rows = int(day_counts.sum())
+    row_day = np.repeat(np.arange(num_days), day_counts)
+    day_first_row = np.cumsum(day_counts) - day_counts
+    row_slot = np.arange(total_rows, dtype=np.int64) - day_first_row[row_day]
+    row_keys = day_keys[row_day] * max_transactions_per_day + row_slot
+
+    day_dates = np.datetime64(start_date + timedelta(days=1), 'us') + np.arange(num_days) * np.timedelta64(1, 'D')
+    units_sold = day_units[row_day]
+    unit_price = day_price[row_day]
+    gender_codes = _randint(seed, _STREAM_GENDER, row_keys, 0, len(GENDERS) - 1)
+    city_codes = day_city[row_day]
+    product_codes = day_product[row_day]
+
+    return pd.DataFrame({
+        'date': day_dates[row_day],
+        'transaction_id': TRANSACTION_ID_BASE + row_keys,
+        'transaction_desc': _categorical(day_tx_type[row_day], TRANSACTION_TYPES),
+        'customer_id': CUSTOMER_ID_BASE + row_keys,
+        'age': day_age[row_day],
+        'gender': _categorical(gender_codes, GENDERS),
+        'receipt_number': RECEIPT_ID_BASE + row_keys,
+        'product_id': np.asarray([p['product_id'] for p in PRODUCTS], dtype=np.int64)[product_codes],
+        'product_name': _categorical(product_codes, [p['product_name'] for p in PRODUCTS]),
+        'units_sold': units_sold,
+        'unit_price_sgd': unit_price,
+        'total_amount_per_product_sgd': units_sold * unit_price,
+        'receipt_total_sgd': np.zeros(total_rows, dtype=np.float64),
+        'country_id': _categorical(city_codes, city_index['country_id']),
+        'country': _categorical(city_codes, city_index['country']),
+        'city': _categorical(city_codes, city_index['city']),
+        'income': day_income[row_day],
+    }, columns=SALES_COLUMNS)
+
+
+def generate_chunk(task: tuple) -> pd.DataFrame:
+    """Process-pool entry point: task is (start_date, end_date, seed, max_transactions_per_day)"""
+    start_date, end_date, seed, max_transactions_per_day = task
+    return generate_batch(start_date, end_date, seed=seed, max_transactions_per_day=max_transactions_per_day)
@@ -0,0 +1,126 @@
+"""Process-wide read-only DuckDB instance with a bounded pool of cursors.
+
+Opening a connection per request re-reads the catalog and starts with a cold
+buffer cache. A ReadOnlyPool opens the database once and hands out cursors
+(connections to the same instance), so catalog and cached pages are shared
+between requests:
+
+    pool = ReadOnlyPool('src/sales_timeseries.db', size=8, threads=4, memory_limit='2GB')
+    with pool.cursor() as con:
+        con.execute("SELECT COUNT(*) FROM sales_data").fetchone()
+
+While the instance is open it holds the database's read-only lock, which
+keeps every writer out. By default it stays open until close(); with
+release_after set, the pool closes it once no cursor has been in use for that
+many seconds, and the next request reopens it (cold) and sees whatever was
+written in between.
+"""
+import threading
+from contextlib import contextmanager
+
+import duckdb
+
+
+DEFAULT_POOL_SIZE = 8
+ACQUIRE_TIMEOUT = 30
+RELEASE_AFTER = None
+
+
+class ReadOnlyPool:
+    """One read-only database instance shared by at most size concurrent cursors"""
+
+    def __init__(self, db_path: str, size: int = DEFAULT_POOL_SIZE, threads: int = None,
+                 memory_limit: str = None, timeout: float = ACQUIRE_TIMEOUT, release_after: float = RELEASE_AFTER):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self.release_after = release_after
+        self.config = {}
+        if threads:
+            self.config['threads'] = threads
+        if memory_limit:
+            self.config['memory_limit'] = memory_limit
+        self._db = None
+        self._generation = 0
+        self._idle = []
+        self._busy = 0
+        self._release_timer = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _database(self):
+        with self._lock:
+            if self._db is None:
+                self._db = duckdb.connect(self.db_path, read_only=True, config=self.config)
+            return self._db
+
+    @contextmanager
+    def cursor(self):
+        """Borrow a cursor for one request; waits up to timeout seconds when all are in use"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No database cursor free within {self.timeout}s ({self.size} in use)")
+        try:
+            with self._lock:
+                self._busy += 1
+                if self._release_timer is not None:
+                    self._release_timer.cancel()
+                    self._release_timer = None
+                con = self._idle.pop() if self._idle else None
+                generation = self._generation
+            try:
+                if con is None:
+                    con = self._database().cursor()
+                yield con
+            except BaseException:
+                # Whatever interrupted the request (a failed query, an HTTPException, a client
+                # disconnect), the cursor may be mid-transaction; do not hand it out again
+                if con is not None:
+                    con.close()
+                raise
+            with self._lock:
+                # Cursors of an instance closed in the meantime are not reused
+                if self._db is not None and generation == self._generation:
+                    self._idle.append(con)
+                    con = None
+            if con is not None:
+                con.close()
+        finally:
+            with self._lock:
+                self._busy -= 1
+                if self._busy == 0 and self.release_after is not None and self._db is not None:
+                    self._release_timer = threading.Timer(self.release_after, self._release_idle, args=(self._generation,))
+                    self._release_timer.daemon = True
+                    self._release_timer.start()
+            self._slots.release()
+
+    def _release_idle(self, generation: int) -> None:
+        """Close the instance if no cursor was borrowed since the timer was set"""
+        with self._lock:
+            if self._busy or generation != self._generation:
+                return
+            # Closed under the lock, so a request starting now opens a fresh instance
+            self._release_timer = None
+            idle, self._idle = self._idle, []
+            db, self._db = self._db, None
+            self._generation += 1
+            for con in idle:
+                con.close()
+            if db is not None:
+                db.close()
+
+    def stats(self) -> dict:
+        return {'size': self.size, 'idle': len(self._idle), 'busy': self._busy, 'open': self._db is not None, **self.config}
+
+    def close(self) -> None:
+        """Close the cursors and the instance, releasing the file; the next cursor() reopens it"""
+        with self._lock:
+            if self._release_timer is not None:
+                self._release_timer.cancel()
+                self._release_timer = None
+            idle, self._idle = self._idle, []
+            db, self._db = self._db, None
+            self._generation += 1
+        for con in idle:
+            con.close()
+        if db is not None:
+            db.close()
@@ -0,0 +1,89 @@
+"""Lazy, read-only handle on the sales database.
+
+Nothing is copied into memory: the database is opened read-only on first use
+and every request is answered by a DuckDB relation that projects, filters and
+limits sales_data inside the engine. Row counts come from table_stats.
+
+    dataset = SalesDataset('src/sales_timeseries.db')
+    dataset.head(10).show()
+    dataset.relation(['date', 'customer_id'], where='units_sold > ?', params=[5], limit=100).df()
+"""
+import os
+
+import duckdb
+
+from storage import object_type, read_table_stats
+
+
+class SalesDataset:
+    """Read-only view of a sales table that only materializes the rows asked for"""
+
+    def __init__(self, db_path: str, table: str = 'sales_data'):
+        self.db_path = db_path
+        self.table = table
+        self._con = None
+
+    @property
+    def con(self):
+        """Read-only connection, opened on first use (and again after close())"""
+        if self._con is None:
+            self._con = duckdb.connect(self.db_path, read_only=True)
+        return self._con
+
+    @property
+    def columns(self) -> list:
+        return [row[0] for row in self.con.execute(f"DESCRIBE {self.table}").fetchall()]
+
+    def relation(self, columns=None, where: str = None, params=None, order_by: str = None, limit: int = None):
+        """Lazy relation over the table; rows are only read when it is fetched"""
+        sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {self.table}"
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return self.con.sql(sql, params=params)
+
+    def head(self, n: int = 10, columns=None):
+        return self.relation(columns, limit=n)
+
+    def count(self) -> int:
+        """Row count from table_stats when it covers this table, else from the table itself"""
+        if self.table in ('sales_data', 'sales_fact'):
+            stats = read_table_stats(self.con)
+            if stats is not None:
+                return stats['row_count']
+        return self.con.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def execute(self, sql: str, params=None):
+        """Run a query on the read-only connection"""
+        return self.con.execute(sql, params)
+
+    def close(self) -> None:
+        """Release the read-only connection (and its file lock) until the next use"""
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+
+def open_dataset(db_path: str, table: str = 'sales_data'):
+    """SalesDataset for db_path, or None if the file or table does not exist"""
+    if not os.path.exists(db_path):
+        print(f"❌ Database file {db_path} not found.")
+        return None
+    dataset = SalesDataset(db_path, table)
+    try:
+        found = object_type(dataset.con, table) is not None
+    except Exception as e:
+        print(f"❌ Could not open {db_path}: {e}")
+        dataset.close()
+        return None
+    if not found:
+        print(f"❌ No {table} table found in database.")
+        dataset.close()
+        return None
+    return dataset
@@ -0,0 +1,111 @@
+"""Streaming bulk exports of a query result.
+
+iter_export() yields the result of one query as bytes in a given format,
+holding at most one batch in memory:
+
+- ndjson:  one JSON object per line, rendered by DuckDB (to_json) batch by batch
+- arrow:   Arrow IPC stream of record batches (needs pyarrow)
+- csv:     gzip-compressed CSV with a header
+- parquet: zstd Parquet
+
+csv and parquet are written by DuckDB's parallel COPY into a temporary file,
+which is streamed back and deleted; Parquet needs its footer before it can be
+read anyway.
+"""
+import os
+import shutil
+import tempfile
+
+from sql_filters import execute
+
+
+EXPORT_BATCH_ROWS = 65_536
+FILE_CHUNK_BYTES = 1024 * 1024
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'csv': ('application/gzip', 'csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _iter_ndjson(con, query: str, params, batch_rows: int):
+    result = execute(con, f"SELECT to_json(export_row)::VARCHAR FROM ({query}) export_row", params)
+    while True:
+        rows = result.fetchmany(batch_rows)
+        if not rows:
+            break
+        yield ('\n'.join(row[0] for row in rows) + '\n').encode()
+
+
+class _ByteSink:
+    """Write-only file object collecting what the Arrow stream writer emits"""
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        data = b''.join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def _iter_arrow(con, query: str, params, batch_rows: int):
+    import pyarrow as pa
+
+    reader = execute(con, query, params).fetch_record_batch(batch_rows)
+    sink = _ByteSink()
+    writer = pa.ipc.new_stream(sink, reader.schema)
+    for batch in reader:
+        writer.write_batch(batch)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def _iter_copy(con, query: str, params, options: str, suffix: str):
+    tmp_dir = tempfile.mkdtemp(prefix='sales-export-')
+    path = os.path.join(tmp_dir, f"export.{suffix}")
+    try:
+        con.execute(f"COPY ({query}) TO '{path}' ({options})", params)
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(FILE_CHUNK_BYTES)
+                if not data:
+                    break
+                yield data
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def iter_export(connect, query: str, params=None, fmt: str = 'ndjson', batch_rows: int = EXPORT_BATCH_ROWS):
+    """Yield query's result as bytes in fmt; connect() is a context manager giving a connection for the whole stream"""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}")
+    with connect() as con:
+        if fmt == 'ndjson':
+            yield from _iter_ndjson(con, query, params, batch_rows)
+        elif fmt == 'arrow':
+            yield from _iter_arrow(con, query, params, batch_rows)
+        elif fmt == 'csv':
+            yield from _iter_copy(con, query, params, "FORMAT CSV, HEADER, COMPRESSION gzip", 'csv.gz')
+        else:
+            yield from _iter_copy(con, query, params, "FORMAT PARQUET, COMPRESSION zstd", 'parquet')
@@ -28,8 +28,8 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
 
     print("\n=== Best Day and Month for Sales (Sales Only) ===")
     best_day = con.execute("""
-        SELECT day_of_week_text, SUM(total_amount_per_product_sgd) as total_sales
-        FROM sales_data 
+        SELECT day_of_week_text, SUM(total_amount_sgd) as total_sales
+        FROM sales_rollup 
         WHERE transaction_desc = 'Product Sale'
         GROUP BY day_of_week_text, day_of_week
         ORDER BY total_sales DESC 
@@ -37,8 +37,8 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     """).fetchone()
 
     best_month = con.execute("""
-        SELECT month_text, SUM(total_amount_per_product_sgd) as total_sales
-        FROM sales_data 
+        SELECT month_text, SUM(total_amount_sgd) as total_sales
+        FROM sales_rollup 
         WHERE transaction_desc = 'Product Sale'
         GROUP BY month_text, month
         ORDER BY total_sales DESC 
@@ -52,13 +52,13 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     daily_sales = con.execute("""
         SELECT 
             DATE(date) as sales_date,
-            day_of_week_text,
-            month_text,
+            upper(strftime(date, '%a')) as day_of_week_text,
+            upper(strftime(date, '%b')) as month_text,
             EXTRACT(year FROM date) as year,
             COUNT(*) as total_transactions,
             SUM(total_amount_per_product_sgd) as daily_revenue,
             AVG(total_amount_per_product_sgd) as avg_transaction_value,
-            COUNT(DISTINCT customer_number) as unique_customers,
+            COUNT(DISTINCT customer_id) as unique_customers,
             COUNT(DISTINCT receipt_number) as unique_receipts
         FROM sales_data 
         GROUP BY DATE(date), day_of_week_text, month_text, EXTRACT(year FROM date)
@@ -114,7 +114,7 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
             COUNT(*) as total_transactions,
             SUM(total_amount_per_product_sgd) as total_revenue,
             AVG(total_amount_per_product_sgd) as avg_transaction_value,
-            COUNT(DISTINCT customer_number) as unique_customers
+            COUNT(DISTINCT customer_id) as unique_customers
         FROM sales_data 
         GROUP BY country
         ORDER BY total_revenue DESC
@@ -147,7 +147,7 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
             COUNT(*) as total_transactions,
             SUM(total_amount_per_product_sgd) as total_revenue,
             AVG(total_amount_per_product_sgd) as avg_transaction_value,
-            COUNT(DISTINCT customer_number) as unique_customers,
+            COUNT(DISTINCT customer_id) as unique_customers,
             AVG(age) as avg_age_in_group
         FROM sales_data 
         WHERE age IS NOT NULL
@@ -183,14 +183,14 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     age_distribution = con.execute("""
         SELECT 
             country,
-            COUNT(CASE WHEN age < 25 THEN 1 END) as under_25_customers,
-            COUNT(CASE WHEN age BETWEEN 25 AND 40 THEN 1 END) as age_25_40_customers,
-            COUNT(CASE WHEN age >= 41 THEN 1 END) as age_41_plus_customers,
-            ROUND(AVG(CASE WHEN age < 25 THEN age END), 1) as avg_age_under_25,
-            ROUND(AVG(CASE WHEN age BETWEEN 25 AND 40 THEN age END), 1) as avg_age_25_40,
-            ROUND(AVG(CASE WHEN age >= 41 THEN age END), 1) as avg_age_41_plus,
-            ROUND(AVG(age), 1) as overall_avg_age
-        FROM sales_data 
+            COALESCE(SUM(transactions) FILTER (WHERE age < 25), 0) as under_25_customers,
+            COALESCE(SUM(transactions) FILTER (WHERE age BETWEEN 25 AND 40), 0) as age_25_40_customers,
+            COALESCE(SUM(transactions) FILTER (WHERE age >= 41), 0) as age_41_plus_customers,
+            ROUND(SUM(age * transactions) FILTER (WHERE age < 25) / SUM(transactions) FILTER (WHERE age < 25), 1) as avg_age_under_25,
+            ROUND(SUM(age * transactions) FILTER (WHERE age BETWEEN 25 AND 40) / SUM(transactions) FILTER (WHERE age BETWEEN 25 AND 40), 1) as avg_age_25_40,
+            ROUND(SUM(age * transactions) FILTER (WHERE age >= 41) / SUM(transactions) FILTER (WHERE age >= 41), 1) as avg_age_41_plus,
+            ROUND(SUM(age * transactions) / SUM(transactions), 1) as overall_avg_age
+        FROM sales_rollup 
         WHERE age IS NOT NULL
         GROUP BY country
         ORDER BY overall_avg_age DESC
@@ -222,8 +222,8 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
         WITH country_totals AS (
             SELECT 
                 country,
-                SUM(total_amount_per_product_sgd) as country_total_revenue
-            FROM sales_data 
+                SUM(total_amount_sgd) as country_total_revenue
+            FROM sales_rollup 
             WHERE age IS NOT NULL
             GROUP BY country
         ),
@@ -236,8 +236,8 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
                     WHEN age >= 41 THEN '41+'
                     ELSE 'Unknown'
                 END as age_group,
-                SUM(total_amount_per_product_sgd) as age_group_revenue
-            FROM sales_data 
+                SUM(total_amount_sgd) as age_group_revenue
+            FROM sales_rollup 
             WHERE age IS NOT NULL
             GROUP BY country, age_group
         )
@@ -289,11 +289,11 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     print("\n=== 🕐 Best and Worst Times of Day Analysis ===")
     hourly_sales = con.execute("""
         SELECT 
-            hour,
+            EXTRACT(hour FROM date) as hour,
             COUNT(*) as total_transactions,
             SUM(total_amount_per_product_sgd) as total_revenue,
             AVG(total_amount_per_product_sgd) as avg_transaction_value,
-            COUNT(DISTINCT customer_number) as unique_customers,
+            COUNT(DISTINCT customer_id) as unique_customers,
             COUNT(DISTINCT receipt_number) as unique_receipts
         FROM sales_data 
         WHERE transaction_desc = 'Product Sale'
@@ -425,7 +425,7 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
             SUM(total_amount_per_product_sgd) as total_sales,
             COUNT(*) as transaction_count,
             AVG(total_amount_per_product_sgd) as avg_transaction_value,
-            COUNT(DISTINCT customer_number) as unique_customers
+            COUNT(DISTINCT customer_id) as unique_customers
         FROM sales_data
         WHERE transaction_desc = 'Product Sale'
         GROUP BY country
@@ -439,11 +439,11 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     transaction_breakdown = con.execute("""
         SELECT 
             transaction_desc,
-            COUNT(*) as transaction_count,
-            SUM(total_amount_per_product_sgd) as total_amount,
-            AVG(total_amount_per_product_sgd) as avg_amount,
-            ROUND((COUNT(*) * 100.0 / (SELECT COUNT(*) FROM sales_data)), 2) as percentage
-        FROM sales_data
+            CAST(SUM(transactions) AS BIGINT) as transaction_count,
+            SUM(total_amount_sgd) as total_amount,
+            SUM(total_amount_sgd) / SUM(transactions) as avg_amount,
+            ROUND((SUM(transactions) * 100.0 / (SELECT SUM(transactions) FROM sales_rollup)), 2) as percentage
+        FROM sales_rollup
         GROUP BY transaction_desc
         ORDER BY transaction_count DESC
     """).df()
@@ -460,8 +460,8 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     print(f"🎯 Average Sales Transaction: SGD ${sales_revenue/sales_transactions:.2f}")
     
     # Calculate impact of refunds and exchanges
-    total_revenue = con.execute("SELECT SUM(total_amount_per_product_sgd) FROM sales_data").fetchone()[0]
-    total_transactions = con.execute("SELECT COUNT(*) FROM sales_data").fetchone()[0]
+    total_revenue = con.execute("SELECT SUM(total_amount_sgd) FROM sales_rollup").fetchone()[0]
+    total_transactions = con.execute("SELECT SUM(transactions) FROM sales_rollup").fetchone()[0]
     
     refund_impact = total_revenue - sales_revenue
     transaction_impact = total_transactions - sales_transactions
@@ -488,8 +488,8 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
                 WHEN age >= 41 THEN '41+'
                 ELSE 'Unknown'
             END as age_group,
-            COUNT(*) as customer_count
-        FROM sales_data 
+            CAST(SUM(transactions) AS BIGINT) as customer_count
+        FROM sales_rollup 
         WHERE age IS NOT NULL AND transaction_desc = 'Product Sale'
         GROUP BY age_group
         ORDER BY customer_count DESC
@@ -505,7 +505,7 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     country_customer_data = con.execute("""
         SELECT 
             country,
-            COUNT(DISTINCT customer_number) as unique_customers
+            COUNT(DISTINCT customer_id) as unique_customers
         FROM sales_data 
         WHERE transaction_desc = 'Product Sale'
         GROUP BY country
@@ -533,9 +533,9 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
         SELECT 
             EXTRACT(year FROM date) as year,
             product_name,
-            SUM(total_amount_per_product_sgd) as total_sales,
-            COUNT(*) as transaction_count
-        FROM sales_data 
+            SUM(total_amount_sgd) as total_sales,
+            CAST(SUM(transactions) AS BIGINT) as transaction_count
+        FROM sales_rollup 
         WHERE transaction_desc = 'Product Sale'
         GROUP BY EXTRACT(year FROM date), product_name
         ORDER BY year, total_sales DESC
@@ -545,8 +545,8 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     top_products = con.execute("""
         SELECT 
             product_name,
-            SUM(total_amount_per_product_sgd) as total_sales
-        FROM sales_data 
+            SUM(total_amount_sgd) as total_sales
+        FROM sales_rollup 
         WHERE transaction_desc = 'Product Sale'
         GROUP BY product_name
         ORDER BY total_sales DESC
@@ -595,8 +595,8 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
         SELECT 
             EXTRACT(year FROM date) as year,
             country,
-            SUM(total_amount_per_product_sgd) as total_sales
-        FROM sales_data 
+            SUM(total_amount_sgd) as total_sales
+        FROM sales_rollup 
         WHERE transaction_desc = 'Product Sale'
         GROUP BY EXTRACT(year FROM date), country
         ORDER BY year, total_sales DESC
@@ -606,8 +606,8 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     top_countries = con.execute("""
         SELECT 
             country,
-            SUM(total_amount_per_product_sgd) as total_sales
-        FROM sales_data 
+            SUM(total_amount_sgd) as total_sales
+        FROM sales_rollup 
         WHERE transaction_desc = 'Product Sale'
         GROUP BY country
         ORDER BY total_sales DESC
@@ -636,8 +636,8 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
         SELECT 
             country,
             product_name,
-            SUM(total_amount_per_product_sgd) as total_sales
-        FROM sales_data 
+            SUM(total_amount_sgd) as total_sales
+        FROM sales_rollup 
         WHERE transaction_desc = 'Product Sale' 
         AND EXTRACT(year FROM date) >= 2020
         GROUP BY country, product_name
@@ -675,9 +675,9 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
         SELECT 
             month_text,
             month,
-            SUM(total_amount_per_product_sgd) as total_sales,
-            COUNT(*) as transaction_count
-        FROM sales_data 
+            SUM(total_amount_sgd) as total_sales,
+            CAST(SUM(transactions) AS BIGINT) as transaction_count
+        FROM sales_rollup 
         WHERE transaction_desc = 'Product Sale'
         GROUP BY month_text, month
         ORDER BY month
@@ -702,9 +702,9 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
         SELECT 
             day_of_week_text,
             day_of_week,
-            SUM(total_amount_per_product_sgd) as total_sales,
-            COUNT(*) as transaction_count
-        FROM sales_data 
+            SUM(total_amount_sgd) as total_sales,
+            CAST(SUM(transactions) AS BIGINT) as transaction_count
+        FROM sales_rollup 
         WHERE transaction_desc = 'Product Sale'
         GROUP BY day_of_week_text, day_of_week
         ORDER BY day_of_week
@@ -733,8 +733,8 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
                 WHEN age >= 41 THEN '41+'
                 ELSE 'Unknown'
             END as age_group,
-            SUM(total_amount_per_product_sgd) as total_revenue
-        FROM sales_data 
+            SUM(total_amount_sgd) as total_revenue
+        FROM sales_rollup 
         WHERE age IS NOT NULL AND transaction_desc = 'Product Sale'
         GROUP BY country, age_group
         ORDER BY country, age_group
@@ -767,7 +767,7 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
             SUM(total_amount_per_product_sgd) as total_revenue,
             COUNT(*) as transaction_count,
             AVG(total_amount_per_product_sgd) as avg_transaction_value,
-            COUNT(DISTINCT customer_number) as unique_customers
+            COUNT(DISTINCT customer_id) as unique_customers
         FROM sales_data 
         WHERE transaction_desc = 'Product Sale'
         GROUP BY product_name
@@ -794,7 +794,7 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     yearly_customers = con.execute("""
         SELECT 
             EXTRACT(year FROM date) as year,
-            COUNT(DISTINCT customer_number) as new_customers,
+            COUNT(DISTINCT customer_id) as new_customers,
             SUM(total_amount_per_product_sgd) as total_revenue
         FROM sales_data 
         WHERE transaction_desc = 'Product Sale'
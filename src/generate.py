@@ -0,0 +1,181 @@
+"""Headless end-to-end generation run.
+
+    python -m src.generate --start 2020-01-01 --end 2024-12-31 --workers 4 --sink duckdb --seed 142
+    python src/generate.py --start 2024-01-01 --end 2024-01-31 --sink parquet --json report.json
+
+Generates the date range into DuckDB or the Parquet dataset without any
+prompts and finishes with a throughput and resource report.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import psutil
+
+try:
+    import resource
+except ImportError:  # Windows: psutil stands in, without the peak RSS of finished workers
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from batch_generator import DEFAULT_SEED
+from memory_governor import DEFAULT_MEMORY_BUDGET_MB
+from parquet_sink import PARQUET_DATASET
+
+SINKS = ['duckdb', 'parquet']
+
+
+def parse_date(value: str) -> datetime:
+    """argparse type for YYYY-MM-DD dates"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")
+
+
+def peak_rss_mb() -> dict:
+    """Peak resident set size of this process and of its (finished) worker processes, in MB (workers None if unknown)"""
+    if resource is None:
+        memory = psutil.Process().memory_info()
+        return {'main': getattr(memory, 'peak_wset', memory.rss) / (1024 * 1024), 'workers': None}
+    unit = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    return {
+        'main': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / (1024 * 1024),
+        'workers': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / (1024 * 1024),
+    }
+
+
+def cpu_seconds() -> dict:
+    """User and system CPU time of this process plus its finished children"""
+    if resource is None:
+        times = psutil.Process().cpu_times()
+        return {'user': times.user + times.children_user, 'system': times.system + times.children_system}
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {'user': own.ru_utime + children.ru_utime, 'system': own.ru_stime + children.ru_stime}
+
+
+def output_size_mb(sink: str, db_path: str, parquet_dir: str) -> float:
+    """On-disk size of the sink: DuckDB file plus WAL, or every file of the Parquet dataset"""
+    if sink == 'duckdb':
+        paths = [p for p in (db_path, db_path + '.wal') if os.path.exists(p)]
+    else:
+        paths = [os.path.join(root, name) for root, _, names in os.walk(parquet_dir) for name in names]
+    return sum(os.path.getsize(p) for p in paths) / (1024 * 1024)
+
+
+def run(start: datetime, end: datetime, workers: int = 1, sink: str = 'duckdb', seed: int = DEFAULT_SEED,
+        db_path: str = None, parquet_dir: str = PARQUET_DATASET,
+        memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB, optimize: bool = False, quiet: bool = False) -> dict:
+    """Run the generation pipeline end to end and return the report"""
+    import main  # imported here so --help stays fast
+
+    db_path = db_path or main.SALES_TIMESERIES_DB
+    wall_start = time.perf_counter()
+    cpu_start = cpu_seconds()
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        date_ranges = main.split_datetime_range(start, end)
+        summary = main.generate_initial_data1(date_ranges, is_initial_generation=False, workers=workers, seed=seed,
+                                              db_path=db_path, sink=sink, parquet_dir=parquet_dir,
+                                              memory_budget_mb=memory_budget_mb)
+        advice = None
+        if optimize and sink == 'duckdb':
+            optimize_start = time.perf_counter()
+            advice = main.optimize_database(db_path)
+            optimize_seconds = time.perf_counter() - optimize_start
+    wall = time.perf_counter() - wall_start
+    cpu_end = cpu_seconds()
+    rss = peak_rss_mb()
+
+    rows = summary['total_rows']
+    report = {
+        'start': f"{start:%Y-%m-%d}",
+        'end': f"{end:%Y-%m-%d}",
+        'sink': sink,
+        'output': db_path if sink == 'duckdb' else parquet_dir,
+        'seed': seed,
+        'workers': workers,
+        'memory_budget_mb': memory_budget_mb,
+        'rows': rows,
+        'days': summary['days'],
+        'skipped_days': summary.get('skipped_days', 0),
+        'wall_seconds': round(wall, 3),
+        'rows_per_sec': round(rows / wall, 1) if wall > 0 else None,
+        'cpu_user_seconds': round(cpu_end['user'] - cpu_start['user'], 3),
+        'cpu_system_seconds': round(cpu_end['system'] - cpu_start['system'], 3),
+        'peak_rss_mb': round(rss['main'], 1),
+        'peak_worker_rss_mb': round(rss['workers'], 1) if rss['workers'] is not None else None,
+        'output_size_mb': round(output_size_mb(sink, db_path, parquet_dir), 3),
+    }
+    if advice is not None:
+        report['optimize_seconds'] = round(optimize_seconds, 3)
+        report['indexes_kept'] = [result['index_name'] for result in advice if result['kept']]
+    return report
+
+
+def print_report(report: dict) -> None:
+    """Human-readable throughput and resource report"""
+    print("\n📋 Generation report")
+    print(f"   Range:       {report['start']} to {report['end']} (seed {report['seed']})")
+    print(f"   Sink:        {report['sink']} → {report['output']}")
+    print(f"   Rows:        {report['rows']:,} over {report['days']:,} days"
+          + (f" ({report['skipped_days']:,} days already done)" if report['skipped_days'] else ""))
+    print(f"   Wall time:   {report['wall_seconds']:.2f}s")
+    print(f"   Throughput:  {report['rows_per_sec'] or 0:,.0f} rows/sec with {report['workers']} worker(s)")
+    print(f"   CPU time:    {report['cpu_user_seconds']:.2f}s user, {report['cpu_system_seconds']:.2f}s system")
+    workers_rss = f", {report['peak_worker_rss_mb']:,.0f} MB per worker" \
+        if report['workers'] > 1 and report['peak_worker_rss_mb'] is not None else ""
+    print(f"   Peak RSS:    {report['peak_rss_mb']:,.0f} MB main{workers_rss} (budget {report['memory_budget_mb']:,.0f} MB)")
+    print(f"   Output size: {report['output_size_mb']:,.2f} MB")
+    if 'optimize_seconds' in report:
+        print(f"   Optimize:    {report['optimize_seconds']:.2f}s, indexes kept: {', '.join(report['indexes_kept']) or 'none'}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate sales data end to end without prompts")
+    parser.add_argument('--start', type=parse_date, required=True, help="First day (YYYY-MM-DD)")
+    parser.add_argument('--end', type=parse_date, required=True, help="Last day (YYYY-MM-DD)")
+    parser.add_argument('--workers', type=int, default=1, help="Generator worker processes")
+    parser.add_argument('--sink', choices=SINKS, default='duckdb')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--db', dest='db_path', help="DuckDB file for --sink duckdb (default: src/sales_timeseries.db)")
+    parser.add_argument('--parquet-dir', default=PARQUET_DATASET, help="Dataset directory for --sink parquet")
+    parser.add_argument('--memory-budget-mb', type=float, default=DEFAULT_MEMORY_BUDGET_MB)
+    parser.add_argument('--optimize', action='store_true',
+                        help="Cluster sales_fact by date and run the index advisor after generating (duckdb sink)")
+    parser.add_argument('--json', metavar='PATH', help="Also write the report as JSON ('-' for stdout)")
+    parser.add_argument('--quiet', action='store_true', help="Only print the final report")
+    args = parser.parse_args(argv)
+
+    if args.end < args.start:
+        parser.error("--end must not be before --start")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    try:
+        report = run(args.start, args.end, workers=args.workers, sink=args.sink, seed=args.seed,
+                     db_path=args.db_path, parquet_dir=args.parquet_dir,
+                     memory_budget_mb=args.memory_budget_mb, optimize=args.optimize, quiet=args.quiet)
+    except Exception as e:
+        print(f"❌ Generation failed: {e}", file=sys.stderr)
+        return 1
+
+    print_report(report)
+    if args.json == '-':
+        print(json.dumps(report, indent=2))
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import math
+
+import numpy as np
+
+
+# HyperLogLog with 2^14 one-byte registers: 16 KB per sketch, ~0.8% standard error
+HLL_PRECISION = 14
+HLL_REGISTERS = 1 << HLL_PRECISION
+_RANK_BITS = 64 - HLL_PRECISION
+
+
+def empty_sketch() -> np.ndarray:
+    return np.zeros(HLL_REGISTERS, dtype=np.uint8)
+
+
+def add_hashes(sketch: np.ndarray, hashes: np.ndarray) -> np.ndarray:
+    """Add 64-bit hashes (e.g. DuckDB hash()) to the sketch in place and return it"""
+    if len(hashes) == 0:
+        return sketch
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    index = (hashes >> np.uint64(_RANK_BITS)).astype(np.intp)
+    rest = hashes & np.uint64((1 << _RANK_BITS) - 1)
+    # rest < 2^50 is exact as a float64, so frexp's exponent is its bit length
+    _, bit_length = np.frexp(rest.astype(np.float64))
+    rank = (_RANK_BITS + 1 - bit_length).astype(np.uint8)
+    np.maximum.at(sketch, index, rank)
+    return sketch
+
+
+def entry_sql(value: str) -> str:
+    """SQL of the register entry (register * 64 + rank) that a value sets, the same as add_hashes(hash(value))"""
+    hashed = f"hash({value})"
+    rest = f"({hashed} & {(1 << _RANK_BITS) - 1})"
+    log2 = f"CAST(floor(log2({rest})) AS INTEGER)"
+    # log2 of a double may round up just below a power of two; the shift test takes that back
+    return (
+        f"CAST({hashed} >> {_RANK_BITS} AS INTEGER) * 64 + CASE WHEN {rest} = 0 THEN {_RANK_BITS + 1} "
+        f"ELSE {_RANK_BITS} - {log2} + CASE WHEN (CAST(1 AS UBIGINT) << {log2}) > {rest} THEN 1 ELSE 0 END END"
+    )
+
+
+def registers_sql(value: str, source: str, where: str = None) -> str:
+    """SQL of the non-empty (register, rank) pairs of the sketch of value's non-NULL values: at most 2^14 rows"""
+    condition = f"{value} IS NOT NULL" + (f" AND ({where})" if where else "")
+    return f"""
+        SELECT entry // 64 AS register, CAST(MAX(entry % 64) AS UTINYINT) AS rank
+        FROM (SELECT {entry_sql(value)} AS entry FROM {source} WHERE {condition})
+        GROUP BY register
+    """
+
+
+def from_registers(registers: dict) -> np.ndarray:
+    """Sketch from the fetchnumpy() result of registers_sql"""
+    sketch = empty_sketch()
+    sketch[np.asarray(registers['register'], dtype=np.intp)] = np.asarray(registers['rank'], dtype=np.uint8)
+    return sketch
+
+
+def count_sql(entries: str) -> str:
+    """SQL of estimate() over a list of entry_sql values, e.g. flatten(list(sketch)) merging several sketches"""
+    m = HLL_REGISTERS
+    alpha = 0.7213 / (1 + 1.079 / m)
+    return f"""(
+        SELECT CAST(round(CASE WHEN raw <= 2.5 * {m} AND filled < {m} THEN {m} * ln({m} / ({m} - filled)) ELSE raw END) AS BIGINT)
+        FROM (
+            SELECT COUNT(*) AS filled, CAST({alpha} AS DOUBLE) * {m} * {m} / ({m} - COUNT(*) + COALESCE(SUM(pow(2.0, -rank)), 0)) AS raw
+            FROM (SELECT entry // 64 AS register, MAX(entry % 64) AS rank FROM unnest({entries}) AS registers(entry) GROUP BY register)
+        )
+    )"""
+
+
+def merge(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Sketch of the union of two sketches"""
+    return np.maximum(a, b)
+
+
+def estimate(sketch: np.ndarray) -> int:
+    """Estimated number of distinct values added to the sketch"""
+    m = HLL_REGISTERS
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -sketch.astype(np.int32)))
+    zeros = int(np.count_nonzero(sketch == 0))
+    if raw <= 2.5 * m and zeros:
+        # Linear counting is more accurate while many registers are still empty
+        return int(round(m * math.log(m / zeros)))
+    return int(round(raw))
+
+
+def to_bytes(sketch: np.ndarray) -> bytes:
+    return sketch.tobytes()
+
+
+def from_bytes(data) -> np.ndarray:
+    """Sketch from a stored BLOB; empty or missing data gives an empty sketch"""
+    if not data:
+        return empty_sketch()
+    return np.frombuffer(bytes(data), dtype=np.uint8).copy()
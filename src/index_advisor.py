@@ -0,0 +1,147 @@
+import statistics
+import time
+
+from storage import INDEX_ADVICE_SQL
+
+
+# Keep an index only when it makes its point lookups at least this much faster
+MIN_SPEEDUP = 1.5
+TIMING_REPEATS = 5
+SAMPLE_QUANTILES = [0.1, 0.5, 0.9]
+
+# Indexes that could serve the point-lookup endpoints of app.py. Each candidate
+# is timed on the endpoint queries it could speed up, with $1 bound to sample
+# values taken at SAMPLE_QUANTILES of the looked-up column.
+INDEX_CANDIDATES = [
+    {
+        'name': 'idx_date',
+        'table': 'sales_fact',
+        'column': 'date',
+        'samples': "SELECT UNNEST(quantile_disc(CAST(date AS DATE), {quantiles})) FROM sales_fact",
+        'lookups': {
+            # /sales/by-date/{target_date}
+            'sales_by_date': """
+                SELECT COUNT(*), SUM(total_amount_per_product_sgd), COUNT(DISTINCT customer_id),
+                       COUNT(DISTINCT receipt_number), AVG(receipt_total_sgd)
+                FROM sales_data
+                WHERE date >= CAST($1 AS DATE) AND date < CAST($1 AS DATE) + INTERVAL 1 DAY
+            """,
+        },
+    },
+    {
+        'name': 'idx_customer',
+        'table': 'sales_fact',
+        'column': 'customer_id',
+        'samples': "SELECT UNNEST(quantile_disc(customer_id, {quantiles})) FROM sales_fact",
+        'lookups': {
+            # /customers/{customer_id}
+            'customer_summary': """
+                SELECT COUNT(*), SUM(total_amount_per_product_sgd), COUNT(DISTINCT receipt_number), MIN(date), MAX(date)
+                FROM sales_data
+                WHERE customer_id = $1
+            """,
+            'customer_recent': """
+                SELECT product_name, units_sold, total_amount_per_product_sgd, date
+                FROM sales_data
+                WHERE customer_id = $1
+                ORDER BY date DESC
+                LIMIT 10
+            """,
+        },
+    },
+    {
+        'name': 'idx_receipt',
+        'table': 'sales_fact',
+        'column': 'receipt_number',
+        'samples': "SELECT UNNEST(quantile_disc(receipt_number, {quantiles})) FROM sales_fact",
+        'lookups': {
+            # /receipts/{receipt_number}
+            'receipt_details': """
+                SELECT date, transaction_id, customer_id, receipt_number, product_id, product_name,
+                       units_sold, unit_price_sgd, total_amount_per_product_sgd, receipt_total_sgd
+                FROM sales_data
+                WHERE receipt_number = $1
+                ORDER BY product_name
+            """,
+        },
+    },
+    {
+        'name': 'idx_product',
+        'table': 'sales_fact',
+        'column': 'product_key',
+        'samples': "SELECT UNNEST(quantile_disc(product_id, {quantiles})) FROM dim_product",
+        'lookups': {
+            # /sales/?product_id=...
+            'sales_by_product': """
+                SELECT date, transaction_id, customer_id, product_id, units_sold, total_amount_per_product_sgd
+                FROM sales_data
+                WHERE product_id = $1
+                ORDER BY date
+                LIMIT 50
+            """,
+        },
+    },
+]
+
+
+def sample_values(con, candidate: dict) -> list:
+    """Lookup values spread over the column, so timings are not biased to one end of the table"""
+    sql = candidate['samples'].format(quantiles=SAMPLE_QUANTILES)
+    return [row[0] for row in con.execute(sql).fetchall() if row[0] is not None]
+
+
+def time_lookups(con, candidate: dict, values: list, repeats: int = TIMING_REPEATS) -> float:
+    """Median wall time in ms of the candidate's lookups over all sample values"""
+    timings = []
+    for sql in candidate['lookups'].values():
+        for value in values:
+            con.execute(sql, [value]).fetchall()  # warm-up
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                con.execute(sql, [value]).fetchall()
+                timings.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(timings)
+
+
+def advise_indexes(con, min_speedup: float = MIN_SPEEDUP, repeats: int = TIMING_REPEATS) -> list:
+    """Time each candidate index on its point lookups and keep only those that pay off.
+
+    Every candidate is measured without and with the index; indexes below
+    min_speedup are dropped again. The timings are stored in index_advice and
+    returned as a list of dicts.
+    """
+    con.execute(INDEX_ADVICE_SQL)
+    results = []
+    for candidate in INDEX_CANDIDATES:
+        values = sample_values(con, candidate)
+        if not values:
+            continue
+        con.execute(f"DROP INDEX IF EXISTS {candidate['name']}")
+        before_ms = time_lookups(con, candidate, values, repeats)
+        con.execute(f"CREATE INDEX {candidate['name']} ON {candidate['table']} ({candidate['column']})")
+        after_ms = time_lookups(con, candidate, values, repeats)
+        speedup = before_ms / after_ms if after_ms > 0 else float('inf')
+        kept = speedup >= min_speedup
+        if not kept:
+            con.execute(f"DROP INDEX {candidate['name']}")
+        results.append({
+            'index_name': candidate['name'],
+            'table_name': candidate['table'],
+            'column_name': candidate['column'],
+            'lookups': ', '.join(candidate['lookups']),
+            'before_ms': round(before_ms, 3),
+            'after_ms': round(after_ms, 3),
+            'speedup': round(speedup, 2),
+            'kept': kept,
+        })
+        print(f"{'✅ Keeping' if kept else '🗑️ Dropping'} {candidate['name']}: "
+              f"{before_ms:.2f} ms → {after_ms:.2f} ms ({speedup:.2f}x) on {', '.join(candidate['lookups'])}")
+
+    con.execute("DELETE FROM index_advice")
+    for result in results:
+        con.execute(
+            "INSERT INTO index_advice VALUES (?, ?, ?, ?, ?, ?, ?, ?, current_localtimestamp())",
+            [result['index_name'], result['table_name'], result['column_name'], result['lookups'],
+             result['before_ms'], result['after_ms'], result['speedup'], result['kept']]
+        )
+    return results
@@ -1,16 +1,25 @@
-import json
 import duckdb
 #import antigravity
 from datetime import datetime, timedelta
-import random
-from tqdm import tqdm
 import os, time, glob
 import sys
 from pprint import pprint
 from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import deque
+from contextlib import nullcontext
+import multiprocessing
 from load_csv_to_df import load_csv_to_df
 from retail_menu import RetailMenu
 from io import StringIO
+from batch_generator import generate_batch, generate_chunk, count_days, DEFAULT_SEED
+from parquet_sink import PARQUET_DATASET, chunk_label, generate_parquet_chunk, parquet_dataset_source, write_parquet_chunk
+from memory_governor import DEFAULT_MEMORY_BUDGET_MB, MemoryGovernor
+from storage import CLUSTER_ORDER, CLUSTER_ORDER_WITH_CUSTOMER, MIGRATION_BATCH_ROWS, append_sales, cluster_sales_fact, drop_schema, drop_star_indexes, ensure_schema, get_schema_version, migrate_schema, object_type, read_table_stats
+from index_advisor import advise_indexes
+from writer_service import connect_writable, running_writer, stop_writers, writer_client
+from dataset import SalesDataset, open_dataset
+from sql_filters import SALES_DATA_FILTERS, compile_filters, execute
+from query_router import report_plan
 
 
 OUTPUT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))  # Ensure OUTPUT_ROOT points to 'csvanalyzer' folder
@@ -24,8 +33,8 @@ SPLIT_CSV_FOLDER = 'SPLITCSV'  #
 SPLIT_CSV_FILES = os.path.join(SRC_FILES, 'SPLITCSV')
 #output of split zlib files
 ZLIB_FILES = os.path.join(OUTPUT_ROOT, 'src', 'ZLIB')
-# Deprecated: PARQUET functionality removed but kept for legacy compatibility
-PARQUET_FILES = os.path.join(OUTPUT_ROOT, 'src', 'DEPRECATED_PARQUET')
+# Parquet output: hive-partitioned (year=/month=) dataset written by the generator
+PARQUET_FILES = os.path.join(OUTPUT_ROOT, 'src', 'PARQUET')
 
 CSV_FILE_EXTENSION = 'csv' 
 ZLIB_FILE_EXTENSION = 'zlib'
@@ -174,114 +183,205 @@ def ask_parameters():
         return date_ranges
 
 
-def generate_initial_data1(date_ranges:object, is_initial_generation:bool):
-    """Generate data directly to DuckDB database - no parquet intermediary"""
+def iter_generated_chunks(date_ranges, seed:int=DEFAULT_SEED, workers:int=1, worker=generate_chunk, worker_args:tuple=()):
+    """Yield (index, start_date, end_date, result) in chunk order, running worker ahead in worker processes.
+
+    worker receives (start_date, end_date, seed, max_transactions_per_day, *worker_args);
+    the default worker returns the generated batch. date_ranges may be a lazy
+    iterable; it is only consumed as far as the window of chunks in flight.
+    """
+    tasks = ((start_date, end_date, seed, MAX_TRANSACTIONS_PER_DAY, *worker_args) for start_date, end_date in date_ranges)
+
+    if workers <= 1:
+        for i, task in enumerate(tasks):
+            yield i, task[0], task[1], worker(task)
+        return
+
+    # Spawn (not fork) so workers never inherit DuckDB threads or open connections
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+        # Keep a bounded window of chunks in flight and hand them to the writer in order
+        pending = deque()
+        i = 0
+        for task in tasks:
+            pending.append((task, executor.submit(worker, task)))
+            if len(pending) >= workers * 2:
+                task, future = pending.popleft()
+                yield i, task[0], task[1], future.result()
+                i += 1
+        while pending:
+            task, future = pending.popleft()
+            yield i, task[0], task[1], future.result()
+            i += 1
+
+
+def uncovered_ranges(date_ranges, done):
+    """Parts of date_ranges (whole days) not covered by the completed (start_date, end_date) chunks in done"""
+    done = sorted(done)
+    # Merge adjacent input ranges first so each completed chunk is visited once per merged range
+    merged = []
+    for range_start, range_end in sorted(date_ranges):
+        if merged and range_start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+        else:
+            merged.append((range_start, range_end))
+    uncovered = []
+    for range_start, range_end in merged:
+        start_date = range_start
+        for done_start, done_end in done:
+            if done_end < start_date or done_start > range_end:
+                continue
+            if done_start > start_date:
+                uncovered.append((start_date, done_start - timedelta(days=1)))
+            start_date = max(start_date, done_end + timedelta(days=1))
+        if start_date <= range_end:
+            uncovered.append((start_date, range_end))
+    return uncovered
+
+
+def generate_initial_data1(date_ranges:object, is_initial_generation:bool, workers:int=1, seed:int=DEFAULT_SEED, db_path:str=SALES_TIMESERIES_DB, sink:str='duckdb', parquet_dir:str=PARQUET_DATASET, memory_budget_mb:float=DEFAULT_MEMORY_BUDGET_MB):
+    """Generate data directly to DuckDB database, or to a partitioned Parquet dataset with sink='parquet'.
+
+    With workers > 1 the chunks are generated concurrently in worker processes,
+    while this process stays the only writer and appends them in chunk order.
+    The output is identical for any number of workers. The Parquet sink has no
+    single-file lock, so there each worker writes its own chunk files.
+
+    date_ranges only decides which days are generated: a MemoryGovernor sizes
+    the chunks to memory_budget_mb (RSS) and adapts them while the run goes.
+    Every chunk is committed together with its generation_manifest entry, so
+    rerunning an interrupted generation skips the days already finished.
+
+    Returns the loaded dataset for an initial generation, otherwise a summary
+    dict of the run (rows, days, seconds, rows/sec, peak RSS).
+    """
+    if sink == 'parquet':
+        return generate_parquet_dataset(date_ranges, workers=workers, seed=seed, parquet_dir=parquet_dir)
     
-    print(f'📊 Generating data for {len(date_ranges)} date ranges directly to DuckDB')
+    total_days = sum(count_days(start_date, end_date) for start_date, end_date in date_ranges)
+    print(f'📊 Generating data for {total_days:,} days directly to DuckDB')
     
-    # Initialize the database table once (will be created by first save_to_duckdb_table call)
-    print("🔧 Database table will be created automatically on first data save...")
+    governor = MemoryGovernor(memory_budget_mb, in_flight=workers * 2 if workers > 1 else 1)
+    print(f"🧠 Memory budget: {memory_budget_mb:,.0f} MB RSS, first chunks of {governor.chunk_days()} days")
     
-    # Process chunks sequentially to avoid database locking issues
     total_rows = 0
-    print("🔄 Processing chunks sequentially to avoid database conflicts...")
-    
-    for i, (start_date, end_date) in enumerate(date_ranges):
-        print(f"📊 Processing chunk {i+1}/{len(date_ranges)}: {start_date} to {end_date}")
-        
-        # Generate data and save directly to DuckDB
-        chunk_result = generate_initial_data2(str(start_date), str(end_date), True, SALES_TIMESERIES_DB)
-        
-        if chunk_result and isinstance(chunk_result, dict):
-            rows = chunk_result.get('total_transactions', 0)
-            total_rows += rows
-            print(f"✅ Processed chunk {i+1}: {rows:,} transactions saved to DuckDB")
-        elif chunk_result:
-            # Handle in-memory data (fallback)
-            rows = len(chunk_result) if hasattr(chunk_result, '__len__') else 0
+    if workers > 1:
+        print(f"🔄 Generating chunks with {workers} worker processes, single writer appends in order...")
+    else:
+        print("🔄 Processing chunks sequentially...")
+
+    generation_start = time.perf_counter()
+    # Appends go through the writer service (the shared one if running); every chunk is a single bulk append
+    with writer_client(db_path, memory_limit=governor.duckdb_memory_limit) as writer:
+        governor.track_writer(writer.stats()['pid'])
+        # Resume: days recorded in the manifest for this seed were fully committed before
+        pending_ranges = uncovered_ranges(date_ranges, writer.completed_chunks(seed))
+        pending_days = sum(count_days(start_date, end_date) for start_date, end_date in pending_ranges)
+        if pending_days < total_days:
+            print(f"⏩ Skipping {total_days - pending_days:,} days already completed in a previous run")
+
+        days_done = 0
+        for i, start_date, end_date, batch in iter_generated_chunks(governor.plan_chunks(pending_ranges), seed=seed, workers=workers):
+            governor.record_batch(len(batch), int(batch.memory_usage(index=True).sum()))
+            # Rows and manifest entry commit together, so an interrupted chunk is redone on restart
+            rows = writer.append_chunk(batch, start_date, end_date, seed)
+            del batch
+            rss = governor.after_flush()
             total_rows += rows
-            print(f"✅ Processed chunk {i+1}: {rows} rows")
+            days_done += count_days(start_date, end_date)
+            print(f"✅ Processed chunk {i+1} ({days_done:,}/{pending_days:,} days): {start_date} to {end_date}, "
+                  f"{rows:,} transactions saved to DuckDB, RSS {rss:,.0f} MB")
 
+    elapsed = time.perf_counter() - generation_start
+    rows_per_sec = total_rows / elapsed if elapsed > 0 else 0
     print(f"🎉 Database generation complete! {total_rows:,} total rows saved directly to DuckDB")
+    print(f"⏱️ {elapsed:.2f}s elapsed ({rows_per_sec:,.0f} rows/sec), peak RSS {governor.peak_rss_mb:,.0f} MB with the writer")
     
-    # Load the data into memory for display if requested
+    # Hand back a lazy read-only dataset for display if requested
     if is_initial_generation:
-        print("🔄 Loading data from DuckDB into memory for display...")
-        return load_dataset_from_duckdb()
-    
-    return None
-    
-def save_to_duckdb_table(source_con, table_name, db_path:str=SALES_TIMESERIES_DB):
-    """Save data from a DuckDB table to persistent database using pure DuckDB operations"""
-    import tempfile
-    import os
-    import time
+        print("🔄 Opening the generated data for display...")
+        return load_dataset_from_duckdb(db_path)
     
-    max_retries = 3
-    retry_delay = 1
+    return {
+        'total_rows': total_rows,
+        'days': pending_days,
+        'skipped_days': total_days - pending_days,
+        'seconds': elapsed,
+        'rows_per_sec': rows_per_sec,
+        'peak_rss_mb': governor.peak_rss_mb,
+        'db_path': db_path
+    }
     
-    for attempt in range(max_retries):
-        try:
-            # Use a short-lived connection to avoid lock conflicts
-            target_con = duckdb.connect(database=db_path, read_only=False)
-            
-            try:
-                # Ensure the sales_data table exists
-                target_con.execute("""
-                    CREATE TABLE IF NOT EXISTS sales_data (
-                        date TIMESTAMP,
-                        transaction_id VARCHAR,
-                        transaction_desc VARCHAR,
-                        customer_id VARCHAR,
-                        age INTEGER,
-                        gender VARCHAR,
-                        receipt_number VARCHAR,
-                        product_id VARCHAR,
-                        product_name VARCHAR,
-                        units_sold INTEGER,
-                        unit_price_sgd DECIMAL(10,2),
-                        total_amount_per_product_sgd DECIMAL(10,2),
-                        receipt_total_sgd DECIMAL(10,2),
-                        country_id VARCHAR,
-                        country VARCHAR,
-                        city VARCHAR,
-                        income DECIMAL(10,2)
-                    )
-                """)
-                
-                # Direct data transfer using DuckDB ATTACH/DETACH
-                try:
-                    # Create a temporary in-memory table from source data
-                    source_data = source_con.execute(f"SELECT * FROM {table_name}").fetchall()
-                    columns = [desc[1] for desc in source_con.execute(f"PRAGMA table_info('{table_name}')").fetchall()]
-                    
-                    if source_data:
-                        # Insert data directly
-                        for row in source_data:
-                            placeholders = ', '.join(['?' for _ in columns])
-                            target_con.execute(f"INSERT INTO sales_data VALUES ({placeholders})", row)
-                    
-                    print(f"✅ Data chunk saved to {db_path}")
-                    return  # Success, exit function
-                    
-                except Exception as inner_e:
-                    print(f"❌ Error during direct data transfer: {inner_e}")
-                    return
-                        
-            finally:
-                # Always close the connection
-                target_con.close()
-                
-        except Exception as e:
-            if "lock" in str(e).lower() and attempt < max_retries - 1:
-                print(f"⚠️ Database locked, retrying in {retry_delay} seconds... (attempt {attempt + 1}/{max_retries})")
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Exponential backoff
-            else:
-                print(f"❌ Error saving chunk to database: {e}")
-                return
+def generate_parquet_dataset(date_ranges, workers:int=1, seed:int=DEFAULT_SEED, parquet_dir:str=PARQUET_DATASET):
+    """Stream generated chunks into a hive-partitioned (year=/month=) zstd Parquet dataset"""
+    print(f'📊 Generating data for {len(date_ranges)} date ranges to Parquet dataset {parquet_dir}')
+
+    total_rows = 0
+    generation_start = time.perf_counter()
+    for i, start_date, end_date, rows in iter_generated_chunks(date_ranges, seed=seed, workers=workers,
+                                                               worker=generate_parquet_chunk, worker_args=(parquet_dir,)):
+        total_rows += rows
+        print(f"✅ Processed chunk {i+1}/{len(date_ranges)}: {start_date} to {end_date}, {rows:,} transactions written to Parquet")
+
+    elapsed = time.perf_counter() - generation_start
+    rows_per_sec = total_rows / elapsed if elapsed > 0 else 0
+    print(f"🎉 Parquet generation complete! {total_rows:,} total rows in {parquet_dir}")
+    print(f"⏱️ {elapsed:.2f}s elapsed ({rows_per_sec:,.0f} rows/sec)")
+    print(f"💡 Query it with: SELECT ... FROM {parquet_dataset_source(parquet_dir)} WHERE year = ... AND month = ...")
+    return {
+        'total_rows': total_rows,
+        'days': sum(count_days(start_date, end_date) for start_date, end_date in date_ranges),
+        'seconds': elapsed,
+        'rows_per_sec': rows_per_sec,
+        'parquet_dir': parquet_dir
+    }
+
+def save_to_duckdb_table(source, table_name=None, db_path:str=SALES_TIMESERIES_DB, writer=None, upsert: bool = True):
+    """Bulk-append a chunk to the persistent sales tables.
+
+    source is a pandas DataFrame or DuckDB relation, or a DuckDB connection
+    together with the name of a table holding the chunk. writer is a
+    WriterClient to use; otherwise the writer of db_path running in any
+    process is used (see writer_service.running_writer), or, when there is
+    none, a direct read-write connection for this call. Errors are printed and
+    raised.
+
+    With upsert (the default) rows whose transaction_id is already stored are
+    skipped, so saving the same chunk twice does not duplicate it.
+    """
+    if hasattr(source, 'execute') and table_name:
+        # Columnar export from the source connection; no per-row round trips
+        source = source.execute(f"SELECT * FROM {table_name}").df()
+    if hasattr(source, 'df'):
+        # Relations are bound to their connection and cannot be sent to another process
+        source = source.df()
+
+    running = None if writer is not None else running_writer(db_path)
+    try:
+        if writer or running:
+            rows = (writer or running).append(source, upsert=upsert)
+        else:
+            with connect_writable(db_path) as con:
+                ensure_schema(con)
+                rows = append_sales(con, source, upsert=upsert)
+        print(f"✅ Data chunk saved to {db_path} ({rows:,} new rows)")
+    except Exception as e:
+        if "lock" in str(e).lower():
+            print("💡 Another process holds the database; concurrent producers should share a writer (python src/writer_service.py DB_PATH)")
+        print(f"❌ Error saving chunk to database: {e}")
+        raise
+    finally:
+        if running is not None:
+            running.close()
 
 def save_to_duckdb(data_source, db_path:str=SALES_TIMESERIES_DB):
+    """Replace the database contents with data_source in a single DuckDB pipeline.
+
+    data_source may be a DataFrame, a DuckDB relation, or the path of a CSV or
+    Parquet file. Missing columns are completed, values sanitized with TRY_CAST
+    and the rows appended to the star schema inside one SQL statement chain over
+    the source, without intermediate DataFrame copies.
+    """
     print("📊 Saving data to DuckDB...")
     
     # Ensure all required columns exist
@@ -292,388 +392,157 @@ def save_to_duckdb(data_source, db_path:str=SALES_TIMESERIES_DB):
         'receipt_total_sgd', 'country_id', 'country', 'city', 'income'
     ]
     
-    # Use DuckDB to handle data processing
-    with duckdb.connect() as temp_con:
-        # Register the data source
-        if hasattr(data_source, 'df'):
-            temp_con.register('source_data', data_source.df())
+    # Create the database and table using manual schema definition instead of inference
+    with connect_writable(db_path) as con:
+        # Files are scanned by DuckDB itself; DataFrames are registered and scanned in place
+        if isinstance(data_source, str):
+            reader = 'read_parquet' if data_source.endswith('.parquet') else 'read_csv_auto'
+            path = data_source.replace("'", "''")
+            con.execute(f"CREATE OR REPLACE TEMP VIEW source_data AS SELECT * FROM {reader}('{path}')")
+        elif hasattr(data_source, 'df'):
+            # A relation belongs to the connection that created it and has to be fetched to cross over
+            con.register('source_data', data_source.df())
         else:
-            temp_con.register('source_data', data_source)
+            con.register('source_data', data_source)
         
         # Check and add missing columns using SQL
-        existing_cols = temp_con.execute("PRAGMA table_info('source_data')").fetchall()
-        existing_col_names = [col[1] for col in existing_cols]
-        
-        select_parts = []
+        existing_col_names = [col[0] for col in con.execute("DESCRIBE SELECT * FROM source_data").fetchall()]
+        columns = {}
         for col in required_columns:
             if col in existing_col_names:
-                select_parts.append(col)
+                columns[col] = col
             else:
                 print(f"⚠️ Adding missing column: {col}")
-                select_parts.append(f"'default_{col}' as {col}")
+                columns[col] = f"'default_{col}'"
         
-        # Create a clean dataset with all required columns
-        clean_sql = f"SELECT {', '.join(select_parts)} FROM source_data"
-        df_all = temp_con.execute(clean_sql).df()
-    
-    # Sanitize data types using DuckDB SQL
-    print("🧹 Sanitizing data types...")
-    
-    with duckdb.connect() as temp_con:
-        temp_con.register('clean_data', df_all)
+        # Sanitize data types using DuckDB SQL; amount columns are reset to zero as specified
+        print("🧹 Sanitizing data types...")
+        con.execute(f"""
+            CREATE OR REPLACE TEMP VIEW clean_data AS
+            SELECT 
+                TRY_CAST({columns['date']} AS TIMESTAMP) as date,
+                CAST({columns['transaction_id']} AS VARCHAR) as transaction_id,
+                CAST({columns['transaction_desc']} AS VARCHAR) as transaction_desc,
+                CAST({columns['customer_id']} AS VARCHAR) as customer_id,
+                COALESCE(TRY_CAST({columns['age']} AS INTEGER), 0) as age,
+                CAST({columns['gender']} AS VARCHAR) as gender,
+                CAST({columns['receipt_number']} AS VARCHAR) as receipt_number,
+                CAST({columns['product_id']} AS VARCHAR) as product_id,
+                CAST({columns['product_name']} AS VARCHAR) as product_name,
+                COALESCE(TRY_CAST({columns['units_sold']} AS INTEGER), 0) as units_sold,
+                0.0 as unit_price_sgd,
+                0.0 as total_amount_per_product_sgd,
+                0.0 as receipt_total_sgd,
+                CAST({columns['country_id']} AS VARCHAR) as country_id,
+                CAST({columns['country']} AS VARCHAR) as country,
+                CAST({columns['city']} AS VARCHAR) as city,
+                COALESCE(TRY_CAST({columns['income']} AS DECIMAL(10,2)), 0.0) as income
+            FROM source_data
+        """)
         
-        # Clean and convert data types using SQL
-        sanitize_sql = """
-        SELECT 
-            TRY_CAST(date AS TIMESTAMP) as date,
-            CAST(transaction_id AS VARCHAR) as transaction_id,
-            CAST(transaction_desc AS VARCHAR) as transaction_desc,
-            CAST(customer_id AS VARCHAR) as customer_id,
-            COALESCE(TRY_CAST(age AS INTEGER), 0) as age,
-            CAST(gender AS VARCHAR) as gender,
-            CAST(receipt_number AS VARCHAR) as receipt_number,
-            CAST(product_id AS VARCHAR) as product_id,
-            CAST(product_name AS VARCHAR) as product_name,
-            COALESCE(TRY_CAST(units_sold AS INTEGER), 0) as units_sold,
-            COALESCE(TRY_CAST(unit_price_sgd AS DECIMAL(10,2)), 0.0) as unit_price_sgd,
-            COALESCE(TRY_CAST(total_amount_per_product_sgd AS DECIMAL(10,2)), 0.0) as total_amount_per_product_sgd,
-            COALESCE(TRY_CAST(receipt_total_sgd AS DECIMAL(10,2)), 0.0) as receipt_total_sgd,
-            CAST(country_id AS VARCHAR) as country_id,
-            CAST(country AS VARCHAR) as country,
-            CAST(city AS VARCHAR) as city,
-            COALESCE(TRY_CAST(income AS DECIMAL(10,2)), 0.0) as income
-        FROM clean_data
-        """
-        df_all = temp_con.execute(sanitize_sql).df()
-    
-    # Data conversion is now handled in the sanitize step above
-    
-    # Reset all amount columns to zero as specified
-    for col in ['unit_price_sgd', 'total_amount_per_product_sgd', 'receipt_total_sgd']:
-        if col in df_all.columns:
-            df_all[col] = 0.0
-    
-    # Income conversion is now handled in the sanitize step above
-    
-    # Country fields as VARCHAR - already handled by the string conversion above
-    
-    # Date conversion is now handled in the sanitize step above
-    
-    # Only keep the required columns in the right order
-    df_all = df_all[required_columns]
-    
-    # Debug information
-    print(f"DataFrame columns: {list(df_all.columns)}")
-    print(f"Number of columns: {len(df_all.columns)}")
-    
-    # Create the database and table using manual schema definition instead of inference
-    with duckdb.connect(database=db_path, read_only=False) as con:
-        # First drop the table if it exists
-        con.execute("DROP TABLE IF EXISTS sales_data")
+        # First drop the existing tables
+        drop_schema(con)
         
-        # Create the table with explicit schema
-        schema_sql = """
-        CREATE TABLE sales_data (
-            date TIMESTAMP,
-            transaction_id VARCHAR,
-            transaction_desc VARCHAR,
-            customer_id VARCHAR,
-            age INTEGER,
-            gender VARCHAR,
-            receipt_number VARCHAR,
-            product_id VARCHAR,
-            product_name VARCHAR,
-            units_sold INTEGER,
-            unit_price_sgd DECIMAL(10,2),
-            total_amount_per_product_sgd DECIMAL(10,2),
-            receipt_total_sgd DECIMAL(10,2),
-            country_id VARCHAR,
-            country VARCHAR,
-            city VARCHAR,
-            income DECIMAL(10,2)
-        )
-        """
-        con.execute(schema_sql)
+        # Create the fact and dimension tables with explicit schema
+        ensure_schema(con)
         
-        # Insert data in batches to handle large datasets
+        # Stream the cleaned view straight into the star schema in one transaction
         print("📥 Inserting data into DuckDB...")
-        batch_size = 10000
-        total_rows = len(df_all)
-        
-        for start_idx in range(0, total_rows, batch_size):
-            end_idx = min(start_idx + batch_size, total_rows)
-            batch_df = df_all.iloc[start_idx:end_idx]
-            
-            # Register the batch as a view
-            con.register('batch_view', batch_df)
-            
-            # Insert the batch
-            try:
-                con.execute("INSERT INTO sales_data SELECT * FROM batch_view")
-                print(f"✅ Inserted rows {start_idx} to {end_idx}")
-            except Exception as e:
-                print(f"❌ Error inserting batch {start_idx}-{end_idx}: {e}")
-                # Try to print the problematic rows for debugging
-                print("First few rows in the problematic batch:")
-                print(batch_df.head())
-        # Create indexes after all data is inserted
-        print("\n📊 Creating indexes...")
-        con.execute("CREATE INDEX idx_date ON sales_data (date)")
-        con.execute("CREATE INDEX idx_customer ON sales_data (customer_id)")
-        con.execute("CREATE INDEX idx_product ON sales_data (product_id)")
-        
-        # Create additional indexes for analytics performance
-        print("📊 Creating additional analytical indexes...")
-        con.execute("CREATE INDEX idx_age ON sales_data (age)")
-        con.execute("CREATE INDEX idx_income ON sales_data (income)")
-        con.execute("CREATE INDEX idx_country ON sales_data (country)")
-        con.execute("CREATE INDEX idx_city ON sales_data (city)")
-        con.execute("CREATE INDEX idx_gender ON sales_data (gender)")
-        con.execute("CREATE INDEX idx_transaction_type ON sales_data (transaction_desc)")
-        
-        # Add an index specifically for hour-based queries
-        print("📅 Creating hour-based index...")
-        con.execute("CREATE INDEX idx_hour ON sales_data (EXTRACT(hour FROM date))")
+        con.execute("BEGIN TRANSACTION")
+        try:
+            # Upsert drops rows repeated within the source by transaction_id
+            total_rows = append_sales(con, 'clean_data', upsert=True)
+            con.execute("COMMIT")
+            print(f"✅ Inserted {total_rows:,} rows")
+        except Exception as e:
+            con.execute("ROLLBACK")
+            print(f"❌ Error inserting data: {e}")
+        finally:
+            con.execute("DROP VIEW IF EXISTS clean_data")
+            if isinstance(data_source, str):
+                con.execute("DROP VIEW IF EXISTS source_data")
+            else:
+                con.unregister('source_data')
+
+        # Sort the fact table for zone-map pruning and keep only indexes that measurably help
+        optimize_storage(con)
         
-        # Get statistics about the table
+        # Get statistics about the table (maintained incrementally by every append)
         print("\n📈 Database statistics:")
-        record_count = con.execute("SELECT COUNT(*) from sales_data").fetchone()[0]
-        revenue = con.execute("SELECT SUM(total_amount_per_product_sgd) from sales_data").fetchone()[0]
-        unique_customers = con.execute("SELECT COUNT(DISTINCT customer_id) from sales_data").fetchone()[0]
-        
+        stats = read_table_stats(con)
         
         print("\n✅ Data saved to sales_timeseries.db database file")
-        print(f"📊 Total records: {record_count:,}")
-        print(f"💰 Total revenue: SGD ${revenue:,.2f}")
-        print(f"👥 Unique customers: {unique_customers:,}")
+        print(f"📊 Total records: {stats['row_count']:,}")
+        print(f"💰 Total revenue: SGD ${stats['revenue_cents'] / 100:,.2f}")
+        print(f"👥 Unique customers: ~{stats['unique_customers']:,}")
        
         print("🎉 Database creation complete!")                 
 
-def generate_initial_data2(start_iteration:str, end_iteration:str, save_to_duckdb=True, db_path=SALES_TIMESERIES_DB):
+def generate_initial_data2(start_iteration:str, end_iteration:str, save_to_duckdb=True, db_path=SALES_TIMESERIES_DB, seed:int=DEFAULT_SEED, sink:str='duckdb', parquet_dir:str=PARQUET_DATASET, memory_budget_mb:float=DEFAULT_MEMORY_BUDGET_MB):
     print("🏪 Retail Sales Database Generator")
     print("=" * 40)
 
-    random.seed(142)
-
-    # Create a date range with hourly frequency
+    # Create a date range with daily frequency
     start_date = datetime.fromisoformat(start_iteration.replace(' ', 'T'))
     end_date = datetime.fromisoformat(end_iteration.replace(' ', 'T'))
-    
-    # Direct DuckDB generation - no parquet files needed
-
-    # Calculate full date range first to get total days
-    # Generate hourly range manually
-    full_range = []
-    current_date = start_date
-    while current_date <= end_date:
-        full_range.append(current_date)
-        current_date += timedelta(days=1)
-    
 
-    # Load dependencies
-    with open('src/cities.json') as f:
-        cities = json.load(f)
-    
-    # Product catalog and other static data definitions remain the same
-    genders = ["M", "F"]
-    products = [
-        {'product_id': 100, 'product_name': 'iPhone 13', 'unit_price': 999.00},
-        {'product_id': 200, 'product_name': 'Samsung Galaxy S21', 'unit_price': 899.00},
-        {'product_id': 300, 'product_name': 'Google Pixel 6', 'unit_price': 599.00},
-        {'product_id': 400, 'product_name': 'OnePlus 9', 'unit_price': 729.00},
-        {'product_id': 500, 'product_name': 'Xiaomi Mi 11', 'unit_price': 749.00},
-        {'product_id': 600, 'product_name': 'Sony Xperia 5', 'unit_price': 899.00},
-        {'product_id': 700, 'product_name': 'Oppo Find X3', 'unit_price': 1149.00},
-        {'product_id': 800, 'product_name': 'Nokia 8.3', 'unit_price': 699.00},
-        {'product_id': 900, 'product_name': 'Realme GT', 'unit_price': 599.00},
-        {'product_id': 1000, 'product_name': 'Water', 'unit_price': 2.00},
-        {'product_id': 1100, 'product_name': 'Sparkling Water', 'unit_price': 2.50},
-        {'product_id': 1200, 'product_name': 'Iced Tea', 'unit_price': 3.00},
-        {'product_id': 1300, 'product_name': 'MacBook Pro', 'unit_price': 2399.00},
-        {'product_id': 1400, 'product_name': 'Dell XPS 13', 'unit_price': 1499.00},
-        {'product_id': 1500, 'product_name': 'HP Spectre x360', 'unit_price': 1699.00},
-        {'product_id': 1600, 'product_name': 'Lenovo ThinkPad X1', 'unit_price': 1899.00},
-        {'product_id': 1700, 'product_name': 'iPad Pro', 'unit_price': 1099.00},
-        {'product_id': 1800, 'product_name': 'Samsung Galaxy Tab S7', 'unit_price': 849.00},
-        {'product_id': 1900, 'product_name': 'Microsoft Surface Pro 7', 'unit_price': 999.00},
-        {'product_id': 2000, 'product_name': 'Amazon Kindle', 'unit_price': 89.00}
-    ]
-    transaction_types = ['Product Sale',
-                         'Product Refund',
-                         'Product Exchange'
-                        ]
-    
-    # Database tasks moved outside the loop
-    print("💾 Database will be initialized after data generation.")
-    
-    # Process in chunks
-    customer_id = 100001
-    receipt_id = 200001
-    transaction_id = 300001
-    
-    # Define the header as a dictionary
-    header = {
-        'date': 'date',
-        'transaction_id': 'transaction_id',
-        'transaction_desc': 'transaction_desc',
-        'customer_id': 'customer_id',
-        'age': 'age',
-        'gender': 'gender',
-        'receipt_number': 'receipt_number',
-        'product_id': 'product_id',
-        'product_name': 'product_name',
-        'units_sold': 'units_sold',
-        'unit_price_sgd': 'unit_price_sgd',
-        'total_amount_per_product_sgd': 'total_amount_per_product_sgd',
-        'receipt_total_sgd': 'receipt_total_sgd',
-        'country_id': 'country_id',
-        'country': 'country',
-        'city': 'city',
-        'income': 'income'
-    }
+    # Without a sink the caller wants the whole range in memory as one columnar batch
+    if not save_to_duckdb and sink != 'parquet':
+        print(f"⚡ Generating {count_days(start_date, end_date)} days of transactions as a columnar batch...")
+        generation_start = time.perf_counter()
+        batch = generate_batch(start_date, end_date, seed=seed, max_transactions_per_day=MAX_TRANSACTIONS_PER_DAY)
+        elapsed = time.perf_counter() - generation_start
+        rows_per_sec = len(batch) / elapsed if elapsed > 0 else 0
+        print(f"✅ Generated {len(batch):,} transactions in {elapsed:.2f}s ({rows_per_sec:,.0f} rows/sec)")
+        return batch
 
-    # Initialize batch processing variables for direct DuckDB insertion
-    all_transactions = []
+    # Otherwise generate in chunks sized to the memory budget and flush each one to the sink
+    governor = MemoryGovernor(memory_budget_mb)
+    print(f"⚡ Generating {count_days(start_date, end_date)} days of transactions in chunks within {memory_budget_mb:,.0f} MB RSS...")
+    generation_start = time.perf_counter()
     total_transactions = 0
-    
-    print(f"⚡ Processing {len(full_range)} time periods with memory-efficient batching...")
-    
-    # Monitor memory usage during generation
-    progress_bar = tqdm(full_range, desc="Generating data")
-    
-    for date_idx, date in enumerate(progress_bar):
-        # Check memory usage periodically
-        if date_idx % 100 == 0:  # Check every 100 iterations
-            current_memory = get_memory_usage()
-            if current_memory > 0:
-                progress_bar.set_postfix(memory=f"{current_memory:.0f}MB")
-                
-                # Warning if memory usage is getting high (over 1GB)
-                if current_memory > 1024:
-                    print(f"\n⚠️ High memory usage detected: {current_memory:.0f}MB")
-                    print("Consider reducing date range or stopping generation")
-        
-        #build age
-        age_ranges = [18, 25, 35, 45, 55, 65, 75]
-        age_weights = [0.05, 0.20, 0.25, 0.25, 0.15, 0.08, 0.02]
-        age_range_start = random.choices(age_ranges, weights=age_weights)[0]
-        age = random.randint(age_range_start, min(age_range_start + 10, 80))
-        
-        #build city
-        city = random.choice([city['name'] for city in cities])
-        selected_city = next(item for item in cities if item['name'] == city)
-        
-        #build country 
-        country_id = selected_city['country_id']
-        country = selected_city['country']
-        
-        transaction_type = transaction_types[random.choices([0,1,2], weights=[0.95,0.025,0.025])[0]]
-        
-        #build income
-        incomes =[30_000,40_000,50_000,60_000,70_000,80_000,90_000,100_000,120_000,150_000,200_000]
-        income = int(random.choice(range(min(incomes), max(incomes))))
-        
-        
-        #build product 
-        product_id =1
-        product = random.choice([p['product_name'] for p in products])
-        
-        units_sold = random.randint(1, 13)  # 1-13 units per item
-        unit_price = random.choice([2345,3398,1234,2234,678,890,456,234,567,890,345,1234,5678,2345,3787])
-        #unit_price =  np.random.choice([p['unit_price'] for p in products])    
-        total_amount_per_product = units_sold * unit_price
-        receipt_total = 0
-                    
-      #             # Add hour variation throughout the day
-      # hour = random.randint(6, 21)  # Store days 6 AM to 10 PM
-      # minute = random.randint(0, 59)
-      # second = random.randint(0, 59)
-        
-        # Generate fewer transactions per time period to reduce memory usage
-        num_transactions = random.randint(1, MAX_TRANSACTIONS_PER_DAY)
-        
-        for tx_num in range(num_transactions):
-            # Create transaction with some time variation
-           # hour_offset = random.randint(0, 23)
-           # minute_offset = random.randint(0, 59)
-            transaction_datetime = date + timedelta(days=1)
-            transaction_id = random.randint(1000000, 9999999)
-            
-            transaction_record = {
-                'date': transaction_datetime,
-                'transaction_id': transaction_id,
-                'transaction_desc': transaction_type,
-                'customer_id': str(customer_id),
-                'age': age,
-                'gender': random.choice(genders),
-                'receipt_number': f'{transaction_id+receipt_id}',
-                'product_id': product_id,
-                'product_name': product,
-                'units_sold': units_sold,
-                'unit_price_sgd': round(unit_price, 2),
-                'total_amount_per_product_sgd': round(total_amount_per_product, 2),
-                'receipt_total_sgd': 0,
-                'country_id': country_id,
-                'country': country,
-                'city': city,
-                'income': income
-            }
-            
-            all_transactions.append(transaction_record)
-            total_transactions += 1
-            
-            customer_id += 1
-            receipt_id += 1
-            transaction_id += 1
-    
-    print(f"✅ Generated {total_transactions:,} transactions for direct DuckDB insertion")
-    
-    # Save directly to DuckDB if requested
-    if save_to_duckdb and all_transactions:
-        print(f"💾 Saving {len(all_transactions):,} transactions directly to DuckDB...")
-        
-        try:
-            # Convert to DuckDB relation in temporary connection
-            temp_con = duckdb.connect()
-            
-            # Create relation from dictionary list
-            if all_transactions:
-                # Get column names from first record
-                columns = list(all_transactions[0].keys())
-                
-                # Create table schema
-                temp_con.execute(f"""
-                    CREATE TABLE chunk_data (
-                        {', '.join([f"{col} VARCHAR" for col in columns])}
-                    )
-                """)
-                
-                # Insert data row by row
-                for row in all_transactions:
-                    values = [str(row.get(col, '')) for col in columns]
-                    placeholders = ', '.join(['?' for _ in columns])
-                    temp_con.execute(f"INSERT INTO chunk_data VALUES ({placeholders})", values)
-            
-            # Save to persistent database
-            save_to_duckdb_table(temp_con, 'chunk_data', db_path)
-            
-            # Close temporary connection
-            temp_con.close()
-            
-            return {
-                'total_transactions': len(all_transactions),
-                'start_date': str(start_date),
-                'end_date': str(end_date),
-                'saved_to_db': True
-            }
-        except Exception as e:
-            print(f"❌ Error in generate_initial_data2: {e}")
-            return all_transactions
+    # One writer service for every DuckDB chunk of the run (the shared one if running)
+    writer_scope = writer_client(db_path, memory_limit=governor.duckdb_memory_limit) if sink != 'parquet' else nullcontext()
+    with writer_scope as writer:
+        if writer is not None:
+            governor.track_writer(writer.stats()['pid'])
+        for chunk_start, chunk_end in governor.plan_chunks([(start_date, end_date)]):
+            batch = generate_batch(chunk_start, chunk_end, seed=seed, max_transactions_per_day=MAX_TRANSACTIONS_PER_DAY)
+            governor.record_batch(len(batch), int(batch.memory_usage(index=True).sum()))
+            if len(batch) == 0:
+                continue
+
+            if sink == 'parquet':
+                # Stream the chunk to the partitioned Parquet dataset
+                print(f"💾 Writing {len(batch):,} transactions ({chunk_start:%Y-%m-%d} to {chunk_end:%Y-%m-%d}) to Parquet dataset {parquet_dir}...")
+                write_parquet_chunk(batch, parquet_dir, chunk_label(chunk_start, chunk_end))
+            else:
+                # Save directly to DuckDB
+                print(f"💾 Saving {len(batch):,} transactions ({chunk_start:%Y-%m-%d} to {chunk_end:%Y-%m-%d}) directly to DuckDB...")
+                try:
+                    save_to_duckdb_table(batch, db_path=db_path, writer=writer)
+                except Exception as e:
+                    print(f"❌ Error in generate_initial_data2: {e}")
+                    return batch
+
+            total_transactions += len(batch)
+            del batch
+            governor.after_flush()
+
+    elapsed = time.perf_counter() - generation_start
+    rows_per_sec = total_transactions / elapsed if elapsed > 0 else 0
+    print(f"✅ Generated and saved {total_transactions:,} transactions in {elapsed:.2f}s ({rows_per_sec:,.0f} rows/sec), peak RSS {governor.peak_rss_mb:,.0f} MB with the writer")
+
+    result = {
+        'total_transactions': total_transactions,
+        'start_date': str(start_date),
+        'end_date': str(end_date),
+    }
+    if sink == 'parquet':
+        result['saved_to_parquet'] = parquet_dir
     else:
-        # Return transaction data for memory processing
-        return all_transactions
-            
-            # After every 10 days, save to database to avoid memory issues                    
+        result['saved_to_db'] = True
+    return result
 
 def initialize_database():
     # After all chunks, process and insert into database
@@ -683,14 +552,6 @@ def initialize_database():
    
 
 
-def legacy_parquet_function_removed():
-    """
-    Parquet functionality has been removed - use direct DuckDB generation instead
-    """
-    print("❌ Parquet functionality has been removed.")
-    print("💡 Use option 1 to generate data directly to DuckDB database.")
-    return False
-
 def load_dataset(mydf) -> None:
     """Display dataset from memory connection or DuckDB relation"""
     # If there is dataset in memory, display it as a table
@@ -698,8 +559,12 @@ def load_dataset(mydf) -> None:
         print("📊 Displaying Dataset from Memory")
         print("=" * 40)
         try:
-            # Check if it's a DuckDB connection or relation
-            if hasattr(mydf, 'execute'):
+            # Check if it's a lazy dataset, a DuckDB connection or a relation
+            if isinstance(mydf, SalesDataset):
+                print(mydf.head(10).df())
+                print(f"\nTotal rows: {mydf.count():,}")
+
+            elif hasattr(mydf, 'execute'):
                 # It's a connection, check for dataset table
                 tables = mydf.execute("SHOW TABLES").fetchall()
                 table_name = 'dataset'
@@ -731,7 +596,7 @@ def load_dataset(mydf) -> None:
                 # It's a DuckDB relation
                 df_sample = mydf.limit(10).df()
                 print(df_sample)
-                print(f"\nTotal rows: {len(mydf.df()):,}")
+                print(f"\nTotal rows: {mydf.aggregate('COUNT(*)').fetchone()[0]:,}")
                 
         except Exception as e:
             print(f"Error displaying dataset: {e}")
@@ -740,55 +605,18 @@ def load_dataset(mydf) -> None:
      
     # If no data in memory, suggest loading
     print("❌ No dataset in memory.")
-    print("💡 Use option 1 to generate data or option 3 to load from parquet files.")
+    print("💡 Use option 1 to generate data or option 2 to load it from DuckDB.")
     return None
    
     
 
-def load_dataset_from_duckdb(db_path=SALES_TIMESERIES_DB) -> duckdb.DuckDBPyConnection:
-    print("🔄 Loading dataset from DuckDB database...")
-    try:
-        # Use a fresh connection that we can return for memory operations
-        con = duckdb.connect()
-        
-        # Check if source database exists
-        import os
-        if not os.path.exists(db_path):
-            print(f"❌ Database file {db_path} not found.")
-            return None
-            
-        # Load data from the persistent database into memory connection using ATTACH
-        con.execute(f"ATTACH '{db_path}' AS source_db (READ_ONLY)")
-        
-        # Check if sales_data table exists using DuckDB's PRAGMA
-        try:
-            # Try to access the table directly - if it doesn't exist, this will fail
-            test_result = con.execute("SELECT COUNT(*) FROM source_db.sales_data LIMIT 1").fetchone()
-            print(f"📊 Found sales_data table with data in database")
-        except Exception as table_error:
-            print("❌ No sales_data table found in database.")
-            print(f"   Error: {table_error}")
-            con.execute("DETACH source_db")
-            return None
-            
-        # Create dataset table from sales_data
-        con.execute("CREATE TABLE dataset AS SELECT * FROM source_db.sales_data")
-        con.execute("DETACH source_db")
-        
-        # Verify data was loaded
-        row_count = con.execute("SELECT COUNT(*) FROM dataset").fetchone()[0]
-        print(f"✅ Dataset loaded from DuckDB into memory: {row_count:,} rows")
-        return con
-        
-    except Exception as e:
-        print(f"❌ Error loading dataset from DuckDB: {e}")
-        # If database doesn't exist or has no data, return empty connection
-        try:
-            con = duckdb.connect()
-            con.execute("CREATE TABLE dataset AS SELECT 1 as dummy WHERE 1=0")  # Empty table with no rows
-            return con
-        except:
-            return None
+def load_dataset_from_duckdb(db_path=SALES_TIMESERIES_DB):
+    """Open db_path as a lazy read-only SalesDataset; nothing is copied into memory"""
+    print("🔄 Opening dataset from DuckDB database...")
+    dataset = open_dataset(db_path)
+    if dataset is not None:
+        print(f"✅ Dataset ready (read-only, lazy): {dataset.count():,} rows in {db_path}")
+    return dataset
 
 def clear_database_locks():
     """Force clear any database locks by ensuring all connections are closed"""
@@ -893,57 +721,37 @@ def display_database_indexes(db_path=SALES_TIMESERIES_DB):
                 else:
                     print(f"  {idx+1}. {row}")
             
-            # List the indexes we've created
+            # List the indexes kept by the index advisor, with its before/after timings
             print("\n🔑 Indexed Fields:")
-            print("  1. Date (idx_date)")
-            print("    - Purpose: Optimize date-based filtering and time series analysis")
-            print("    - Example: SELECT * FROM sales_data WHERE date = '[first_date]'")
-            
-            print("  2. Customer ID (idx_customer)")
-            print("    - Purpose: Speed up customer-specific queries")
-            print("    - Example: SELECT * FROM sales_data WHERE customer_id = '100001'")
-            
-            print("  3. Product ID (idx_product)")
-            print("    - Purpose: Enhance product-based filtering")
-            print("    - Example: SELECT * FROM sales_data WHERE product_id = '100'")
-            
-            print("  4. Age (idx_age)")
-            print("    - Purpose: Improve demographic analysis")
-            print("    - Example: SELECT * FROM sales_data WHERE age BETWEEN 25 AND 40")
-            
-            print("  5. Income (idx_income)")
-            print("    - Purpose: Speed up income-based segmentation")
-            print("    - Example: SELECT * FROM sales_data WHERE income > 50000")
-            
-            print("  6. Country (idx_country)")
-            print("    - Purpose: Optimize geographical queries")
-            print("    - Example: SELECT * FROM sales_data WHERE country = 'Singapore'")
+            indexes = con.execute("SELECT index_name, table_name, sql FROM duckdb_indexes() ORDER BY index_name").fetchall()
+            for idx, (index_name, table_name, sql) in enumerate(indexes):
+                print(f"  {idx+1}. {index_name} on {table_name}")
+                print(f"    - {sql}")
+            if not indexes:
+                print("  (none) - sales_fact is clustered by date, so zone maps prune date range scans")
             
-            print("  7. City (idx_city)")
-            print("    - Purpose: Enhance location-based analysis")
-            print("    - Example: SELECT * FROM sales_data WHERE city = 'New York'")
+            if object_type(con, 'index_advice'):
+                print("\n⏱️ Index advisor timings (point lookups used by the API):")
+                advice = con.execute("""
+                    SELECT index_name, column_name, lookups, before_ms, after_ms, speedup, kept, measured_at
+                    FROM index_advice ORDER BY index_name
+                """).fetchall()
+                for index_name, column_name, lookups, before_ms, after_ms, speedup, kept, measured_at in advice:
+                    print(f"  {'✅' if kept else '🗑️'} {index_name} ({column_name}): {before_ms:.2f} ms → {after_ms:.2f} ms "
+                          f"({speedup:.2f}x) on {lookups}, measured {measured_at}")
             
-            print("  8. Gender (idx_gender)")
-            print("    - Purpose: Speed up gender-based filtering")
-            print("    - Example: SELECT * FROM sales_data WHERE gender = 'F'")
+            # Explain how the storage layout serves queries
+            print("\n📈 Storage layout:")
+            print("  • sales_fact is physically ordered by date; min/max zone maps skip row groups outside a date range")
+            print("  • Analytical scans read only the columns they need and do not use ART indexes")
+            print("  • Indexes are kept only where the advisor measured a speedup on the API point lookups")
+            print("  • Run option O to re-cluster and re-measure after large loads")
             
-            print("  9. Transaction Type (idx_transaction_type)")
-            print("    - Purpose: Improve transaction type filtering")
-            print("    - Example: SELECT * FROM sales_data WHERE transaction_desc = 'Product Sale'")
-            
-            print("  10. Hour (idx_hour)")
-            print("    - Purpose: Optimize hour-of-day analysis")
-            print("    - Example: SELECT * FROM sales_data WHERE EXTRACT(hour FROM date) = 12")
-            
-            # Explain how indexes improve query performance
-            print("\n📈 Benefits of Database Indexes:")
-            print("  • Faster query execution for filtered and aggregated data")
-            print("  • Improved performance for JOIN operations")
-            print("  • More efficient sorting and grouping")
-            print("  • Better time series analysis capabilities")
+            print("\n🔍 Sample queries: 1. Date  2. Customer ID  3. Product ID  4. Age  5. Income")
+            print("                   6. Country  7. City  8. Gender  9. Transaction Type  10. Hour")
             while True:
-                #ask 1-10 and run indexed query
-                choice = input("\nEnter an index number (1-10) to run a sample query, or 'q' to quit: ")
+                #ask 1-10 and run sample query
+                choice = input("\nEnter a sample query number (1-10), or 'q' to quit: ")
                 if choice.lower() == 'q':
                     break
                 try:
@@ -969,24 +777,25 @@ def display_database_indexes(db_path=SALES_TIMESERIES_DB):
                         first_city = 'New York'
                         first_transaction = 'Product Sale'
                     
-                    # Map index number to sample queries using actual data values
-                    sample_queries = {
-                        1: f"SELECT COUNT(*) FROM sales_data WHERE DATE(date) = '{first_date}'",
-                        2: f"SELECT COUNT(*) FROM sales_data WHERE customer_id = '{first_customer}'",
-                        3: f"SELECT COUNT(*) FROM sales_data WHERE product_id = '{first_product}'",
-                        4: "SELECT COUNT(*) FROM sales_data WHERE age BETWEEN 25 AND 40",
-                        5: "SELECT COUNT(*) FROM sales_data WHERE income > 50000",
-                        6: f"SELECT COUNT(*) FROM sales_data WHERE country = '{first_country}'",
-                        7: f"SELECT COUNT(*) FROM sales_data WHERE city = '{first_city}'",
-                        8: "SELECT COUNT(*) FROM sales_data WHERE gender = 'F'",
-                        9: f"SELECT COUNT(*) FROM sales_data WHERE transaction_desc = '{first_transaction}'",
-                        10: "SELECT COUNT(*) FROM sales_data WHERE EXTRACT(hour FROM date) = 12"
+                    # Map index number to sample filters using actual data values
+                    sample_filters = {
+                        1: {'date': first_date},
+                        2: {'customer_id': first_customer},
+                        3: {'product_id': first_product},
+                        4: {'min_age': 25, 'max_age': 40},
+                        5: {'income_above': 50000},
+                        6: {'country': first_country},
+                        7: {'city': first_city},
+                        8: {'gender': 'F'},
+                        9: {'transaction_desc': first_transaction},
+                        10: {'hour': 12}
                     }
 
-                    # Run the selected sample query
-                    query = sample_queries[index_num]
-                    print(f"\n🔍 Running query: {query}")
-                    result = con.execute(query).fetchall()
+                    # Run the selected sample query with its values bound as parameters
+                    where_clause, params = compile_filters(SALES_DATA_FILTERS, sample_filters[index_num])
+                    query = f"SELECT COUNT(*) FROM sales_data{where_clause}"
+                    print(f"\n🔍 Running query: {query}  {params}")
+                    result = execute(con, query, params).fetchall()
                     for row in result:
                         print(f"  {row[0]}")
                 except Exception as e:
@@ -1042,140 +851,27 @@ def display_db_views(db_path=SALES_TIMESERIES_DB):
         {
             "name": "Monthly Sales Trends",
             "description": "Shows revenue and customer trends by month with growth percentages",
-            "sql": """
-                WITH monthly_sales AS (
-                    SELECT 
-                        DATE_TRUNC('month', date) AS month,
-                        SUM(total_amount_per_product_sgd) AS revenue,
-                        COUNT(DISTINCT customer_id) AS customers
-                    FROM sales_data
-                    GROUP BY DATE_TRUNC('month', date)
-                    ORDER BY month
-                ),
-                with_prev AS (
-                    SELECT 
-                        month, 
-                        revenue,
-                        customers,
-                        LAG(revenue) OVER (ORDER BY month) AS prev_revenue,
-                        LAG(customers) OVER (ORDER BY month) AS prev_customers
-                    FROM monthly_sales
-                )
-                SELECT 
-                    month,
-                    revenue,
-                    customers,
-                    prev_revenue,
-                    prev_customers,
-                    CASE 
-                        WHEN prev_revenue IS NULL THEN NULL
-                        WHEN prev_revenue = 0 THEN 
-                            CASE 
-                                WHEN revenue = 0 THEN 0
-                                ELSE 100 -- from zero to something is 100% growth
-                            END
-                        ELSE ((revenue - prev_revenue) / prev_revenue) * 100 
-                    END AS revenue_change_pct,
-                    CASE
-                        WHEN prev_customers IS NULL THEN NULL
-                        WHEN prev_customers = 0 THEN 
-                            CASE
-                                WHEN customers = 0 THEN 0
-                                ELSE 100
-                            END
-                        ELSE ((customers - prev_customers) / prev_customers) * 100
-                    END AS customer_change_pct
-                FROM with_prev
-                ORDER BY month
-            """
+            "report": 'monthly_trends'
         },
         {
             "name": "Customer Demographics Analysis",
             "description": "Segments customers by age groups and gender with spending patterns",
-            "sql": """
-                SELECT 
-                    CASE 
-                        WHEN age BETWEEN 18 AND 25 THEN '18-25'
-                        WHEN age BETWEEN 26 AND 35 THEN '26-35'
-                        WHEN age BETWEEN 36 AND 45 THEN '36-45'
-                        WHEN age BETWEEN 46 AND 55 THEN '46-55'
-                        WHEN age BETWEEN 56 AND 65 THEN '56-65'
-                        WHEN age > 65 THEN '65+'
-                        ELSE 'Unknown'
-                    END AS age_group,
-                    gender,
-                    COUNT(DISTINCT customer_id) AS customer_count,
-                    AVG(income) AS avg_income,
-                    SUM(total_amount_per_product_sgd) AS total_spent,
-                    SUM(total_amount_per_product_sgd) / COUNT(DISTINCT customer_id) AS avg_spent_per_customer
-                FROM sales_data
-                GROUP BY age_group, gender
-                ORDER BY age_group, gender
-            """
+            "report": 'customer_demographics'
         },
         {
             "name": "Top Products by Revenue",
             "description": "Shows the best-selling products with sales metrics",
-            "sql": """
-                SELECT 
-                    product_id,
-                    product_name,
-                    COUNT(*) AS transaction_count,
-                    SUM(units_sold) AS total_units_sold,
-                    SUM(total_amount_per_product_sgd) AS total_revenue,
-                    AVG(unit_price_sgd) AS avg_price
-                FROM sales_data
-                GROUP BY product_id, product_name
-                ORDER BY total_revenue DESC
-                LIMIT 20
-            """
+            "report": 'top_products'
         },
         {
             "name": "Hourly Sales Distribution",
             "description": "Analyzes sales patterns by hour of day",
-            "sql": """
-                SELECT 
-                    EXTRACT(hour FROM date) AS hour_of_day,
-                    COUNT(*) AS transaction_count,
-                    SUM(total_amount_per_product_sgd) AS total_revenue,
-                    COUNT(DISTINCT customer_id) AS unique_customers
-                FROM sales_data
-                GROUP BY hour_of_day
-                ORDER BY hour_of_day
-            """
+            "report": 'hourly_distribution'
         },
         {
             "name": "Geographic Sales Distribution",
             "description": "Shows sales by country and city with rankings",
-            "sql": """
-                WITH country_sales AS (
-                    SELECT 
-                        country,
-                        COUNT(*) AS transactions,
-                        COUNT(DISTINCT customer_id) AS customers,
-                        SUM(total_amount_per_product_sgd) AS total_revenue
-                    FROM sales_data
-                    GROUP BY country
-                ),
-                ranked_countries AS (
-                    SELECT 
-                        country,
-                        transactions,
-                        customers,
-                        total_revenue,
-                        RANK() OVER (ORDER BY total_revenue DESC) as revenue_rank
-                    FROM country_sales
-                )
-                SELECT
-                    country,
-                    transactions,
-                    customers,
-                    total_revenue,
-                    revenue_rank
-                FROM ranked_countries
-                ORDER BY revenue_rank
-                LIMIT 15
-            """
+            "report": 'geographic_distribution'
         },
         {
             "name": "High-Value vs Low-Value Transactions",
@@ -1183,16 +879,12 @@ def display_db_views(db_path=SALES_TIMESERIES_DB):
             "sql": """
                 WITH transaction_values AS (
                     SELECT
-                        date,
-                        transaction_id,
-                        customer_id,
-                        age,
-                        gender,
-                        country,
-                        city,
-                        total_amount_per_product_sgd,
-                        NTILE(10) OVER (ORDER BY total_amount_per_product_sgd) AS value_decile
-                    FROM sales_data
+                        f.customer_id,
+                        c.age,
+                        f.total_amount_cents,
+                        NTILE(10) OVER (ORDER BY f.total_amount_cents) AS value_decile
+                    FROM sales_fact f
+                    LEFT JOIN dim_customer c ON c.customer_id = f.customer_id
                 )
                 SELECT
                     CASE 
@@ -1202,10 +894,10 @@ def display_db_views(db_path=SALES_TIMESERIES_DB):
                     COUNT(*) AS transaction_count,
                     COUNT(DISTINCT customer_id) AS unique_customers,
                     AVG(age) AS avg_customer_age,
-                    AVG(total_amount_per_product_sgd) AS avg_transaction_value,
-                    SUM(total_amount_per_product_sgd) AS total_revenue,
-                    (SUM(total_amount_per_product_sgd) / COUNT(*)) / 
-                        (SELECT AVG(total_amount_per_product_sgd) FROM sales_data) AS relative_to_average
+                    AVG(total_amount_cents) / 100.0 AS avg_transaction_value,
+                    SUM(total_amount_cents) / 100.0 AS total_revenue,
+                    (SUM(total_amount_cents) / 100.0 / COUNT(*)) / 
+                        (SELECT AVG(total_amount_cents) / 100.0 FROM sales_fact) AS relative_to_average
                 FROM transaction_values
                 WHERE value_decile IN (1, 10)
                 GROUP BY value_segment
@@ -1215,38 +907,7 @@ def display_db_views(db_path=SALES_TIMESERIES_DB):
         {
             "name": "Income Level Analysis",
             "description": "Segments customers by income levels with purchasing patterns",
-            "sql": """
-                WITH income_segments AS (
-                    SELECT
-                        CASE
-                            WHEN income < 30000 THEN 'Low Income (< 30k)'
-                            WHEN income BETWEEN 30000 AND 60000 THEN 'Middle Income (30k-60k)'
-                            WHEN income BETWEEN 60001 AND 100000 THEN 'Upper Middle (60k-100k)'
-                            WHEN income > 100000 THEN 'High Income (>100k)'
-                            ELSE 'Unknown'
-                        END AS income_segment,
-                        customer_id,
-                        total_amount_per_product_sgd
-                    FROM sales_data
-                )
-                SELECT
-                    income_segment,
-                    COUNT(DISTINCT customer_id) AS customer_count,
-                    COUNT(*) AS transaction_count,
-                    SUM(total_amount_per_product_sgd) AS total_revenue,
-                    AVG(total_amount_per_product_sgd) AS avg_transaction_value,
-                    SUM(total_amount_per_product_sgd) / COUNT(DISTINCT customer_id) AS avg_spent_per_customer
-                FROM income_segments
-                GROUP BY income_segment
-                ORDER BY 
-                    CASE 
-                        WHEN income_segment = 'Low Income (< 30k)' THEN 1
-                        WHEN income_segment = 'Middle Income (30k-60k)' THEN 2
-                        WHEN income_segment = 'Upper Middle (60k-100k)' THEN 3
-                        WHEN income_segment = 'High Income (>100k)' THEN 4
-                        ELSE 5
-                    END
-            """
+            "report": 'income_levels'
         }
     ]
     
@@ -1296,8 +957,16 @@ def display_db_views(db_path=SALES_TIMESERIES_DB):
             
             try:
                 with duckdb.connect(db_path, read_only=True) as con:
+                    # Reports are routed to the smallest aggregate that can answer them
+                    if 'report' in selected_view:
+                        plan = report_plan(con, selected_view['report'])
+                        view_sql, view_params = plan.sql, plan.params
+                        print(f"📦 Source: {plan.source}")
+                    else:
+                        view_sql, view_params = selected_view['sql'], []
+
                     # Run the SQL query and get results without DataFrame
-                    query_result = con.execute(selected_view['sql'])
+                    query_result = con.execute(view_sql, view_params)
                     columns = [desc[0] for desc in query_result.description] if hasattr(query_result, 'description') else []
                     rows = query_result.fetchall()
                     
@@ -1330,7 +999,7 @@ def display_db_views(db_path=SALES_TIMESERIES_DB):
                             
                             # Save to workspace directory using DuckDB
                             save_path = os.path.join(os.path.dirname(db_path), csv_filename)
-                            con.execute(f"COPY ({selected_view['sql']}) TO '{save_path}' (FORMAT CSV, HEADER)")
+                            con.execute(f"COPY ({view_sql}) TO '{save_path}' (FORMAT CSV, HEADER)", view_params)
                             print(f"✅ Results saved to: {save_path}")
                         
                         # Offer insights based on the view
@@ -1468,6 +1137,49 @@ def display_db_saved_queries(db_path=SALES_TIMESERIES_DB):
     except Exception as e:
         print(f"❌ Error accessing database: {e}")
 
+def optimize_storage(con, cluster_by_customer:bool=False) -> list:
+    """Cluster sales_fact by date (optionally date, customer_id) and rebuild only the indexes the advisor keeps"""
+    dropped = drop_star_indexes(con)
+    if dropped:
+        print(f"🗑️ Dropped {len(dropped)} existing indexes: {', '.join(dropped)}")
+    cluster_sales_fact(con, CLUSTER_ORDER_WITH_CUSTOMER if cluster_by_customer else CLUSTER_ORDER)
+    print("⏱️ Timing candidate indexes on the API point lookups...")
+    return advise_indexes(con)
+
+def optimize_database(db_path=SALES_TIMESERIES_DB, cluster_by_customer:bool=False):
+    """Run the storage optimize step on an existing database"""
+    if not os.path.exists(db_path):
+        print(f"❌ Database file not found: {db_path}")
+        return None
+    try:
+        with duckdb.connect(db_path) as con:
+            ensure_schema(con)
+            results = optimize_storage(con, cluster_by_customer=cluster_by_customer)
+            kept = [r['index_name'] for r in results if r['kept']]
+            print(f"🎉 Storage optimized, indexes kept: {', '.join(kept) if kept else 'none'}")
+            return results
+    except Exception as e:
+        print(f"❌ Error optimizing database: {e}")
+        return None
+
+def migrate_database(db_path=SALES_TIMESERIES_DB, batch_rows:int=MIGRATION_BATCH_ROWS):
+    """Rewrite an existing database to the current schema version in batches"""
+    if not os.path.exists(db_path):
+        print(f"❌ Database file not found: {db_path}")
+        return
+    try:
+        with duckdb.connect(db_path) as con:
+            version = get_schema_version(con)
+            if version is None:
+                print("ℹ️ Database has no sales tables, nothing to migrate")
+            elif version == 0:
+                ensure_schema(con)
+            else:
+                migrate_schema(con, batch_rows=batch_rows)
+            con.execute("CHECKPOINT")
+    except Exception as e:
+        print(f"❌ Error migrating database: {e}")
+
 def clear_database():
     """Clear/reset the DuckDB database by deleting all data"""
     import os
@@ -1482,7 +1194,7 @@ def clear_database():
                 # Try to connect and drop the table first
                 try:
                     conn = duckdb.connect(SALES_TIMESERIES_DB)
-                    conn.execute("DROP TABLE IF EXISTS sales_data")
+                    drop_schema(conn)
                     conn.close()
                     print("✅ Database table cleared successfully")
                 except Exception as e:
@@ -1512,6 +1224,9 @@ def clear_database_locks():
     import gc
     import os
     
+    # Writer services own the read-write connection; stopping them commits their queue and releases the lock
+    stop_writers()
+    
     # Force garbage collection to clean up any unclosed connections
     gc.collect()
     
@@ -1652,8 +1367,8 @@ def main():
     while True:
         print("\n🔄 Options:")
         print("   1️⃣  Generate sample dataset directly to DuckDB")
-        print("    2. Load dataset from DuckDB to memory")
-        print("    3. [REMOVED] Parquet functionality removed")
+        print("    2. Open dataset from DuckDB (lazy, read-only)")
+        print("    3. Generate sample dataset to partitioned Parquet files")
         print("    4. Display dataset on screen")
         print("    5. Display database statistics")
         print("    6. Display database indexes")
@@ -1663,33 +1378,46 @@ def main():
         print("   10. Save dataset to csv file (export)")
         print("    C. Clear/Reset database (delete all data)")
         print("    L. Clear database locks")
+        print("    M. Migrate database to the current schema version")
+        print("    O. Optimize storage (cluster by date, keep only useful indexes)")
         print("    0. Exit")
 
-        choice = input("\nSelect option (0-9, C, L): ").strip().lower()
+        choice = input("\nSelect option (0-9, C, L, M, O): ").strip().lower()
+
+        if choice in ('1', 'c', 'l', 'm', 'o') and df_all is not None:
+            # Writes need the file to themselves; the dataset reopens lazily on next use
+            df_all.close()
 
         if choice == '1':
             mydates = ask_parameters()
+            workers_input = input(f"Worker processes [default: 1, max: {os.cpu_count()}]: ").strip()
+            workers = int(workers_input) if workers_input.isdigit() and int(workers_input) > 0 else 1
+            budget_input = input(f"Memory budget in MB [default: {DEFAULT_MEMORY_BUDGET_MB}]: ").strip()
+            memory_budget_mb = int(budget_input) if budget_input.isdigit() and int(budget_input) > 0 else DEFAULT_MEMORY_BUDGET_MB
             is_initial_generation = True
-            df_all = generate_initial_data1(mydates, is_initial_generation=is_initial_generation)
+            df_all = generate_initial_data1(mydates, is_initial_generation=is_initial_generation, workers=workers, memory_budget_mb=memory_budget_mb)
             #start = input("Enter start datetime (YYYY-MM-DD HH:MM:SS) [default: 1900-01-01 00:00:00]: ").strip() or '1900-01-01 00:00:00'
             #end = input("Enter end datetime (YYYY-MM-DD HH:MM:SS) [default: 2025-09-02 23:00:00]: ").strip() or '2025-09-02 23:00:00'
             #print("⚡ Generating new database...")
         
         elif choice == '2':
-            print("🔄 Loading dataset from DuckDB database to memory...")
+            if df_all is not None:
+                df_all.close()
             df_all = load_dataset_from_duckdb()
         
         elif choice == '3':
-            print('❌ Parquet functionality has been removed.')
-            print('💡 Use option 1 to generate data directly to DuckDB database.')
+            mydates = ask_parameters()
+            workers_input = input(f"Worker processes [default: 1, max: {os.cpu_count()}]: ").strip()
+            workers = int(workers_input) if workers_input.isdigit() and int(workers_input) > 0 else 1
+            generate_initial_data1(mydates, is_initial_generation=False, workers=workers, sink='parquet')
 
         elif choice == '4':
             print("\n📊 Displaying Sample Dataset")
             print("=" * 40)
             if df_all is not None:
                 # Show first 10 rows using DuckDB without creating DataFrame
-                sample_results = df_all.execute("SELECT * FROM dataset LIMIT 10").fetchall()
-                columns = [desc[1] for desc in df_all.execute("PRAGMA table_info('dataset')").fetchall()]
+                sample_results = df_all.head(10).fetchall()
+                columns = df_all.columns
                 
                 # Print header
                 print(" | ".join(f"{col[:15]:<15}" for col in columns))
@@ -1699,7 +1427,7 @@ def main():
                 for row in sample_results:
                     print(" | ".join(f"{str(val)[:15]:<15}" for val in row))
                 
-                row_count = df_all.execute("SELECT COUNT(*) FROM dataset").fetchone()[0]
+                row_count = df_all.count()
                 print(f"\nTotal rows: {row_count:,}")
             else:
                 print("No data loaded. Please load or generate dataset first.")
@@ -1730,25 +1458,21 @@ def main():
                     # Check if sales_data table exists
                     tables = con.execute("SHOW TABLES").fetchall()
                     if any('sales_data' in str(table) for table in tables):
-                        # Show table stats
-                        row_count = con.execute("SELECT COUNT(*) FROM sales_data").fetchone()[0]
-                        print(f"📈 Total records: {row_count:,}")
-                        
-                        # Date range
-                        date_stats = con.execute("SELECT MIN(date) as min_date, MAX(date) as max_date FROM sales_data").fetchone()
-                        print(f"📅 Date range: {date_stats[0]} to {date_stats[1]}")
-                        
-                        # Revenue stats
-                        revenue_stats = con.execute("SELECT SUM(total_amount_per_product_sgd) as total_revenue, AVG(total_amount_per_product_sgd) as avg_revenue FROM sales_data").fetchone()
-                        print(f"💰 Total revenue: ${revenue_stats[0]:,.2f}")
-                        print(f"💰 Average transaction: ${revenue_stats[1]:,.2f}")
-                        
-                        # Customer stats
-                        customer_count = con.execute("SELECT COUNT(DISTINCT customer_id) FROM sales_data").fetchone()[0]
-                        print(f"👥 Unique customers: {customer_count:,}")
+                        # Headline numbers come from table_stats, kept up to date by every append
+                        stats = read_table_stats(con)
+                        if stats is None:
+                            print("⚠️ No table_stats yet, it is created on the next write")
+                        else:
+                            print(f"📈 Total records: {stats['row_count']:,}")
+                            print(f"📅 Date range: {stats['min_date']} to {stats['max_date']}")
+                            print(f"💰 Total revenue: ${stats['revenue_cents'] / 100:,.2f}")
+                            if stats['row_count']:
+                                print(f"💰 Average transaction: ${stats['revenue_cents'] / 100 / stats['row_count']:,.2f}")
+                            print(f"👥 Unique customers: ~{stats['unique_customers']:,} (estimate)")
+                            print(f"🧾 Unique receipts: ~{stats['unique_receipts']:,} (estimate)")
                         
                         # Product stats
-                        product_count = con.execute("SELECT COUNT(DISTINCT product_id) FROM sales_data").fetchone()[0]
+                        product_count = con.execute("SELECT COUNT(DISTINCT product_key) FROM sales_fact").fetchone()[0]
                         print(f"🛍️ Unique products: {product_count:,}")
                         
                     else:
@@ -1786,7 +1510,7 @@ def main():
             else:
                 print("📤 Export Dataset to CSV")
                 print("=" * 25)
-                df_all.execute("COPY dataset TO 'src/exported_dataset.csv' (FORMAT CSV, HEADER)")
+                df_all.relation().write_csv('src/exported_dataset.csv', header=True)
                 print("✅ Dataset exported to 'exported_dataset.csv' in the current directory.")
         elif choice == 'c':
             print("🗑️ Clear/Reset Database")
@@ -1798,6 +1522,13 @@ def main():
         elif choice == 'l':
             clear_database_locks()
             
+        elif choice == 'm':
+            migrate_database()
+            
+        elif choice == 'o':
+            by_customer = input("Also cluster by customer_id within each date? (y/N): ").strip().lower() in ('y', 'yes')
+            optimize_database(cluster_by_customer=by_customer)
+            
         elif choice == '0':
             print("👋 Goodbye!")
             break
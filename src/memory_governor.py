@@ -0,0 +1,102 @@
+import os
+from datetime import timedelta
+
+import psutil
+
+from batch_generator import MAX_TRANSACTIONS_PER_DAY
+
+
+# RSS budget for a generation run; override with CSVANALYZER_MEMORY_BUDGET_MB
+DEFAULT_MEMORY_BUDGET_MB = int(os.environ.get('CSVANALYZER_MEMORY_BUDGET_MB', 1024))
+
+# Share of the budget the generator may plan for; the rest is slack for Python and DuckDB
+BUDGET_HEADROOM = 0.75
+# Share of the budget handed to DuckDB as its memory_limit on the writer connection
+DUCKDB_BUDGET_SHARE = 0.4
+
+# Planning estimate until the first batch has been measured (NumPy/categorical DataFrame)
+INITIAL_BYTES_PER_ROW = 160
+# A batch is briefly held several times over while it is appended (typed view, joins, insert)
+INGEST_OVERHEAD = 3.0
+
+MIN_DAYS_PER_CHUNK = 1
+MAX_DAYS_PER_CHUNK = 3650
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+
+
+def process_rss_mb(pid: int) -> float:
+    """Resident set size of process pid in MB; 0 once it has exited or cannot be inspected"""
+    try:
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return 0.0
+
+
+class MemoryGovernor:
+    """Sizes generation chunks to an RSS budget and adapts them while a run progresses.
+
+    Chunks are planned from the measured size of generated rows, assuming the
+    worst case of MAX_TRANSACTIONS_PER_DAY rows per day. After every flush to
+    the sink the observed RSS is fed back: chunks shrink when the process gets
+    close to the budget and grow back while there is room. The RSS of the
+    writer process (see track_writer) counts against the same budget.
+    """
+
+    def __init__(self, budget_mb: float = DEFAULT_MEMORY_BUDGET_MB, in_flight: int = 1,
+                 min_days: int = MIN_DAYS_PER_CHUNK, max_days: int = MAX_DAYS_PER_CHUNK):
+        self.budget_mb = budget_mb
+        self.in_flight = max(1, in_flight)
+        self.min_days = min_days
+        self.max_days = max_days
+        self.bytes_per_row = INITIAL_BYTES_PER_ROW
+        self.baseline_mb = current_rss_mb()
+        self.scale = 1.0
+        self.peak_rss_mb = self.baseline_mb
+        self.writer_pid = None
+
+    @property
+    def duckdb_memory_limit(self) -> str:
+        """memory_limit setting for the writer connection"""
+        return f"{max(64, int(self.budget_mb * DUCKDB_BUDGET_SHARE))}MB"
+
+    def chunk_days(self) -> int:
+        """Days to generate in the next chunk"""
+        available_mb = self.budget_mb * BUDGET_HEADROOM - self.baseline_mb - self.budget_mb * DUCKDB_BUDGET_SHARE
+        bytes_per_day = MAX_TRANSACTIONS_PER_DAY * self.bytes_per_row * INGEST_OVERHEAD
+        # Chunks in flight in worker processes are pickled back to this process before they are written
+        days = available_mb * 1024 * 1024 / (bytes_per_day * self.in_flight) * self.scale
+        return int(min(self.max_days, max(self.min_days, days)))
+
+    def track_writer(self, pid: int) -> None:
+        """Count the RSS of the writer process pid (which holds the DuckDB share of the budget)"""
+        self.writer_pid = pid
+
+    def record_batch(self, rows: int, nbytes: int) -> None:
+        """Refine the per-row estimate from a generated batch (keeps the largest seen)"""
+        if rows > 0:
+            self.bytes_per_row = max(self.bytes_per_row, nbytes / rows)
+
+    def after_flush(self) -> float:
+        """Feed back the RSS after a chunk was written; returns the RSS in MB, the writer's included"""
+        rss = current_rss_mb()
+        if self.writer_pid is not None:
+            rss += process_rss_mb(self.writer_pid)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss)
+        if rss > self.budget_mb * BUDGET_HEADROOM:
+            self.scale = max(self.scale / 2, 1 / self.max_days)
+        elif rss < self.budget_mb * BUDGET_HEADROOM / 2 and self.scale < 1.0:
+            self.scale = min(1.0, self.scale * 2)
+        return rss
+
+    def plan_chunks(self, date_ranges):
+        """Yield (start_date, end_date) chunks covering date_ranges, sized lazily by chunk_days()"""
+        for range_start, range_end in date_ranges:
+            start_date = range_start
+            while start_date <= range_end:
+                end_date = min(range_end, start_date + timedelta(days=self.chunk_days() - 1))
+                yield start_date, end_date
+                start_date = end_date + timedelta(days=1)
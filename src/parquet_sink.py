@@ -0,0 +1,69 @@
+import os
+
+import duckdb
+
+from batch_generator import generate_batch
+
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+PARQUET_DATASET = os.path.join(SOURCE_DIR, 'PARQUET', 'sales_data')
+
+# Parquet layout tuned for DuckDB scans: zstd pages and row groups of 120 vectors
+PARQUET_COMPRESSION = 'zstd'
+PARQUET_ROW_GROUP_SIZE = 122_880
+
+
+def chunk_label(start_date, end_date) -> str:
+    """Stable file name prefix for a generated chunk, so rewriting a chunk replaces its files"""
+    return f"chunk_{start_date:%Y%m%d}_{end_date:%Y%m%d}"
+
+
+def parquet_dataset_source(dataset_dir: str = PARQUET_DATASET) -> str:
+    """SQL table expression reading the hive-partitioned dataset (prunes on year/month)"""
+    return f"read_parquet('{dataset_dir}/**/*.parquet', hive_partitioning = true)"
+
+
+def write_parquet_chunk(source, dataset_dir: str = PARQUET_DATASET, label: str = 'chunk', con=None) -> int:
+    """Write one DataFrame or relation to the dataset, partitioned as year=/month=.
+
+    Only this chunk is held in memory; each chunk lands in its own files, so
+    chunks can be written concurrently and a rewritten chunk overwrites its
+    previous output instead of duplicating it.
+    """
+    os.makedirs(dataset_dir, exist_ok=True)
+    owns_connection = con is None
+    if owns_connection:
+        con = duckdb.connect()
+    try:
+        con.register('parquet_chunk', source)
+        con.execute(f"""
+            COPY (
+                SELECT *, YEAR(date) AS year, MONTH(date) AS month
+                FROM parquet_chunk
+            ) TO '{dataset_dir}' (
+                FORMAT PARQUET,
+                PARTITION_BY (year, month),
+                COMPRESSION {PARQUET_COMPRESSION},
+                ROW_GROUP_SIZE {PARQUET_ROW_GROUP_SIZE},
+                OVERWRITE_OR_IGNORE,
+                FILENAME_PATTERN '{label}_{{i}}'
+            )
+        """)
+        return con.execute("SELECT COUNT(*) FROM parquet_chunk").fetchone()[0]
+    finally:
+        con.unregister('parquet_chunk')
+        if owns_connection:
+            con.close()
+
+
+def generate_parquet_chunk(task: tuple) -> int:
+    """Process-pool entry point: generate a chunk and write it straight to the dataset.
+
+    task is (start_date, end_date, seed, max_transactions_per_day, dataset_dir);
+    returns the number of rows written.
+    """
+    start_date, end_date, seed, max_transactions_per_day, dataset_dir = task
+    batch = generate_batch(start_date, end_date, seed=seed, max_transactions_per_day=max_transactions_per_day)
+    if len(batch) == 0:
+        return 0
+    return write_parquet_chunk(batch, dataset_dir, chunk_label(start_date, end_date))
@@ -0,0 +1,427 @@
+"""Aggregate-aware query routing.
+
+A report asks for measures grouped by dimensions, with optional filters and
+a time grain, without naming a table:
+
+    plan = plan_query(con, ['revenue', 'transactions'], ['country'], grain='month',
+                      filters={'transaction_desc': 'Product Sale'})
+    rows = execute(con, plan.sql, plan.params).fetchall()
+    plan.source  # 'sales_daily_rollup'
+
+plan_query answers from the smallest materialized aggregate that has every
+requested dimension, measure and filter at a fine enough time grain, and
+falls back to the sales_data view when none does (or when the aggregates
+are missing, e.g. a database not yet upgraded). The result columns are the
+grain (named after it), the dimensions and the measures, in that order.
+
+A dimension may also be derived, as (name, template): the template is SQL
+with {dimension} placeholders, e.g. ('senior', "{age} >= 60"). It routes like
+the dimensions it uses.
+
+An aggregate may mark measures it only approximates: the rollup estimates
+customers and receipts by merging the HyperLogLog sketches of its rows (see
+rollups.py). Plans are exact by default; exact=False lets the router also use
+aggregates that approximate a requested measure.
+"""
+import string
+from collections import namedtuple
+
+import hll
+from rollups import AGE_GROUP_SQL, INCOME_BAND_SQL
+from sql_filters import execute
+
+
+TIME_GRAINS = ('hour', 'day', 'week', 'month', 'quarter', 'year')
+
+QueryPlan = namedtuple('QueryPlan', ['sql', 'params', 'source'])
+
+
+class Aggregate:
+    """A relation the router can read, with the SQL of each dimension and measure over it"""
+
+    def __init__(self, name: str, relation: str, dimensions: dict, measures: dict,
+                 time_column: str = None, day_column: str = None, finest_grain: str = None,
+                 table: str = None, approximate=(), required=()):
+        self.name = name
+        self.relation = relation
+        self.dimensions = dimensions
+        self.measures = measures
+        self.time_column = time_column    # timestamp of each row, for grains and date filters
+        self.day_column = day_column      # DATE of each row, when stored as such
+        self.finest_grain = finest_grain  # None: any grain
+        self.table = table                # table whose size ranks the aggregate; None for the fallback
+        self.approximate = set(approximate)
+        self.required = set(required)     # only used when one of these is grouped or filtered on
+
+    def size(self, con):
+        """Estimated row count, or None when the table does not exist"""
+        row = execute(con, "SELECT estimated_size FROM duckdb_tables() WHERE table_name = ?", [self.table]).fetchone()
+        return row[0] if row else None
+
+
+def _banded(dimensions: dict) -> dict:
+    """Add the derived age_group and income_band dimensions where their inputs exist"""
+    dimensions = dict(dimensions)
+    if 'age' in dimensions:
+        dimensions.setdefault('age_group', AGE_GROUP_SQL.format(age=dimensions['age']).strip())
+    if 'income_cents' in dimensions:
+        dimensions.setdefault('income_band', INCOME_BAND_SQL.format(income_cents=dimensions['income_cents']).strip())
+    return dimensions
+
+
+SALES_DATA = Aggregate(
+    'sales_data', 'sales_data',
+    dimensions=_banded({
+        'day': 'CAST(date AS DATE)',
+        'hour_of_day': 'CAST(EXTRACT(hour FROM date) AS INTEGER)',
+        'day_of_week': 'isodow(date)',
+        'day_of_week_text': "upper(strftime(date, '%a'))",
+        'month_of_year': 'month(date)',
+        'month_text': "upper(strftime(date, '%b'))",
+        'year': 'year(date)',
+        'country_id': 'country_id',
+        'country': 'country',
+        'city': 'city',
+        'product_id': 'product_id',
+        'product_name': 'product_name',
+        'customer_id': 'customer_id',
+        'age': 'age',
+        'gender': 'gender',
+        'income_cents': 'CAST(income * 100 AS BIGINT)',
+        'transaction_desc': 'transaction_desc',
+    }),
+    measures={
+        'transactions': 'COUNT(*)',
+        'units_sold': 'CAST(SUM(units_sold) AS BIGINT)',
+        'revenue': 'CAST(SUM(total_amount_per_product_sgd) AS DOUBLE)',
+        'customers': 'COUNT(DISTINCT customer_id)',
+        'receipts': 'COUNT(DISTINCT receipt_number)',
+        'avg_transaction_value': 'CAST(AVG(total_amount_per_product_sgd) AS DOUBLE)',
+        'avg_price': 'CAST(AVG(unit_price_sgd) AS DOUBLE)',
+        'avg_income': 'CAST(AVG(income) AS DOUBLE)',
+        'avg_receipt_total': 'CAST(AVG(receipt_total_sgd) AS DOUBLE)',
+        'avg_age': 'AVG(age)',
+        'min_age': 'MIN(age)',
+        'max_age': 'MAX(age)',
+    },
+    time_column='date',
+)
+
+SALES_DAILY_ROLLUP = Aggregate(
+    'sales_daily_rollup', 'sales_rollup',
+    dimensions=_banded({
+        'day': 'day',
+        'hour_of_day': 'hour',
+        'day_of_week': 'day_of_week',
+        'day_of_week_text': 'day_of_week_text',
+        'month_of_year': 'month',
+        'month_text': 'month_text',
+        'year': 'year',
+        'country_id': 'country_id',
+        'country': 'country',
+        'city': 'city',
+        'product_id': 'product_id',
+        'product_name': 'product_name',
+        'age': 'age',
+        'gender': 'gender',
+        'transaction_desc': 'transaction_desc',
+    }) | {'income_band': 'income_band'},
+    measures={
+        'transactions': 'CAST(SUM(transactions) AS BIGINT)',
+        'units_sold': 'CAST(SUM(units_sold) AS BIGINT)',
+        'revenue': 'SUM(revenue_cents) / 100.0',
+        'customers': hll.count_sql('flatten(list(customer_sketch))'),
+        'receipts': hll.count_sql('flatten(list(receipt_sketch))'),
+        'avg_transaction_value': 'SUM(revenue_cents) / 100.0 / SUM(transactions)',
+        'avg_price': 'SUM(unit_price_cents) / NULLIF(SUM(priced_rows), 0) / 100.0',
+        'avg_income': 'SUM(income_cents) / NULLIF(SUM(income_rows), 0) / 100.0',
+        'avg_receipt_total': 'SUM(receipt_total_cents) / NULLIF(SUM(receipt_rows), 0) / 100.0',
+        'avg_age': 'SUM(age * transactions) / SUM(transactions) FILTER (WHERE age IS NOT NULL)',
+        'min_age': 'MIN(age)',
+        'max_age': 'MAX(age)',
+    },
+    time_column='date', day_column='day', finest_grain='hour',
+    table='sales_daily_rollup', approximate=('customers', 'receipts'),
+)
+
+# One row per customer; only covers sales with a customer_id, so it is only
+# picked for questions about customers
+CUSTOMER_SUMMARY = Aggregate(
+    'customer_summary', 'customer_summary',
+    dimensions=_banded({'customer_id': 'customer_id', 'age': 'age'}),
+    measures={
+        'transactions': 'CAST(SUM(total_sales) AS BIGINT)',
+        'revenue': 'SUM(total_amount_cents) / 100.0',
+        'customers': 'COUNT(*)',
+        'avg_age': 'SUM(age * total_sales) / SUM(total_sales) FILTER (WHERE age IS NOT NULL)',
+        'min_age': 'MIN(age)',
+        'max_age': 'MAX(age)',
+    },
+    table='customer_summary', required=('customer_id',),
+)
+
+# Materialized aggregates the router may pick, and the relation it falls back to
+AGGREGATES = [SALES_DAILY_ROLLUP, CUSTOMER_SUMMARY]
+FALLBACK = SALES_DATA
+
+
+def _dimension_sql(aggregate: Aggregate, dimension):
+    """(name, SQL) of a dimension over aggregate, or None when it cannot provide it"""
+    if isinstance(dimension, str):
+        expression = aggregate.dimensions.get(dimension)
+        return None if expression is None else (dimension, expression)
+    name, template = dimension
+    fields = {field for _, field, _, _ in string.Formatter().parse(template) if field}
+    if not fields <= set(aggregate.dimensions):
+        return None
+    return name, template.format(**{field: aggregate.dimensions[field] for field in fields})
+
+
+def _grain_sql(aggregate: Aggregate, grain: str):
+    """SQL of the grain's period start (TIMESTAMP) over aggregate, or None when it is too coarse"""
+    if aggregate.time_column is None:
+        return None
+    if aggregate.finest_grain is not None and TIME_GRAINS.index(grain) < TIME_GRAINS.index(aggregate.finest_grain):
+        return None
+    column = aggregate.day_column if aggregate.day_column and grain != 'hour' else aggregate.time_column
+    return f"CAST(DATE_TRUNC('{grain}', {column}) AS TIMESTAMP)"
+
+
+def _filter_sql(aggregate: Aggregate, name: str, value):
+    """(condition, params) of one filter over aggregate, or None when it cannot apply it"""
+    if name in ('start_date', 'end_date'):
+        if aggregate.time_column is None:
+            return None
+        if aggregate.day_column:
+            operator = '>=' if name == 'start_date' else '<='
+            return f"{aggregate.day_column} {operator} CAST(? AS DATE)", [value]
+        if name == 'start_date':
+            return f"{aggregate.time_column} >= CAST(? AS DATE)", [value]
+        return f"{aggregate.time_column} < CAST(? AS DATE) + INTERVAL 1 DAY", [value]
+    expression = aggregate.dimensions.get(name)
+    if expression is None:
+        return None
+    if isinstance(value, (list, tuple, set)):
+        values = list(value)
+        return f"{expression} IN ({', '.join('?' * len(values))})", values
+    return f"{expression} = ?", [value]
+
+
+def _build(aggregate: Aggregate, measures, dimensions, filters, grain, exact: bool):
+    """QueryPlan over aggregate, or None when it cannot answer the request"""
+    if exact and aggregate.approximate & set(measures):
+        return None
+    if aggregate.required:
+        used = {d for d in dimensions if isinstance(d, str)} | set(filters)
+        if not aggregate.required & used:
+            return None
+    columns = []
+    if grain:
+        period = _grain_sql(aggregate, grain)
+        if period is None:
+            return None
+        columns.append((grain, period))
+    for dimension in dimensions:
+        column = _dimension_sql(aggregate, dimension)
+        if column is None:
+            return None
+        columns.append(column)
+    conditions, params = [], []
+    for name, value in filters.items():
+        if value is None:
+            continue
+        condition = _filter_sql(aggregate, name, value)
+        if condition is None:
+            return None
+        conditions.append(f"({condition[0]})")
+        params += condition[1]
+    if any(measure not in aggregate.measures for measure in measures):
+        return None
+
+    select = [f"{sql} AS {name}" for name, sql in columns]
+    select += [f"{aggregate.measures[measure]} AS {measure}" for measure in measures]
+    sql = f"SELECT {', '.join(select)} FROM {aggregate.relation}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if columns:
+        positions = ', '.join(str(i) for i in range(1, len(columns) + 1))
+        sql += f" GROUP BY {positions} ORDER BY {positions}"
+    return QueryPlan(sql, params, aggregate.name)
+
+
+def _check(measures, dimensions, filters, grain) -> None:
+    known_measures = set(FALLBACK.measures)
+    unknown = [m for m in measures if m not in known_measures]
+    unknown += [d for d in dimensions if isinstance(d, str) and d not in FALLBACK.dimensions]
+    unknown += [f for f in filters if f not in ('start_date', 'end_date') and f not in FALLBACK.dimensions]
+    if unknown:
+        raise ValueError(f"Unknown measures, dimensions or filters: {', '.join(map(str, unknown))}")
+    if not measures:
+        raise ValueError("At least one measure is required")
+    if grain is not None and grain not in TIME_GRAINS:
+        raise ValueError(f"Unknown time grain '{grain}'. Use one of: {', '.join(TIME_GRAINS)}")
+    names = ([grain] if grain else []) + [d if isinstance(d, str) else d[0] for d in dimensions] + list(measures)
+    if len(set(names)) < len(names):
+        raise ValueError("Each grain, dimension and measure may only be requested once")
+
+
+def plan_query(con, measures, dimensions=(), filters: dict = None, grain: str = None, exact: bool = True) -> QueryPlan:
+    """Plan measures by dimensions (and grain) over the smallest aggregate that can answer, else sales_data.
+
+    filters maps a dimension to a value or a list of values; start_date and
+    end_date (YYYY-MM-DD, both inclusive) limit the days. Raises ValueError
+    for names the fallback does not know either.
+    """
+    measures, dimensions, filters = list(measures), list(dimensions), dict(filters or {})
+    _check(measures, dimensions, filters, grain)
+    candidates = []
+    for aggregate in AGGREGATES:
+        plan = _build(aggregate, measures, dimensions, filters, grain, exact)
+        if plan is None:
+            continue
+        size = aggregate.size(con)
+        if size is not None:
+            candidates.append((size, plan))
+    if candidates:
+        return min(candidates, key=lambda candidate: candidate[0])[1]
+    plan = _build(FALLBACK, measures, dimensions, filters, grain, exact)
+    if plan is None:
+        raise ValueError("The request cannot be answered from sales_data")
+    return plan
+
+
+def routed(con, sql: str, measures, dimensions=(), filters: dict = None, grain: str = None, exact: bool = True) -> QueryPlan:
+    """plan_query, then sql with {base} replaced by the planned query as a subquery"""
+    plan = plan_query(con, measures, dimensions, filters, grain, exact)
+    return QueryPlan(sql.replace('{base}', f"({plan.sql}) base"), plan.params, plan.source)
+
+
+# Reports shared by the API (/analytics/*) and the menu's analytics views:
+# the logical request, and the SQL shaping its rows ({base}). Reports counting
+# customers take the rollup's estimates (exact=False) rather than scan sales_data
+REPORTS = {
+    'monthly_trends': (
+        {'measures': ['revenue', 'customers'], 'grain': 'month', 'exact': False},
+        """
+        WITH with_prev AS (
+            SELECT
+                month,
+                revenue,
+                customers,
+                LAG(revenue) OVER (ORDER BY month) AS prev_revenue,
+                LAG(customers) OVER (ORDER BY month) AS prev_customers
+            FROM {base}
+        )
+        SELECT
+            month,
+            revenue,
+            customers,
+            prev_revenue,
+            prev_customers,
+            CASE
+                WHEN prev_revenue IS NULL THEN NULL
+                WHEN prev_revenue = 0 THEN
+                    CASE
+                        WHEN revenue = 0 THEN 0
+                        ELSE 100 -- from zero to something is 100% growth
+                    END
+                ELSE ((revenue - prev_revenue) / prev_revenue) * 100
+            END AS revenue_change_pct,
+            CASE
+                WHEN prev_customers IS NULL THEN NULL
+                WHEN prev_customers = 0 THEN
+                    CASE
+                        WHEN customers = 0 THEN 0
+                        ELSE 100
+                    END
+                ELSE ((customers - prev_customers) / prev_customers) * 100
+            END AS customer_change_pct
+        FROM with_prev
+        ORDER BY month
+        """,
+    ),
+    'customer_demographics': (
+        {'measures': ['customers', 'avg_income', 'revenue'], 'dimensions': ['age_group', 'gender'], 'exact': False},
+        """
+        SELECT
+            age_group,
+            gender,
+            customers AS customer_count,
+            avg_income,
+            revenue AS total_spent,
+            revenue / customers AS avg_spent_per_customer
+        FROM {base}
+        WHERE customers > 0
+        ORDER BY age_group, gender
+        """,
+    ),
+    'top_products': (
+        {'measures': ['transactions', 'units_sold', 'revenue', 'avg_price'], 'dimensions': ['product_id', 'product_name']},
+        """
+        SELECT
+            product_id,
+            product_name,
+            transactions AS transaction_count,
+            units_sold AS total_units_sold,
+            revenue AS total_revenue,
+            avg_price
+        FROM {base}
+        ORDER BY total_revenue DESC
+        LIMIT 20
+        """,
+    ),
+    'hourly_distribution': (
+        {'measures': ['transactions', 'revenue', 'customers'], 'dimensions': ['hour_of_day'], 'exact': False},
+        """
+        SELECT
+            hour_of_day,
+            transactions AS transaction_count,
+            revenue AS total_revenue,
+            customers AS unique_customers
+        FROM {base}
+        ORDER BY hour_of_day
+        """,
+    ),
+    'geographic_distribution': (
+        {'measures': ['transactions', 'customers', 'revenue'], 'dimensions': ['country'], 'exact': False},
+        """
+        SELECT
+            country,
+            transactions,
+            customers,
+            revenue AS total_revenue,
+            RANK() OVER (ORDER BY revenue DESC) as revenue_rank
+        FROM {base}
+        ORDER BY revenue_rank
+        LIMIT 15
+        """,
+    ),
+    'income_levels': (
+        {'measures': ['customers', 'transactions', 'revenue', 'avg_transaction_value'], 'dimensions': ['income_band'],
+         'exact': False},
+        """
+        SELECT
+            income_band AS income_segment,
+            customers AS customer_count,
+            transactions AS transaction_count,
+            revenue AS total_revenue,
+            avg_transaction_value,
+            revenue / customers AS avg_spent_per_customer
+        FROM {base}
+        ORDER BY
+            CASE
+                WHEN income_segment = 'Low Income (< 30k)' THEN 1
+                WHEN income_segment = 'Middle Income (30k-60k)' THEN 2
+                WHEN income_segment = 'Upper Middle (60k-100k)' THEN 3
+                WHEN income_segment = 'High Income (>100k)' THEN 4
+                ELSE 5
+            END
+        """,
+    ),
+}
+
+
+def report_plan(con, name: str) -> QueryPlan:
+    """QueryPlan of one of REPORTS"""
+    request, sql = REPORTS[name]
+    return routed(con, sql, **request)
@@ -0,0 +1,153 @@
+"""Versioned LRU cache for query results.
+
+Entries are keyed by (name, parameters, data version). The API's data
+version combines the database file (see file_version) with the time of the
+last append recorded in table_stats, so any write changes every key and stale
+results are simply never looked up again; LRU eviction by size reclaims them. An optional disk tier keeps results across
+restarts of the API.
+
+    cache = ResultCache(max_bytes=64 * 1024 * 1024, disk_dir='.cache/api')
+    result = cache.get_or_compute(('monthly-trends', (), file_version(db_path)), compute)
+"""
+import functools
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+DEFAULT_CACHE_MB = 64
+DEFAULT_DISK_CACHE_MB = 512
+_MISSING = object()
+
+
+def file_version(db_path: str) -> tuple:
+    """Data version of a DuckDB file: size and mtime of the file and its WAL"""
+    version = []
+    for path in (db_path, f"{db_path}.wal"):
+        try:
+            st = os.stat(path)
+            version.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            version.append(None)
+    return tuple(version)
+
+
+class ResultCache:
+    """Thread-safe in-memory LRU bounded by pickled size, with an optional on-disk second tier"""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_MB * 1024 * 1024, disk_dir: str = None,
+                 max_disk_bytes: int = DEFAULT_DISK_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key) -> str:
+        return os.path.join(self.disk_dir, hashlib.sha256(repr(key).encode()).hexdigest() + '.pkl')
+
+    def _remember(self, key, value, size: int) -> None:
+        """Insert into the memory tier and evict least recently used entries over max_bytes"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), 'rb') as f:
+                    data = f.read()
+                value = pickle.loads(data)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                value = _MISSING
+            if value is not _MISSING:
+                self._remember(key, value, len(data))
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key, value) -> None:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, value, len(data))
+        if self.disk_dir:
+            self._write_disk(key, data)
+
+    def _write_disk(self, key, data: bytes) -> None:
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        # Keep the disk tier under its budget, dropping the oldest files first
+        files = [os.path.join(self.disk_dir, name) for name in os.listdir(self.disk_dir) if name.endswith('.pkl')]
+        sizes = {}
+        for file in files:
+            try:
+                sizes[file] = os.stat(file)
+            except FileNotFoundError:
+                pass
+        total = sum(st.st_size for st in sizes.values())
+        for file in sorted(sizes, key=lambda file: sizes[file].st_mtime_ns):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(file)
+            except FileNotFoundError:
+                pass
+            total -= sizes[file].st_size
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.pkl'):
+                    os.remove(os.path.join(self.disk_dir, name))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses}
+
+
+def cached_endpoint(cache: ResultCache, name: str, version):
+    """Decorator caching a function's result under (name, its arguments, version())"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())), version())
+            return cache.get_or_compute(key, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
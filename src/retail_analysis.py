@@ -1,5 +1,17 @@
 import duckdb
 
+from query_router import routed
+
+# Age bands of this report, over whichever table the router picks
+AGE_GROUP = ('age_group', """
+    CASE
+        WHEN {age} < 25 THEN '1. Under 25'
+        WHEN {age} BETWEEN 25 AND 40 THEN '2. 25 to 40'
+        WHEN {age} >= 41 THEN '3. 41 and above'
+        ELSE 'Unknown'
+    END
+""")
+
 # Connect to the database file using context manager
 with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     print("=== Retail Sales Database Schema ===")
@@ -51,88 +63,61 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     print(sample)
 
     print("\n=== Top 5 Products by Revenue ===")
-    top_products = con.execute("""
-        SELECT 
-            product_name,
-            SUM(total_amount_per_product_sgd) as total_revenue,
-            SUM(units_sold) as total_units_sold,
-            COUNT(*) as transactions,
-            AVG(unit_price_sgd) as avg_price
-        FROM sales_data 
-        GROUP BY product_id, product_name
+    plan = routed(con, """
+        SELECT product_name, revenue as total_revenue, units_sold as total_units_sold, transactions, avg_price
+        FROM {base}
         ORDER BY total_revenue DESC
         LIMIT 5
-    """).df()
+    """, ['revenue', 'units_sold', 'transactions', 'avg_price'], ['product_id', 'product_name'])
+    top_products = con.execute(plan.sql, plan.params).df()
     print(top_products)
 
     print("\n=== Sales by Day of Week ===")
-    dow_sales = con.execute("""
-        SELECT 
-            day_of_week_text,
-            SUM(total_amount_per_product_sgd) as total_revenue,
-            COUNT(DISTINCT receipt_number) as num_receipts,
-            AVG(receipt_total_sgd) as avg_receipt_value
-        FROM sales_data 
-        GROUP BY day_of_week_text, day_of_week
+    plan = routed(con, """
+        SELECT day_of_week_text, revenue as total_revenue, receipts as num_receipts, avg_receipt_total as avg_receipt_value
+        FROM {base}
         ORDER BY day_of_week
-    """).df()
+    """, ['revenue', 'receipts', 'avg_receipt_total'], ['day_of_week', 'day_of_week_text'])
+    dow_sales = con.execute(plan.sql, plan.params).df()
     print(dow_sales)
 
     print("\n=== Sales by Month ===")
-    month_sales = con.execute("""
-        SELECT 
-            month_text,
-            SUM(total_amount_per_product_sgd) as total_revenue,
-            COUNT(DISTINCT receipt_number) as num_receipts,
-            COUNT(DISTINCT customer_number) as unique_customers
-        FROM sales_data 
-        GROUP BY month_text, month
-        ORDER BY month
-    """).df()
+    plan = routed(con, """
+        SELECT month_text, revenue as total_revenue, receipts as num_receipts, customers as unique_customers
+        FROM {base}
+        ORDER BY month_of_year
+    """, ['revenue', 'receipts', 'customers'], ['month_of_year', 'month_text'])
+    month_sales = con.execute(plan.sql, plan.params).df()
     print(month_sales)
 
     print("\n=== Hourly Sales Pattern ===")
-    hourly_sales = con.execute("""
-        SELECT 
-            hour,
-            SUM(total_amount_per_product_sgd) as total_revenue,
-            COUNT(*) as transactions,
-            AVG(receipt_total_sgd) as avg_receipt_value
-        FROM sales_data 
-        GROUP BY hour
+    plan = routed(con, """
+        SELECT hour_of_day as hour, revenue as total_revenue, transactions, avg_receipt_total as avg_receipt_value
+        FROM {base}
         ORDER BY hour
-    """).df()
+    """, ['revenue', 'transactions', 'avg_receipt_total'], ['hour_of_day'])
+    hourly_sales = con.execute(plan.sql, plan.params).df()
     print(hourly_sales)
 
     print("\n=== Sales by Age Groups ===")
-    age_group_sales = con.execute("""
-        SELECT 
-            CASE 
-                WHEN age < 25 THEN '1. Under 25'
-                WHEN age BETWEEN 25 AND 40 THEN '2. 25 to 40'
-                WHEN age >= 41 THEN '3. 41 and above'
-                ELSE 'Unknown'
-            END as age_group,
-            COUNT(*) as total_transactions,
-            SUM(total_amount_per_product_sgd) as total_revenue,
-            COUNT(DISTINCT customer_number) as unique_customers,
-            COUNT(DISTINCT receipt_number) as unique_receipts,
-            AVG(total_amount_per_product_sgd) as avg_transaction_value,
-            AVG(receipt_total_sgd) as avg_receipt_value,
-            MIN(age) as min_age,
-            MAX(age) as max_age,
-            AVG(age) as avg_age
-        FROM sales_data 
-        WHERE age IS NOT NULL
-        GROUP BY 
-            CASE 
-                WHEN age < 25 THEN '1. Under 25'
-                WHEN age BETWEEN 25 AND 40 THEN '2. 25 to 40'
-                WHEN age >= 41 THEN '3. 41 and above'
-                ELSE 'Unknown'
-            END
+    plan = routed(con, """
+        SELECT
+            age_group,
+            transactions as total_transactions,
+            revenue as total_revenue,
+            customers as unique_customers,
+            receipts as unique_receipts,
+            avg_transaction_value,
+            avg_receipt_total as avg_receipt_value,
+            min_age,
+            max_age,
+            avg_age
+        FROM {base}
+        WHERE age_group <> 'Unknown'
         ORDER BY age_group
-    """).df()
+    """, ['transactions', 'revenue', 'customers', 'receipts', 'avg_transaction_value', 'avg_receipt_total',
+          'min_age', 'max_age', 'avg_age'], [AGE_GROUP])
+    age_group_sales = con.execute(plan.sql, plan.params).df()
     print(age_group_sales)
 
     print("\n=== Age Group Revenue Distribution ===")
@@ -144,23 +129,13 @@ with duckdb.connect('sales_timeseries.db', read_only=True) as con:
     print("\n=== Top Products by Age Group ===")
     for age_group in ['1. Under 25', '2. 25 to 40', '3. 41 and above']:
         print(f"\n--- {age_group} ---")
-        top_products_by_age = con.execute(f"""
-            SELECT 
-                product_name,
-                SUM(total_amount_per_product_sgd) as total_revenue,
-                SUM(units_sold) as total_units_sold,
-                COUNT(*) as transactions,
-                AVG(unit_price_sgd) as avg_price
-            FROM sales_data 
-            WHERE CASE 
-                WHEN age < 25 THEN '1. Under 25'
-                WHEN age BETWEEN 25 AND 40 THEN '2. 25 to 40'
-                WHEN age >= 41 THEN '3. 41 and above'
-                ELSE 'Unknown'
-            END = '{age_group}'
-            GROUP BY product_id, product_name
+        plan = routed(con, """
+            SELECT product_name, revenue as total_revenue, units_sold as total_units_sold, transactions, avg_price
+            FROM {base}
+            WHERE age_group = ?
             ORDER BY total_revenue DESC
             LIMIT 3
-        """).df()
+        """, ['revenue', 'units_sold', 'transactions', 'avg_price'], [AGE_GROUP, 'product_id', 'product_name'])
+        top_products_by_age = con.execute(plan.sql, plan.params + [age_group]).df()
         
         print(top_products_by_age)
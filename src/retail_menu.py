@@ -3,6 +3,8 @@ import sys
 import duckdb
 from datetime import datetime
 
+from storage import read_table_stats
+
 class RetailMenu:
     def clear_screen(self):
         """Clear the terminal screen"""
@@ -419,13 +421,20 @@ class RetailMenu:
                     print(f"   🎁 Best Discount Period: {best_discount[0]} (SGD ${best_discount[1]:,.2f})")
                 
                 print("\n📊 KEY METRICS:")
-                metrics = con.execute("""
-                    SELECT 
-                        AVG(total_amount_per_product_sgd) as avg_transaction,
-                        COUNT(DISTINCT DATE(date)) as days_of_operation,
-                        SUM(total_amount_per_product_sgd) / COUNT(DISTINCT DATE(date)) as avg_daily_revenue
-                    FROM sales_data WHERE transaction_desc = 'Product Sale'
-                """).fetchone()
+                stats = read_table_stats(con)
+                if stats is not None and stats['sale_count']:
+                    # Kept up to date on every append, no scan needed
+                    sale_revenue = stats['sale_revenue_cents'] / 100
+                    metrics = (sale_revenue / stats['sale_count'], stats['sale_days'],
+                               sale_revenue / max(1, stats['sale_days']))
+                else:
+                    metrics = con.execute("""
+                        SELECT 
+                            AVG(total_amount_per_product_sgd) as avg_transaction,
+                            COUNT(DISTINCT DATE(date)) as days_of_operation,
+                            SUM(total_amount_per_product_sgd) / COUNT(DISTINCT DATE(date)) as avg_daily_revenue
+                        FROM sales_data WHERE transaction_desc = 'Product Sale'
+                    """).fetchone()
                 
                 print(f"   💰 Average Transaction: SGD ${metrics[0]:.2f}")
                 print(f"   📅 Days of Operation: {metrics[1]:,}")
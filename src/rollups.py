@@ -0,0 +1,208 @@
+"""Daily rollup of sales_fact for the analytics reports.
+
+sales_daily_rollup holds one row per day, hour, city, product, customer age,
+gender, income band and transaction type, with additive measures: row and
+unit counts, amount sums in cents and the row counts behind every average.
+append_sales recomputes the rollup rows of each day it touches, so a report
+grouping by any of these dimensions (or a coarser time grain) scans a few
+thousand rollup rows instead of sales_fact.
+
+Age is kept in years rather than bands: reports band it differently (18-25,
+26-35, ... for the API, Under 25 / 25-40 / 41+ for the legacy summaries) and
+there are only a few dozen distinct ages.
+
+Distinct customers and receipts do not add up across rows (a customer buying
+in two hours would count twice), so each row keeps a sparse HyperLogLog sketch
+of them instead: the hll.entry_sql entries of its customers and receipts.
+hll.count_sql merges the sketches of any set of rows into an estimate (~0.8%
+error), which the router offers as an approximate measure.
+
+The sales_rollup view joins the city and product names and the calendar
+fields back in, for ad-hoc reports:
+
+    SELECT country, SUM(total_amount_sgd) FROM sales_rollup GROUP BY country
+
+Reports normally do not query it by name: query_router.plan_query picks it
+whenever it can answer.
+"""
+import hll
+
+
+# Income segments of the income level report, over an income expression {income_cents}
+INCOME_BAND_SQL = """
+    CASE
+        WHEN {income_cents} < 3000000 THEN 'Low Income (< 30k)'
+        WHEN {income_cents} BETWEEN 3000000 AND 6000000 THEN 'Middle Income (30k-60k)'
+        WHEN {income_cents} BETWEEN 6000001 AND 10000000 THEN 'Upper Middle (60k-100k)'
+        WHEN {income_cents} > 10000000 THEN 'High Income (>100k)'
+        ELSE 'Unknown'
+    END
+"""
+
+# Age groups of the demographics report, over an age expression {age}
+AGE_GROUP_SQL = """
+    CASE
+        WHEN {age} BETWEEN 18 AND 25 THEN '18-25'
+        WHEN {age} BETWEEN 26 AND 35 THEN '26-35'
+        WHEN {age} BETWEEN 36 AND 45 THEN '36-45'
+        WHEN {age} BETWEEN 46 AND 55 THEN '46-55'
+        WHEN {age} BETWEEN 56 AND 65 THEN '56-65'
+        WHEN {age} > 65 THEN '65+'
+        ELSE 'Unknown'
+    END
+"""
+
+
+SALES_DAILY_ROLLUP_SQL = """
+    CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+        day DATE,
+        hour INTEGER,
+        city_key INTEGER,
+        product_key INTEGER,
+        age INTEGER,
+        gender gender_type,
+        income_band VARCHAR,
+        transaction_desc transaction_type,
+        transactions BIGINT,
+        units_sold BIGINT,
+        revenue_cents BIGINT,
+        unit_price_cents BIGINT,
+        priced_rows BIGINT,
+        income_cents BIGINT,
+        income_rows BIGINT,
+        receipt_total_cents BIGINT,
+        receipt_rows BIGINT,
+        customer_sketch INTEGER[],
+        receipt_sketch INTEGER[]
+    )
+"""
+
+# Rollup rows of the sales_fact rows matching {where}
+ROLLUP_SELECT_SQL = """
+    SELECT
+        CAST(f.date AS DATE) AS day,
+        CAST(EXTRACT(hour FROM f.date) AS INTEGER) AS hour,
+        f.city_key,
+        f.product_key,
+        c.age,
+        c.gender,
+        """ + INCOME_BAND_SQL.format(income_cents='c.income_cents').strip() + """ AS income_band,
+        f.transaction_desc,
+        COUNT(*) AS transactions,
+        COALESCE(SUM(f.units_sold), 0) AS units_sold,
+        COALESCE(SUM(f.total_amount_cents), 0) AS revenue_cents,
+        COALESCE(SUM(f.unit_price_cents), 0) AS unit_price_cents,
+        COUNT(f.unit_price_cents) AS priced_rows,
+        COALESCE(SUM(c.income_cents), 0) AS income_cents,
+        COUNT(c.income_cents) AS income_rows,
+        COALESCE(SUM(f.receipt_total_cents), 0) AS receipt_total_cents,
+        COUNT(f.receipt_total_cents) AS receipt_rows,
+        list_sort(COALESCE(list(DISTINCT """ + hll.entry_sql('f.customer_id') + """) FILTER (WHERE f.customer_id IS NOT NULL), [])) AS customer_sketch,
+        list_sort(COALESCE(list(DISTINCT """ + hll.entry_sql('f.receipt_number') + """) FILTER (WHERE f.receipt_number IS NOT NULL), [])) AS receipt_sketch
+    FROM sales_fact f
+    LEFT JOIN dim_customer c ON c.customer_id = f.customer_id
+    {where}
+    GROUP BY ALL
+    ORDER BY day, hour
+"""
+
+SALES_ROLLUP_VIEW_SQL = """
+    CREATE OR REPLACE VIEW sales_rollup AS
+    SELECT
+        r.day,
+        r.hour,
+        CAST(r.day AS TIMESTAMP) + to_hours(r.hour) AS date,
+        EXTRACT(year FROM r.day) AS year,
+        EXTRACT(month FROM r.day) AS month,
+        upper(strftime(r.day, '%b')) AS month_text,
+        isodow(r.day) AS day_of_week,
+        upper(strftime(r.day, '%a')) AS day_of_week_text,
+        ci.country_id,
+        ci.country,
+        ci.city,
+        p.product_id,
+        p.product_name,
+        r.age,
+        r.gender,
+        r.income_band,
+        r.transaction_desc,
+        r.transactions,
+        r.units_sold,
+        CAST(r.revenue_cents / 100 AS DECIMAL(18,2)) AS total_amount_sgd,
+        r.revenue_cents,
+        r.unit_price_cents,
+        r.priced_rows,
+        r.income_cents,
+        r.income_rows,
+        r.receipt_total_cents,
+        r.receipt_rows,
+        r.customer_sketch,
+        r.receipt_sketch
+    FROM sales_daily_rollup r
+    LEFT JOIN dim_city ci ON ci.city_key = r.city_key
+    LEFT JOIN dim_product p ON p.product_key = r.product_key
+"""
+
+
+def create_rollups(con) -> None:
+    """Create the rollup table and view (no-op when present), building the table when it is empty"""
+    # Rollups from before the sketches summed per-row distinct counts; rebuild those
+    columns = {row[0] for row in con.execute(
+        "SELECT column_name FROM duckdb_columns() WHERE table_name = 'sales_daily_rollup'"
+    ).fetchall()}
+    if columns and 'customer_sketch' not in columns:
+        drop_rollups(con)
+    con.execute(SALES_DAILY_ROLLUP_SQL)
+    con.execute(SALES_ROLLUP_VIEW_SQL)
+    if con.execute("SELECT COUNT(*) FROM sales_daily_rollup").fetchone()[0] == 0:
+        # Databases created before the rollup existed are scanned once
+        rebuild_rollups(con)
+
+
+def drop_rollups(con) -> None:
+    con.execute("DROP VIEW IF EXISTS sales_rollup")
+    con.execute("DROP TABLE IF EXISTS sales_daily_rollup")
+
+
+def rebuild_rollups(con) -> int:
+    """Recompute sales_daily_rollup from a full scan of sales_fact; returns its row count"""
+    con.execute("DELETE FROM sales_daily_rollup")
+    return con.execute("INSERT INTO sales_daily_rollup " + ROLLUP_SELECT_SQL.format(where="")).fetchone()[0]
+
+
+def update_rollups(con, source: str) -> None:
+    """Recompute the rollup rows of every day present in source (a just-appended typed batch).
+
+    Days are recomputed from sales_fact rather than merged, so reloaded or
+    deduplicated batches cannot count twice. The date range limits the scan to the row groups of
+    those days.
+    """
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE rollup_days AS
+        SELECT DISTINCT CAST(date AS DATE) AS day FROM {source}
+    """)
+    low, high, has_null = con.execute(
+        "SELECT MIN(day), MAX(day), COUNT(*) > COUNT(day) FROM rollup_days"
+    ).fetchone()
+    try:
+        conditions, params = [], []
+        if low is not None:
+            conditions.append("(day BETWEEN ? AND ? AND day IN (SELECT day FROM rollup_days WHERE day IS NOT NULL))")
+            params += [low, high]
+        if has_null:
+            conditions.append("day IS NULL")
+        if not conditions:
+            return
+        con.execute(f"DELETE FROM sales_daily_rollup WHERE {' OR '.join(conditions)}", params)
+        fact_conditions = []
+        if low is not None:
+            fact_conditions.append(
+                "(f.date >= CAST(? AS TIMESTAMP) AND f.date < CAST(? AS TIMESTAMP) + INTERVAL 1 DAY"
+                " AND CAST(f.date AS DATE) IN (SELECT day FROM rollup_days WHERE day IS NOT NULL))"
+            )
+        if has_null:
+            fact_conditions.append("f.date IS NULL")
+        where = "WHERE " + " OR ".join(fact_conditions)
+        con.execute("INSERT INTO sales_daily_rollup " + ROLLUP_SELECT_SQL.format(where=where), params)
+    finally:
+        con.execute("DROP TABLE IF EXISTS rollup_days")
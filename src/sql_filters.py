@@ -0,0 +1,106 @@
+"""Filter compiler and per-connection parse cache.
+
+Filter values are never formatted into SQL. compile_filters turns the values
+that are set into a WHERE clause of fixed fragments with ? placeholders, so
+the SQL text only depends on which filters are used, not on their values.
+execute() then parses each distinct SQL text once per connection and reuses
+the parsed statement, keeping a bounded LRU of them. This only saves the
+parse: DuckDB still binds and plans the statement on every execution, as
+its Python API has no prepared-statement handle to keep. For example:
+
+    where, params = compile_filters(SALES_DATA_FILTERS, {'customer_id': 100001, 'min_age': 30})
+    execute(con, f"SELECT COUNT(*) FROM sales_data{where}", params).fetchone()
+"""
+import threading
+import weakref
+from collections import OrderedDict
+
+
+PARSE_CACHE_SIZE = 128
+
+# Filters on sales_fact columns; dimension attributes become key semi-joins,
+# so the fact rows can be picked before the dimensions are joined
+SALES_FACT_FILTERS = {
+    'start_date': "date >= CAST(? AS TIMESTAMP)",
+    'end_date': "date <= CAST(? AS TIMESTAMP)",
+    'product_id': "product_key IN (SELECT product_key FROM dim_product WHERE product_id = TRY_CAST(? AS BIGINT))",
+    'customer_id': "customer_id = TRY_CAST(? AS BIGINT)",
+    'min_age': "customer_id IN (SELECT customer_id FROM dim_customer WHERE age >= ?)",
+    'max_age': "customer_id IN (SELECT customer_id FROM dim_customer WHERE age <= ?)",
+}
+
+# Filters on the wide sales_data view. A fragment with several ? uses the value for each of them.
+SALES_DATA_FILTERS = {
+    'date': "date >= CAST(? AS DATE) AND date < CAST(? AS DATE) + INTERVAL 1 DAY",
+    'start_date': "date >= CAST(? AS TIMESTAMP)",
+    'end_date': "date <= CAST(? AS TIMESTAMP)",
+    'hour': "EXTRACT(hour FROM date) = ?",
+    'customer_id': "customer_id = TRY_CAST(? AS BIGINT)",
+    'receipt_number': "receipt_number = TRY_CAST(? AS BIGINT)",
+    'product_id': "product_id = TRY_CAST(? AS BIGINT)",
+    'min_age': "age >= ?",
+    'max_age': "age <= ?",
+    'gender': "gender = TRY_CAST(? AS gender_type)",
+    'income_above': "income > ?",
+    'country': "country = ?",
+    'city': "city = ?",
+    'transaction_desc': "transaction_desc = TRY_CAST(? AS transaction_type)",
+}
+
+
+def compile_filters(filters: dict, values: dict) -> tuple:
+    """(' WHERE ...' or '', params) for the filters whose value is not None, in the order of filters"""
+    unknown = set(values) - set(filters)
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+    conditions, params = [], []
+    for name, fragment in filters.items():
+        value = values.get(name)
+        if value is None:
+            continue
+        conditions.append(f"({fragment})")
+        params += [value] * fragment.count('?')
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+class ParseCache:
+    """LRU of parsed (not prepared) statements for one connection, keyed by SQL text"""
+
+    def __init__(self, max_size: int = PARSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._statements = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def statement(self, con, sql: str):
+        statement = self._statements.get(sql)
+        if statement is not None:
+            self._statements.move_to_end(sql)
+            self.hits += 1
+            return statement
+        self.misses += 1
+        statements = con.extract_statements(sql)
+        if len(statements) != 1:
+            return sql  # scripts are executed as text and not cached
+        self._statements[sql] = statements[0]
+        if len(self._statements) > self.max_size:
+            self._statements.popitem(last=False)
+        return statements[0]
+
+
+_caches = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+def parse_cache(con) -> ParseCache:
+    """The parse cache of a connection, created on first use and dropped with the connection"""
+    with _caches_lock:
+        cache = _caches.get(con)
+        if cache is None:
+            cache = _caches[con] = ParseCache()
+        return cache
+
+
+def execute(con, sql: str, params=None):
+    """con.execute(sql, params), parsing sql only the first time this connection runs it"""
+    return con.execute(parse_cache(con).statement(con, sql), params)
@@ -0,0 +1,819 @@
+import json
+import os
+
+import pandas as pd
+
+import hll
+from rollups import create_rollups, drop_rollups, update_rollups
+
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+CITIES_JSON = os.path.join(SOURCE_DIR, 'cities.json')
+
+# Star schema: a compact fact table with integer keys into small dimension
+# tables, plus a sales_data view that keeps the original wide layout for
+# existing readers.
+#
+# Schema version 2 stores identifiers as BIGINT, categorical columns as ENUMs
+# and money as integer cents. Version 1 (VARCHAR ids, DECIMAL amounts) is
+# rewritten by migrate_schema().
+SCHEMA_VERSION = 2
+MIGRATION_BATCH_ROWS = 1_000_000
+
+TRANSACTION_TYPE_ENUM_SQL = "CREATE TYPE IF NOT EXISTS transaction_type AS ENUM ('Product Sale', 'Product Refund', 'Product Exchange')"
+GENDER_ENUM_SQL = "CREATE TYPE IF NOT EXISTS gender_type AS ENUM ('M', 'F')"
+
+SCHEMA_VERSION_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER
+    )
+"""
+
+DIM_PRODUCT_SQL = """
+    CREATE TABLE IF NOT EXISTS dim_product (
+        product_key INTEGER,
+        product_id BIGINT,
+        product_name VARCHAR
+    )
+"""
+
+DIM_CITY_SQL = """
+    CREATE TABLE IF NOT EXISTS dim_city (
+        city_key INTEGER,
+        city VARCHAR,
+        country_id VARCHAR,
+        country VARCHAR
+    )
+"""
+
+DIM_CUSTOMER_SQL = """
+    CREATE TABLE IF NOT EXISTS dim_customer (
+        customer_id BIGINT,
+        age INTEGER,
+        gender gender_type,
+        income_cents BIGINT
+    )
+"""
+
+SALES_FACT_SQL = """
+    CREATE TABLE IF NOT EXISTS sales_fact (
+        date TIMESTAMP,
+        transaction_id BIGINT,
+        transaction_desc transaction_type,
+        customer_id BIGINT,
+        receipt_number BIGINT,
+        product_key INTEGER,
+        city_key INTEGER,
+        units_sold INTEGER,
+        unit_price_cents BIGINT,
+        total_amount_cents BIGINT,
+        receipt_total_cents BIGINT
+    )
+"""
+
+# Wide sales_data columns over a fact relation; {fact} is sales_fact for the view,
+# or a pre-filtered page of it so the dimension joins only touch the rows returned
+SALES_DATA_SELECT_SQL = """
+    SELECT
+        f.date,
+        f.transaction_id,
+        f.transaction_desc,
+        f.customer_id,
+        c.age,
+        c.gender,
+        f.receipt_number,
+        p.product_id,
+        p.product_name,
+        f.units_sold,
+        CAST(f.unit_price_cents / 100 AS DECIMAL(18,2)) AS unit_price_sgd,
+        CAST(f.total_amount_cents / 100 AS DECIMAL(18,2)) AS total_amount_per_product_sgd,
+        CAST(f.receipt_total_cents / 100 AS DECIMAL(18,2)) AS receipt_total_sgd,
+        ci.country_id,
+        ci.country,
+        ci.city,
+        CAST(c.income_cents / 100 AS DECIMAL(18,2)) AS income
+    FROM {fact} f
+    LEFT JOIN dim_customer c ON c.customer_id = f.customer_id
+    LEFT JOIN dim_product p ON p.product_key = f.product_key
+    LEFT JOIN dim_city ci ON ci.city_key = f.city_key
+"""
+
+SALES_DATA_VIEW_SQL = "CREATE OR REPLACE VIEW sales_data AS" + SALES_DATA_SELECT_SQL.format(fact='sales_fact')
+
+# Wide view over a version 1 star schema, read by the migration
+SALES_DATA_V1_VIEW_SQL = """
+    CREATE OR REPLACE TEMP VIEW sales_data_v1 AS
+    SELECT
+        f.rowid AS fact_row,
+        f.date,
+        f.transaction_id,
+        f.transaction_desc,
+        f.customer_id,
+        c.age,
+        c.gender,
+        f.receipt_number,
+        p.product_id,
+        p.product_name,
+        f.units_sold,
+        f.unit_price_sgd,
+        f.total_amount_per_product_sgd,
+        f.receipt_total_sgd,
+        ci.country_id,
+        ci.country,
+        ci.city,
+        c.income
+    FROM sales_fact_v1 f
+    LEFT JOIN dim_customer_v1 c ON c.customer_id = f.customer_id
+    LEFT JOIN dim_product_v1 p ON p.product_key = f.product_key
+    LEFT JOIN dim_city_v1 ci ON ci.city_key = f.city_key
+"""
+
+# One row per generated chunk committed to sales_fact, so an interrupted
+# generation can skip the chunks it already finished
+GENERATION_MANIFEST_SQL = """
+    CREATE TABLE IF NOT EXISTS generation_manifest (
+        start_date TIMESTAMP,
+        end_date TIMESTAMP,
+        seed BIGINT,
+        row_count BIGINT,
+        completed_at TIMESTAMP
+    )
+"""
+
+# Headline numbers of sales_fact, updated by every append_sales call so readers
+# get them without scanning. Distinct counts are HyperLogLog estimates; the
+# sketches are kept so later batches can be merged in.
+TABLE_STATS_SQL = """
+    CREATE TABLE IF NOT EXISTS table_stats (
+        table_name VARCHAR,
+        row_count BIGINT,
+        revenue_cents BIGINT,
+        sale_count BIGINT,
+        sale_revenue_cents BIGINT,
+        min_date TIMESTAMP,
+        max_date TIMESTAMP,
+        unique_customers BIGINT,
+        unique_receipts BIGINT,
+        sale_days BIGINT,
+        customer_sketch BLOB,
+        receipt_sketch BLOB,
+        sale_day_sketch BLOB,
+        updated_at TIMESTAMP
+    )
+"""
+
+# One row per customer_id with its running totals, maintained by append_sales so
+# customer listings are keyset pages over this table instead of a GROUP BY of
+# the whole fact table. age is the customer's (as in dim_customer), country the
+# one of their earliest sale.
+CUSTOMER_SUMMARY_SQL = """
+    CREATE TABLE IF NOT EXISTS customer_summary (
+        customer_id BIGINT,
+        age INTEGER,
+        country VARCHAR,
+        total_sales BIGINT,
+        total_amount_cents BIGINT,
+        first_date TIMESTAMP,
+        last_date TIMESTAMP
+    )
+"""
+
+# Before/after timings of every candidate index measured by the index advisor
+INDEX_ADVICE_SQL = """
+    CREATE TABLE IF NOT EXISTS index_advice (
+        index_name VARCHAR,
+        table_name VARCHAR,
+        column_name VARCHAR,
+        lookups VARCHAR,
+        before_ms DOUBLE,
+        after_ms DOUBLE,
+        speedup DOUBLE,
+        kept BOOLEAN,
+        measured_at TIMESTAMP
+    )
+"""
+
+# Physical order of sales_fact after clustering; zone maps then prune date range scans
+CLUSTER_ORDER = ['date']
+CLUSTER_ORDER_WITH_CUSTOMER = ['date', 'customer_id']
+
+STAR_TABLES = ['sales_fact', 'dim_customer', 'dim_product', 'dim_city']
+STAR_TYPES = ['transaction_type', 'gender_type']
+
+
+def object_type(con, name: str):
+    """Return 'BASE TABLE', 'VIEW' or None for an object in the main schema"""
+    row = con.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_schema = 'main' AND table_name = ?",
+        [name]
+    ).fetchone()
+    return row[0] if row else None
+
+
+def get_schema_version(con):
+    """Schema version of the database: None when empty, 0 for the legacy wide table"""
+    if object_type(con, 'sales_fact_v1'):
+        return 1  # migration in progress
+    if object_type(con, 'sales_data_wide'):
+        return 0  # conversion in progress
+    if object_type(con, 'schema_version') == 'BASE TABLE':
+        row = con.execute("SELECT MAX(version) FROM schema_version").fetchone()
+        if row[0] is not None:
+            return row[0]
+    if object_type(con, 'sales_fact'):
+        return 1
+    if object_type(con, 'sales_data') == 'BASE TABLE':
+        return 0
+    return None
+
+
+def seed_dim_city(con, cities_path: str = CITIES_JSON) -> None:
+    """Load cities.json into dim_city (keys follow file order) when the table is empty"""
+    if con.execute("SELECT COUNT(*) FROM dim_city").fetchone()[0] > 0:
+        return
+    with open(cities_path) as f:
+        cities = json.load(f)
+    con.executemany(
+        "INSERT INTO dim_city VALUES (?, ?, ?, ?)",
+        [(i, c['name'], c['country_id'], c['country']) for i, c in enumerate(cities, 1)]
+    )
+
+
+def create_schema(con, cities_path: str = CITIES_JSON) -> None:
+    """Create the current star schema tables, types and view (no-op when present)"""
+    for ddl in (TRANSACTION_TYPE_ENUM_SQL, GENDER_ENUM_SQL):
+        con.execute(ddl)
+    for ddl in (SCHEMA_VERSION_SQL, DIM_PRODUCT_SQL, DIM_CITY_SQL, DIM_CUSTOMER_SQL, SALES_FACT_SQL, GENERATION_MANIFEST_SQL, TABLE_STATS_SQL, CUSTOMER_SUMMARY_SQL):
+        con.execute(ddl)
+    if con.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0] == 0:
+        con.execute("INSERT INTO schema_version VALUES (?)", [SCHEMA_VERSION])
+    seed_dim_city(con, cities_path)
+    con.execute(SALES_DATA_VIEW_SQL)
+    if con.execute("SELECT COUNT(*) FROM table_stats").fetchone()[0] == 0:
+        # Databases created before table_stats existed are scanned once
+        rebuild_table_stats(con)
+    if con.execute("SELECT COUNT(*) FROM customer_summary").fetchone()[0] == 0:
+        rebuild_customer_summary(con)
+    create_rollups(con)
+
+
+def ensure_schema(con, cities_path: str = CITIES_JSON) -> None:
+    """Create the star schema and the sales_data compatibility view if missing.
+
+    A database still holding the original wide sales_data table, or an older
+    star schema version, is converted in place first.
+    """
+    version = get_schema_version(con)
+    if version == 0:
+        convert_wide_table(con, cities_path)
+    elif version is not None and version < SCHEMA_VERSION:
+        migrate_schema(con, cities_path)
+    else:
+        create_schema(con, cities_path)
+
+
+def drop_schema(con) -> None:
+    """Drop the sales_data view (or legacy table), all star schema tables and types"""
+    kind = object_type(con, 'sales_data')
+    if kind == 'VIEW':
+        con.execute("DROP VIEW sales_data")
+    elif kind == 'BASE TABLE':
+        con.execute("DROP TABLE sales_data")
+    con.execute("DROP TABLE IF EXISTS sales_data_wide")
+    for table in STAR_TABLES:
+        con.execute(f"DROP TABLE IF EXISTS {table}")
+        con.execute(f"DROP TABLE IF EXISTS {table}_v1")
+    con.execute("DROP TABLE IF EXISTS generation_manifest")
+    con.execute("DROP TABLE IF EXISTS index_advice")
+    con.execute("DROP TABLE IF EXISTS table_stats")
+    con.execute("DROP TABLE IF EXISTS customer_summary")
+    drop_rollups(con)
+    con.execute("DROP TABLE IF EXISTS schema_migration")
+    con.execute("DROP TABLE IF EXISTS schema_version")
+    for type_name in STAR_TYPES:
+        con.execute(f"DROP TYPE IF EXISTS {type_name}")
+
+
+def convert_wide_table(con, cities_path: str = CITIES_JSON, batch_rows: int = MIGRATION_BATCH_ROWS) -> int:
+    """Rewrite a legacy wide sales_data table into the star schema.
+
+    Like migrate_schema: the table is renamed to sales_data_wide and its rows
+    are appended in batches of batch_rows, each committed with its progress,
+    so an interrupted conversion continues from the last committed batch.
+    Returns the number of rows converted by this call.
+    """
+    if object_type(con, 'sales_data_wide') is None:
+        print("🔧 Converting wide sales_data table to star schema...")
+        con.execute("BEGIN TRANSACTION")
+        con.execute("ALTER TABLE sales_data RENAME TO sales_data_wide")
+        con.execute("CREATE TABLE schema_migration (next_row BIGINT)")
+        con.execute("INSERT INTO schema_migration VALUES (0)")
+        create_schema(con, cities_path)
+        con.execute("COMMIT")
+    else:
+        print("🔧 Resuming conversion of the wide sales_data table...")
+
+    next_row = con.execute("SELECT next_row FROM schema_migration").fetchone()[0]
+    last_row = con.execute("SELECT COALESCE(MAX(rowid), -1) FROM sales_data_wide").fetchone()[0]
+    converted = 0
+    while next_row <= last_row:
+        batch_end = next_row + batch_rows
+        con.execute("BEGIN TRANSACTION")
+        batch = con.sql(f"SELECT * FROM sales_data_wide WHERE rowid >= {next_row} AND rowid < {batch_end}")
+        converted += append_sales(con, batch)
+        con.execute("UPDATE schema_migration SET next_row = ?", [batch_end])
+        con.execute("COMMIT")
+        next_row = batch_end
+        print(f"✅ Converted rows up to {min(batch_end, last_row + 1):,} of {last_row + 1:,}")
+
+    con.execute("BEGIN TRANSACTION")
+    con.execute("DROP TABLE sales_data_wide")
+    con.execute("DROP TABLE schema_migration")
+    con.execute("COMMIT")
+    print(f"🎉 Converted {converted:,} rows to sales_fact + dimension tables")
+    return converted
+
+
+def migrate_schema(con, cities_path: str = CITIES_JSON, batch_rows: int = MIGRATION_BATCH_ROWS) -> int:
+    """Rewrite a version 1 star schema (VARCHAR ids, DECIMAL amounts) to the current version.
+
+    The old tables are renamed to *_v1 and the fact rows are copied over in
+    batches of batch_rows, each committed on its own, so memory stays bounded
+    and an interrupted migration continues from the last committed batch.
+    Returns the number of fact rows migrated by this call.
+    """
+    if get_schema_version(con) != 1:
+        print(f"ℹ️ Database is already at schema version {SCHEMA_VERSION}, nothing to migrate")
+        return 0
+
+    if object_type(con, 'sales_fact_v1') is None:
+        print(f"🔧 Migrating sales tables to schema version {SCHEMA_VERSION}...")
+        con.execute("BEGIN TRANSACTION")
+        con.execute("DROP VIEW IF EXISTS sales_data")
+        for table in STAR_TABLES:
+            con.execute(f"ALTER TABLE {table} RENAME TO {table}_v1")
+        con.execute("CREATE TABLE schema_migration (next_row BIGINT)")
+        con.execute("INSERT INTO schema_migration VALUES (0)")
+        create_schema(con, cities_path)
+        con.execute("COMMIT")
+    else:
+        print(f"🔧 Resuming migration to schema version {SCHEMA_VERSION}...")
+
+    con.execute(SALES_DATA_V1_VIEW_SQL)
+    next_row = con.execute("SELECT next_row FROM schema_migration").fetchone()[0]
+    last_row = con.execute("SELECT COALESCE(MAX(rowid), -1) FROM sales_fact_v1").fetchone()[0]
+    migrated = 0
+    while next_row <= last_row:
+        batch_end = next_row + batch_rows
+        con.execute("BEGIN TRANSACTION")
+        batch = con.sql(f"SELECT * EXCLUDE (fact_row) FROM sales_data_v1 WHERE fact_row >= {next_row} AND fact_row < {batch_end}")
+        migrated += append_sales(con, batch)
+        con.execute("UPDATE schema_migration SET next_row = ?", [batch_end])
+        con.execute("COMMIT")
+        next_row = batch_end
+        print(f"✅ Migrated rows up to {min(batch_end, last_row + 1):,} of {last_row + 1:,}")
+
+    con.execute("BEGIN TRANSACTION")
+    con.execute("DROP VIEW IF EXISTS sales_data_v1")
+    for table in STAR_TABLES:
+        con.execute(f"DROP TABLE {table}_v1")
+    con.execute("DROP TABLE schema_migration")
+    con.execute("COMMIT")
+    print(f"🎉 Migration to schema version {SCHEMA_VERSION} complete ({migrated:,} rows)")
+    return migrated
+
+
+def drop_star_indexes(con) -> list:
+    """Drop every secondary index on the star schema tables; returns the dropped names"""
+    tables = ', '.join(f"'{table}'" for table in STAR_TABLES)
+    names = [row[0] for row in con.execute(
+        f"SELECT index_name FROM duckdb_indexes() WHERE table_name IN ({tables})"
+    ).fetchall()]
+    for name in names:
+        con.execute(f"DROP INDEX IF EXISTS {name}")
+    return names
+
+
+def cluster_sales_fact(con, order_by=CLUSTER_ORDER) -> int:
+    """Rewrite sales_fact physically sorted by order_by so min/max zone maps prune range scans.
+
+    The table is rebuilt in one transaction and swapped in under the same
+    name; indexes on it are dropped with the old table. Returns the row count.
+    """
+    order = ', '.join(order_by)
+    print(f"🔧 Clustering sales_fact by {order}...")
+    con.execute("BEGIN TRANSACTION")
+    try:
+        con.execute(f"CREATE TABLE sales_fact_clustered AS SELECT * FROM sales_fact ORDER BY {order}")
+        con.execute("DROP TABLE sales_fact")
+        con.execute("ALTER TABLE sales_fact_clustered RENAME TO sales_fact")
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    # Write the new row groups (and their zone maps) and release the old ones
+    con.execute("CHECKPOINT")
+    rows = con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0]
+    print(f"✅ Clustered {rows:,} rows")
+    return rows
+
+
+def _collect_stats(con, source: str) -> dict:
+    """Totals and distinct-value sketches of a typed fact relation (sales_fact or a batch view)"""
+    row_count, revenue, sale_count, sale_revenue, min_date, max_date = con.execute(f"""
+        SELECT
+            COUNT(*),
+            COALESCE(SUM(total_amount_cents), 0),
+            COUNT(*) FILTER (WHERE transaction_desc = 'Product Sale'),
+            COALESCE(SUM(total_amount_cents) FILTER (WHERE transaction_desc = 'Product Sale'), 0),
+            MIN(date),
+            MAX(date)
+        FROM {source}
+    """).fetchone()
+    # The registers are computed in SQL, so only up to 2^14 rows per sketch reach Python.
+    # NULL ids are left out, like COUNT(DISTINCT ...) does
+    def sketch(value, where=None):
+        return hll.from_registers(con.execute(hll.registers_sql(value, source, where)).fetchnumpy())
+
+    return {
+        'row_count': row_count,
+        'revenue_cents': revenue,
+        'sale_count': sale_count,
+        'sale_revenue_cents': sale_revenue,
+        'min_date': min_date,
+        'max_date': max_date,
+        'customer_sketch': sketch('customer_id'),
+        'receipt_sketch': sketch('receipt_number'),
+        'sale_day_sketch': sketch('CAST(date AS DATE)', "transaction_desc = 'Product Sale'"),
+    }
+
+
+def _write_stats(con, stats: dict) -> None:
+    con.execute("DELETE FROM table_stats WHERE table_name = 'sales_fact'")
+    con.execute(
+        "INSERT INTO table_stats VALUES ('sales_fact', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, current_localtimestamp())",
+        [stats['row_count'], stats['revenue_cents'], stats['sale_count'], stats['sale_revenue_cents'],
+         stats['min_date'], stats['max_date'],
+         hll.estimate(stats['customer_sketch']), hll.estimate(stats['receipt_sketch']), hll.estimate(stats['sale_day_sketch']),
+         hll.to_bytes(stats['customer_sketch']), hll.to_bytes(stats['receipt_sketch']), hll.to_bytes(stats['sale_day_sketch'])]
+    )
+
+
+def rebuild_table_stats(con) -> None:
+    """Recompute table_stats from a full scan of sales_fact"""
+    _write_stats(con, _collect_stats(con, 'sales_fact'))
+
+
+def update_table_stats(con, source: str) -> None:
+    """Merge the totals and sketches of a just-appended batch into table_stats"""
+    batch = _collect_stats(con, source)
+    row = con.execute("""
+        SELECT row_count, revenue_cents, sale_count, sale_revenue_cents, min_date, max_date,
+               customer_sketch, receipt_sketch, sale_day_sketch
+        FROM table_stats WHERE table_name = 'sales_fact'
+    """).fetchone()
+    if row is None:
+        rebuild_table_stats(con)
+        return
+    dates = [d for d in (row[4], row[5], batch['min_date'], batch['max_date']) if d is not None]
+    _write_stats(con, {
+        'row_count': row[0] + batch['row_count'],
+        'revenue_cents': row[1] + batch['revenue_cents'],
+        'sale_count': row[2] + batch['sale_count'],
+        'sale_revenue_cents': row[3] + batch['sale_revenue_cents'],
+        'min_date': min(dates) if dates else None,
+        'max_date': max(dates) if dates else None,
+        'customer_sketch': hll.merge(hll.from_bytes(row[6]), batch['customer_sketch']),
+        'receipt_sketch': hll.merge(hll.from_bytes(row[7]), batch['receipt_sketch']),
+        'sale_day_sketch': hll.merge(hll.from_bytes(row[8]), batch['sale_day_sketch']),
+    })
+
+
+def last_write(con):
+    """Time of the last append (table_stats.updated_at), or None when the database has no table_stats"""
+    if object_type(con, 'table_stats') != 'BASE TABLE':
+        return None
+    row = con.execute("SELECT MAX(updated_at) FROM table_stats").fetchone()
+    return row[0]
+
+
+def read_table_stats(con):
+    """table_stats of sales_fact as a dict, or None when the database has none"""
+    if object_type(con, 'table_stats') != 'BASE TABLE':
+        return None
+    cursor = con.execute("""
+        SELECT row_count, revenue_cents, sale_count, sale_revenue_cents, min_date, max_date,
+               unique_customers, unique_receipts, sale_days, updated_at
+        FROM table_stats WHERE table_name = 'sales_fact'
+    """)
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return dict(zip([column[0] for column in cursor.description], row))
+
+
+def rebuild_customer_summary(con) -> int:
+    """Recompute customer_summary from a full scan of sales_fact, stored in customer_id order"""
+    con.execute("DELETE FROM customer_summary")
+    return con.execute("""
+        INSERT INTO customer_summary
+        SELECT
+            f.customer_id,
+            ANY_VALUE(c.age),
+            ARG_MIN(ci.country, f.date),
+            COUNT(*),
+            COALESCE(SUM(f.total_amount_cents), 0),
+            MIN(f.date),
+            MAX(f.date)
+        FROM sales_fact f
+        LEFT JOIN dim_customer c ON c.customer_id = f.customer_id
+        LEFT JOIN dim_city ci ON ci.city_key = f.city_key
+        WHERE f.customer_id IS NOT NULL
+        GROUP BY f.customer_id
+        ORDER BY f.customer_id
+    """).fetchone()[0]
+
+
+def update_customer_summary(con, source: str) -> None:
+    """Merge the per-customer totals of a just-appended typed batch into customer_summary.
+
+    Known customers get their totals added, new ones are inserted. Both steps
+    only look at the batch's customer_id range, which zone maps keep cheap
+    since new customers get increasing ids.
+    """
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE customer_batch AS
+        SELECT
+            customer_id,
+            ARG_MIN(age, date) AS age,
+            ARG_MIN(country, date) AS country,
+            COUNT(*) AS total_sales,
+            COALESCE(SUM(total_amount_cents), 0) AS total_amount_cents,
+            MIN(date) AS first_date,
+            MAX(date) AS last_date
+        FROM {source}
+        WHERE customer_id IS NOT NULL
+        GROUP BY customer_id
+    """)
+    low, high = con.execute("SELECT MIN(customer_id), MAX(customer_id) FROM customer_batch").fetchone()
+    if low is None:
+        return
+    con.execute("""
+        UPDATE customer_summary s SET
+            country = CASE WHEN b.first_date < s.first_date THEN b.country ELSE s.country END,
+            total_sales = s.total_sales + b.total_sales,
+            total_amount_cents = s.total_amount_cents + b.total_amount_cents,
+            first_date = LEAST(s.first_date, b.first_date),
+            last_date = GREATEST(s.last_date, b.last_date)
+        FROM customer_batch b
+        WHERE s.customer_id = b.customer_id AND s.customer_id BETWEEN ? AND ?
+    """, [low, high])
+    con.execute("""
+        INSERT INTO customer_summary
+        SELECT b.* FROM customer_batch b
+        ANTI JOIN (SELECT customer_id FROM customer_summary WHERE customer_id BETWEEN ? AND ?) s
+            ON s.customer_id = b.customer_id
+        ORDER BY b.customer_id
+    """, [low, high])
+
+
+def completed_chunks(con, seed: int) -> set:
+    """(start_date, end_date) of every chunk already committed for this seed"""
+    rows = con.execute("SELECT start_date, end_date FROM generation_manifest WHERE seed = ?", [seed]).fetchall()
+    return set(rows)
+
+
+def append_chunk(con, source, start_date, end_date, seed: int) -> int:
+    """Append one generated chunk and record it in generation_manifest, in a single transaction.
+
+    Either both the rows and the manifest entry are committed or neither is,
+    so a chunk interrupted halfway leaves nothing behind and is simply redone.
+    """
+    return append_group(con, [(source, (start_date, end_date, seed))])
+
+
+def append_group(con, items, upsert: bool = False) -> int:
+    """Append several DataFrames in one transaction (a group commit); returns the rows added.
+
+    items are (DataFrame, manifest) pairs; manifest is None or a
+    (start_date, end_date, seed) generation_manifest entry committed together
+    with the rows.
+    """
+    return sum(append_group_rows(con, items, upsert=upsert))
+
+
+def append_group_rows(con, items, upsert: bool = False) -> list:
+    """append_group, returning the rows added for each item.
+
+    Plain appends go through a single append_sales call, so the per-append
+    cost is paid once per group. Upserts are applied item by item, so each
+    reports the rows it actually added (rows already stored, or sent by an
+    earlier item of the group, are skipped).
+    """
+    frames = [source for source, _ in items if len(source)]
+    con.execute("BEGIN TRANSACTION")
+    try:
+        if upsert:
+            counts = [append_sales(con, source, upsert=True) if len(source) else 0 for source, _ in items]
+        else:
+            if frames:
+                append_sales(con, frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True))
+            counts = [len(source) for source, _ in items]
+        # The manifest records the rows each item added, which an upsert may make fewer than it sent
+        for (_, manifest), rows in zip(items, counts):
+            if manifest is not None:
+                start_date, end_date, seed = manifest
+                con.execute(
+                    "INSERT INTO generation_manifest VALUES (?, ?, ?, ?, current_localtimestamp())",
+                    [start_date, end_date, seed, rows]
+                )
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return counts
+
+
+def append_sales(con, source, upsert: bool = False) -> int:
+    """Append wide sales rows (DataFrame, relation, or the name of a table/view in con) to the star schema.
+
+    New products, cities and customers are added to their dimensions first,
+    then the fact rows are inserted with the dimension keys. Identifiers are
+    stored as BIGINT and amounts as integer cents; values that do not convert
+    become NULL. Customer attributes come from the earliest row of each
+    customer_id. table_stats and customer_summary are updated with the batch's
+    totals, and the daily rollup rows of the batch's days are recomputed.
+    With upsert=True, rows whose transaction_id is already stored (or repeated
+    within the batch) are skipped, so reloading a batch is a no-op.
+    Runs inside the caller's transaction, if any. Returns the number of fact
+    rows added.
+    """
+    # A table or view name is scanned in place, anything else is registered for a zero-copy scan
+    source_name = source if isinstance(source, str) else 'sales_batch'
+    if not isinstance(source, str):
+        con.register('sales_batch', source)
+    try:
+        con.execute(f"""
+            CREATE OR REPLACE TEMP VIEW sales_batch_typed AS
+            SELECT
+                TRY_CAST(date AS TIMESTAMP) AS date,
+                TRY_CAST(transaction_id AS BIGINT) AS transaction_id,
+                TRY_CAST(CAST(transaction_desc AS VARCHAR) AS transaction_type) AS transaction_desc,
+                TRY_CAST(customer_id AS BIGINT) AS customer_id,
+                TRY_CAST(age AS INTEGER) AS age,
+                TRY_CAST(CAST(gender AS VARCHAR) AS gender_type) AS gender,
+                TRY_CAST(receipt_number AS BIGINT) AS receipt_number,
+                TRY_CAST(product_id AS BIGINT) AS product_id,
+                CAST(product_name AS VARCHAR) AS product_name,
+                TRY_CAST(units_sold AS INTEGER) AS units_sold,
+                CAST(TRY_CAST(unit_price_sgd AS DECIMAL(18,2)) * 100 AS BIGINT) AS unit_price_cents,
+                CAST(TRY_CAST(total_amount_per_product_sgd AS DECIMAL(18,2)) * 100 AS BIGINT) AS total_amount_cents,
+                CAST(TRY_CAST(receipt_total_sgd AS DECIMAL(18,2)) * 100 AS BIGINT) AS receipt_total_cents,
+                CAST(country_id AS VARCHAR) AS country_id,
+                CAST(country AS VARCHAR) AS country,
+                CAST(city AS VARCHAR) AS city,
+                CAST(TRY_CAST(income AS DECIMAL(18,2)) * 100 AS BIGINT) AS income_cents
+            FROM {source_name}
+        """)
+        batch = stage_new_rows(con, 'sales_batch_typed', 'sales_fact', 'transaction_id') if upsert else 'sales_batch_typed'
+
+        con.execute(f"""
+            INSERT INTO dim_product
+            SELECT
+                (SELECT COALESCE(MAX(product_key), 0) FROM dim_product)
+                    + ROW_NUMBER() OVER (ORDER BY n.product_id, n.product_name),
+                n.product_id,
+                n.product_name
+            FROM (SELECT DISTINCT product_id, product_name FROM {batch}) n
+            WHERE NOT EXISTS (
+                SELECT 1 FROM dim_product d
+                WHERE d.product_id IS NOT DISTINCT FROM n.product_id
+                  AND d.product_name IS NOT DISTINCT FROM n.product_name
+            )
+        """)
+
+        con.execute(f"""
+            INSERT INTO dim_city
+            SELECT
+                (SELECT COALESCE(MAX(city_key), 0) FROM dim_city)
+                    + ROW_NUMBER() OVER (ORDER BY n.country, n.city, n.country_id),
+                n.city,
+                n.country_id,
+                n.country
+            FROM (SELECT DISTINCT city, country_id, country FROM {batch}) n
+            WHERE NOT EXISTS (
+                SELECT 1 FROM dim_city d
+                WHERE d.city IS NOT DISTINCT FROM n.city
+                  AND d.country_id IS NOT DISTINCT FROM n.country_id
+                  AND d.country IS NOT DISTINCT FROM n.country
+            )
+        """)
+
+        con.execute(f"""
+            INSERT INTO dim_customer
+            SELECT n.customer_id, n.age, n.gender, n.income_cents
+            FROM (
+                SELECT
+                    customer_id,
+                    ARG_MIN(age, date) AS age,
+                    ARG_MIN(gender, date) AS gender,
+                    ARG_MIN(income_cents, date) AS income_cents
+                FROM {batch}
+                WHERE customer_id IS NOT NULL
+                GROUP BY customer_id
+            ) n
+            ANTI JOIN dim_customer d ON d.customer_id = n.customer_id
+        """)
+
+        rows = con.execute(f"""
+            INSERT INTO sales_fact
+            SELECT
+                b.date,
+                b.transaction_id,
+                b.transaction_desc,
+                b.customer_id,
+                b.receipt_number,
+                p.product_key,
+                ci.city_key,
+                b.units_sold,
+                b.unit_price_cents,
+                b.total_amount_cents,
+                b.receipt_total_cents
+            FROM {batch} b
+            LEFT JOIN dim_product p
+                ON p.product_id IS NOT DISTINCT FROM b.product_id
+               AND p.product_name IS NOT DISTINCT FROM b.product_name
+            LEFT JOIN dim_city ci
+                ON ci.city IS NOT DISTINCT FROM b.city
+               AND ci.country_id IS NOT DISTINCT FROM b.country_id
+               AND ci.country IS NOT DISTINCT FROM b.country
+        """).fetchone()[0]
+        update_table_stats(con, batch)
+        update_customer_summary(con, batch)
+        update_rollups(con, batch)
+        return rows
+    finally:
+        con.execute("DROP TABLE IF EXISTS upsert_staging")
+        con.execute("DROP TABLE IF EXISTS customer_batch")
+        con.execute("DROP VIEW IF EXISTS sales_batch_typed")
+        if not isinstance(source, str):
+            con.unregister('sales_batch')
+
+
+def stage_new_rows(con, source: str, target, key: str = 'transaction_id', staging: str = 'upsert_staging') -> str:
+    """Copy the rows of source whose key is not yet in target into a temp staging table and return its name.
+
+    Rows repeated within source are kept once; rows without a key are always
+    kept. Existing keys are found with one set-based anti-join, limited to the
+    batch's key range so DuckDB can skip the rest of target by its zone maps.
+    With target=None the batch is only deduplicated.
+    """
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE {staging} AS
+        SELECT * FROM {source}
+        QUALIFY {key} IS NULL OR ROW_NUMBER() OVER (PARTITION BY {key}) = 1
+    """)
+    low, high = con.execute(f"SELECT MIN({key}), MAX({key}) FROM {staging}").fetchone()
+    if target is not None and low is not None:
+        con.execute(f"""
+            DELETE FROM {staging}
+            WHERE {key} IN (SELECT {key} FROM {target} WHERE {key} BETWEEN ? AND ?)
+        """, [low, high])
+    return staging
+
+
+def upsert_rows(con, table_name: str, source, key: str = 'transaction_id', update_existing: bool = False) -> tuple:
+    """Idempotently load source (DataFrame, relation, or a table/view name in con) into table_name, keyed on key.
+
+    The table is created from the source's columns if it does not exist yet.
+    Rows whose key is already stored are skipped, or replaced when
+    update_existing is True; duplicates within the batch are loaded once.
+    Runs in its own transaction. Returns (rows inserted, rows skipped).
+    """
+    source_name = source if isinstance(source, str) else 'upsert_source'
+    if not isinstance(source, str):
+        con.register('upsert_source', source)
+    try:
+        con.execute("BEGIN TRANSACTION")
+        try:
+            if object_type(con, table_name) is None:
+                con.execute(f"CREATE TABLE {table_name} AS SELECT * FROM {source_name} LIMIT 0")
+            columns = [row[0] for row in con.execute(f"DESCRIBE {table_name}").fetchall()]
+            if key not in columns:
+                raise ValueError(f"Key column '{key}' not found in {table_name}")
+            total = con.execute(f"SELECT COUNT(*) FROM {source_name}").fetchone()[0]
+            if update_existing:
+                stage_new_rows(con, source_name, None, key)
+                con.execute(f"DELETE FROM {table_name} WHERE {key} IN (SELECT {key} FROM upsert_staging)")
+            else:
+                stage_new_rows(con, source_name, table_name, key)
+            inserted = con.execute(f"INSERT INTO {table_name} BY NAME SELECT * FROM upsert_staging").fetchone()[0]
+            con.execute("DROP TABLE upsert_staging")
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+    finally:
+        if not isinstance(source, str):
+            con.unregister('upsert_source')
+    return inserted, total - inserted
@@ -3,6 +3,7 @@ import duckdb
 from datetime import datetime, timedelta
 from tqdm import tqdm
 from pprint import pprint
+from storage import upsert_rows
 
 
 
@@ -11,12 +12,13 @@ def main():
     #import the csv name of file
     # chunk_1.csv to chunk_384.csv
     csv_files = [f"src/chunk_{i}.csv" for i in range(1,384)]
-    for csv_file in csv_files:
+    for i, csv_file in enumerate(csv_files):
         print(f'Processing file: {csv_file}')
         con = transform_data(csvfile=csv_file)
         
         if con is not None:
-            create_duckdb_table(con)
+            # The first chunk replaces the table, later chunks are added to it
+            create_duckdb_table(con, upsert=i > 0)
             
             # Display sample data using DuckDB
             sample_data = con.execute("SELECT * FROM csv_data LIMIT 5").df()
@@ -62,20 +64,27 @@ def transform_data(csvfile: str):
 #    return mappings  
      
 
-def create_duckdb_table(source_con, table_name="all_data"):    
+def create_duckdb_table(source_con, table_name="all_data", upsert=False, key="transaction_id"):
+    """Store csv_data of source_con as table_name, replacing it; with upsert, add only rows whose key is new"""
     if source_con is None:
         print("No connection provided, skipping table creation")
         return
-        
+
+    # csv_data lives in source_con, so it is copied over as a DataFrame
+    csv_data = source_con.execute("SELECT * FROM csv_data").df()
+    records = len(csv_data)
+
     # 4. Use DuckDB to store the transformed data
     with duckdb.connect(database='transformed_data.db', read_only=False) as target_con:
-        # Create the table if it doesn't exist
+        if upsert and key in csv_data.columns:
+            # Rows already loaded from an earlier run or chunk are skipped
+            inserted, skipped = upsert_rows(target_con, table_name, csv_data, key=key)
+            print(f"Processed {records} records: {inserted} inserted into DuckDB table {table_name}, {skipped} already present")
+            return
+        target_con.register('csv_data', csv_data)
         target_con.execute(f"DROP TABLE IF EXISTS {table_name}")
         target_con.execute(f"CREATE TABLE {table_name} AS SELECT * FROM csv_data")
-        
-        # Get record count
-        records = source_con.execute("SELECT COUNT(*) FROM csv_data").fetchone()[0]
-        
+
     print(f"Processed {records} records inserted into DuckDB table {table_name}")
 
 if __name__ == "__main__":
@@ -1,5 +1,18 @@
 import duckdb
 
+from query_router import routed
+
+# Age bands of these insights, over whichever table the router picks
+AGE_GROUP = ('age_group', """
+    CASE
+        WHEN {age} < 25 THEN 'Under 25'
+        WHEN {age} BETWEEN 25 AND 40 THEN '25-40'
+        WHEN {age} >= 41 THEN '41+'
+        ELSE 'Unknown'
+    END
+""")
+PRODUCT_SALES = {'transaction_desc': 'Product Sale'}
+
 def generate_insights_summary():
     """Generate key insights from the retail analytics visualizations"""
     
@@ -9,74 +22,55 @@ def generate_insights_summary():
         
         # 1. Demographics Analysis
         print("\n📊 DEMOGRAPHICS INSIGHTS:")
-        age_distribution = con.execute("""
-            SELECT 
-                CASE 
-                    WHEN age < 25 THEN 'Under 25'
-                    WHEN age BETWEEN 25 AND 40 THEN '25-40'
-                    WHEN age >= 41 THEN '41+'
-                    ELSE 'Unknown'
-                END as age_group,
-                COUNT(*) as transactions,
-                SUM(total_amount_per_product_sgd) as revenue,
-                ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM sales_data WHERE transaction_desc = 'Product Sale'), 2) as percentage
-            FROM sales_data 
-            WHERE age IS NOT NULL AND transaction_desc = 'Product Sale'
-            GROUP BY age_group
+        plan = routed(con, """
+            SELECT
+                age_group,
+                transactions,
+                revenue,
+                ROUND(transactions * 100.0 / SUM(transactions) OVER (), 2) as percentage
+            FROM {base}
+            WHERE age_group <> 'Unknown'
             ORDER BY transactions DESC
-        """).df()
+        """, ['transactions', 'revenue'], [AGE_GROUP], filters=PRODUCT_SALES)
+        age_distribution = con.execute(plan.sql, plan.params).df()
         
         for _, row in age_distribution.iterrows():
             print(f"   👥 {row['age_group']}: {row['percentage']:.1f}% of customers, SGD ${row['revenue']/1000000:.1f}M revenue")
         
         # 2. Top Performing Products (Recent Years)
         print("\n🏆 TOP PRODUCTS (2020-2025):")
-        top_products_recent = con.execute("""
-            SELECT 
-                product_name,
-                SUM(total_amount_per_product_sgd) as revenue,
-                COUNT(*) as transactions
-            FROM sales_data 
-            WHERE transaction_desc = 'Product Sale' 
-            AND EXTRACT(year FROM date) >= 2020
-            GROUP BY product_name
+        plan = routed(con, """
+            SELECT product_name, revenue, transactions
+            FROM {base}
             ORDER BY revenue DESC
             LIMIT 5
-        """).df()
+        """, ['revenue', 'transactions'], ['product_name'], filters=dict(PRODUCT_SALES, start_date='2020-01-01'))
+        top_products_recent = con.execute(plan.sql, plan.params).df()
         
         for i, row in top_products_recent.iterrows():
             print(f"   {i+1}. {row['product_name']}: SGD ${row['revenue']/1000000:.1f}M ({row['transactions']:,} sales)")
         
         # 3. Country Performance Rankings
         print("\n🌏 COUNTRY PERFORMANCE RANKINGS:")
-        country_performance = con.execute("""
-            SELECT 
-                country,
-                SUM(total_amount_per_product_sgd) as revenue,
-                COUNT(*) as transactions,
-                COUNT(DISTINCT customer_number) as customers
-            FROM sales_data 
-            WHERE transaction_desc = 'Product Sale'
-            GROUP BY country
+        plan = routed(con, """
+            SELECT country, revenue, transactions, customers
+            FROM {base}
             ORDER BY revenue DESC
-        """).df()
+        """, ['revenue', 'transactions', 'customers'], ['country'], filters=PRODUCT_SALES)
+        country_performance = con.execute(plan.sql, plan.params).df()
         
         for i, row in country_performance.iterrows():
             print(f"   {i+1}. {row['country']}: SGD ${row['revenue']/1000000:.0f}M revenue, {row['customers']:,} customers")
         
         # 4. Seasonal Trends
         print("\n📅 SEASONAL TRENDS:")
-        monthly_trends = con.execute("""
-            SELECT 
-                month_text,
-                SUM(total_amount_per_product_sgd) as revenue,
-                COUNT(*) as transactions
-            FROM sales_data 
-            WHERE transaction_desc = 'Product Sale'
-            GROUP BY month_text, month
+        plan = routed(con, """
+            SELECT month_text, revenue, transactions
+            FROM {base}
             ORDER BY revenue DESC
             LIMIT 3
-        """).df()
+        """, ['revenue', 'transactions'], ['month_of_year', 'month_text'], filters=PRODUCT_SALES)
+        monthly_trends = con.execute(plan.sql, plan.params).df()
         
         print("   📈 Best Months:")
         for _, row in monthly_trends.iterrows():
@@ -100,17 +94,12 @@ def generate_insights_summary():
         
         # 6. Growth Trends (Recent Years)
         print("\n📈 RECENT GROWTH TRENDS (2020-2025):")
-        yearly_growth = con.execute("""
-            SELECT 
-                EXTRACT(year FROM date) as year,
-                SUM(total_amount_per_product_sgd) as revenue,
-                COUNT(DISTINCT customer_number) as customers
-            FROM sales_data 
-            WHERE transaction_desc = 'Product Sale'
-            AND EXTRACT(year FROM date) >= 2020
-            GROUP BY EXTRACT(year FROM date)
+        plan = routed(con, """
+            SELECT year, revenue, customers
+            FROM {base}
             ORDER BY year
-        """).df()
+        """, ['revenue', 'customers'], ['year'], filters=dict(PRODUCT_SALES, start_date='2020-01-01'))
+        yearly_growth = con.execute(plan.sql, plan.params).df()
         
         for _, row in yearly_growth.iterrows():
             print(f"   📅 {int(row['year'])}: SGD ${row['revenue']/1000000:.1f}M revenue, {row['customers']:,} customers")
@@ -121,7 +110,7 @@ def generate_insights_summary():
             SELECT 
                 COUNT(*) as total_sales,
                 SUM(total_amount_per_product_sgd) as total_revenue,
-                COUNT(DISTINCT customer_number) as total_customers,
+                COUNT(DISTINCT customer_id) as total_customers,
                 COUNT(DISTINCT product_name) as total_products,
                 COUNT(DISTINCT country) as total_countries
             FROM sales_data 
@@ -0,0 +1,423 @@
+"""Single writer process for the DuckDB database.
+
+DuckDB allows one read-write connection per database file. Instead of every
+producer opening its own connection (and retrying while another one holds the
+lock), a WriterService process owns the connection and producers send it
+DataFrames over a local socket (a unix socket, or a named pipe on Windows).
+Appends that arrive close together are committed in one group transaction.
+
+    with WriterService(db_path) as writer:
+        client = writer.client()          # picklable, can be handed to worker processes
+        client.append(batch)              # returns once the rows are committed
+
+Each database has a well-known writer address derived from its absolute path
+(writer_address), and the running writer keeps its authkey in a file only the
+owner can read (writer_key_path), so producers in any process find it with
+running_writer(db_path). A long-lived writer for other processes to share:
+
+    python src/writer_service.py src/sales_timeseries.db
+
+The generators use writer_client(db_path): the running writer if there is one,
+otherwise a writer started for the duration of their run. save_to_duckdb_table
+uses the running writer or, without one, a direct connection.
+"""
+import atexit
+import hashlib
+import multiprocessing
+import os
+import queue
+import secrets
+import signal
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Listener
+
+import duckdb
+
+from storage import append_group_rows, completed_chunks, ensure_schema
+
+
+# A group is committed once it holds this many rows, or GROUP_WAIT_MS after its first append
+GROUP_MAX_ROWS = 500_000
+GROUP_WAIT_MS = 20
+STARTUP_TIMEOUT = 60
+# Readers such as the API pool hold the file briefly; a writer waits this long for them to let go
+LOCK_WAIT_SECONDS = 30
+
+
+def connect_writable(db_path: str, wait: float = LOCK_WAIT_SECONDS):
+    """Read-write connection to db_path, retrying while another process holds the file lock"""
+    deadline = time.perf_counter() + wait
+    while True:
+        try:
+            return duckdb.connect(database=db_path, read_only=False)
+        except duckdb.IOException as e:
+            if 'lock' not in str(e).lower() or time.perf_counter() >= deadline:
+                raise
+            time.sleep(0.1)
+
+
+# Unix socket paths are limited to about 104-108 bytes
+MAX_SOCKET_PATH = 100
+
+
+def writer_address(db_path: str) -> str:
+    """Well-known local socket address of db_path's writer: a socket next to the database, or a named pipe on Windows"""
+    path = os.path.abspath(db_path)
+    name = f"csvanalyzer-writer-{hashlib.sha256(path.encode()).hexdigest()[:16]}"
+    if sys.platform == 'win32':
+        return rf'\\.\pipe\{name}'
+    address = f"{path}.writer.sock"
+    return address if len(address) <= MAX_SOCKET_PATH else os.path.join(tempfile.gettempdir(), f"{name}.sock")
+
+
+def writer_key_path(db_path: str) -> str:
+    """File next to db_path holding the running writer's authkey, readable by its owner only"""
+    return f"{os.path.abspath(db_path)}.writer.key"
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class _Request:
+    """One append waiting for its group commit"""
+
+    def __init__(self, batch, manifest, upsert=False):
+        self.batch = batch
+        self.manifest = manifest
+        self.upsert = upsert
+        self.reply = None
+        self.done = threading.Event()
+
+    def finish(self, reply):
+        self.reply = reply
+        self.done.set()
+
+
+class _Query(_Request):
+    """A read answered by the writer loop, which owns the connection, in order with the appends"""
+
+    def __init__(self, op, *args):
+        super().__init__(None, None)
+        self.op = op
+        self.args = args
+
+    def run(self, con) -> None:
+        try:
+            if self.op == 'completed':
+                self.finish(('ok', completed_chunks(con, *self.args)))
+            else:
+                self.finish(('error', f"unknown query {self.op}"))
+        except Exception as e:
+            self.finish(('error', str(e)))
+
+
+def _serve_client(conn, requests: queue.Queue, stats: dict) -> None:
+    """Handle one producer connection: queue its appends and answer once they are committed"""
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            op = message[0]
+            if op in ('append', 'completed'):
+                request = _Request(*message[1:]) if op == 'append' else _Query(*message)
+                requests.put(request)
+                request.done.wait()
+                conn.send(request.reply)
+            elif op == 'stats':
+                conn.send(('ok', dict(stats)))
+            elif op == 'stop':
+                requests.put(None)
+                conn.send(('ok', None))
+    finally:
+        conn.close()
+
+
+def _commit(con, group: list, stats: dict) -> None:
+    """Commit a group in one transaction; if it fails, retry each append alone so one bad batch fails alone"""
+    try:
+        counts = append_group_rows(con, [(request.batch, request.manifest) for request in group], upsert=group[0].upsert)
+        stats['groups'] += 1
+        stats['appends'] += len(group)
+        stats['rows'] += sum(counts)
+        for request, rows in zip(group, counts):
+            request.finish(('ok', rows))
+        return
+    except Exception as e:
+        if len(group) == 1:
+            stats['errors'] += 1
+            group[0].finish(('error', str(e)))
+            return
+    for request in group:
+        _commit(con, [request], stats)
+
+
+def run_writer(db_path: str, address: str, authkey: bytes, status, memory_limit: str = None,
+               group_max_rows: int = GROUP_MAX_ROWS, group_wait_ms: float = GROUP_WAIT_MS) -> None:
+    """Writer process entry point: own the read-write connection and group-commit incoming appends"""
+    # Ctrl+C reaches the whole process group; the owner stops the writer, which commits what is queued
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    key_path = writer_key_path(db_path)
+    try:
+        con = connect_writable(db_path)
+        if memory_limit:
+            con.execute(f"SET memory_limit = '{memory_limit}'")
+        ensure_schema(con)
+        # Holding the file lock, no other writer of this database is alive: a socket left here is stale
+        if sys.platform != 'win32':
+            _remove(address)
+        listener = Listener(address, authkey=authkey)
+        key_file = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(key_file, 'wb') as f:
+            f.write(authkey)
+    except Exception as e:
+        status.send(('error', str(e)))
+        return
+
+    requests = queue.Queue()
+    stats = {'groups': 0, 'appends': 0, 'rows': 0, 'errors': 0, 'pid': os.getpid()}
+
+    def accept_loop():
+        while True:
+            try:
+                conn = listener.accept()
+            except (EOFError, multiprocessing.AuthenticationError):
+                continue  # a client that failed the handshake
+            except OSError:
+                break  # listener closed on shutdown
+            threading.Thread(target=_serve_client, args=(conn, requests, stats), daemon=True).start()
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    status.send(('ready', None))
+
+    stopping = False
+    carried = None
+    while not stopping:
+        first = carried if carried is not None else requests.get()
+        carried = None
+        if first is None:
+            break
+        if isinstance(first, _Query):
+            first.run(con)
+            continue
+        group, rows = [first], len(first.batch)
+        deadline = time.perf_counter() + group_wait_ms / 1000
+        # Gather whatever else arrives shortly after, up to the group size
+        while rows < group_max_rows:
+            try:
+                request = requests.get(timeout=max(0, deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            if request is None:
+                stopping = True
+                break
+            if isinstance(request, _Query) or request.upsert != first.upsert:
+                carried = request  # plain appends, upserts and reads are handled in separate steps
+                break
+            group.append(request)
+            rows += len(request.batch)
+        _commit(con, group, stats)
+    if isinstance(carried, _Query):
+        carried.run(con)
+    elif carried is not None:
+        _commit(con, [carried], stats)
+
+    # Finish appends that were already queued before the stop request
+    while True:
+        try:
+            request = requests.get_nowait()
+        except queue.Empty:
+            break
+        if isinstance(request, _Query):
+            request.run(con)
+        elif request is not None:
+            _commit(con, [request], stats)
+
+    _remove(key_path)
+    con.execute("CHECKPOINT")
+    con.close()
+    listener.close()
+
+
+class WriterClient:
+    """Producer side of a WriterService; safe to pickle into worker processes (reconnects lazily)"""
+
+    def __init__(self, address: str, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._conn = None
+
+    def __getstate__(self):
+        return {'address': self.address, 'authkey': self.authkey, '_conn': None}
+
+    def _request(self, message):
+        if self._conn is None:
+            self._conn = Client(self.address, authkey=self.authkey)
+        self._conn.send(message)
+        status, value = self._conn.recv()
+        if status == 'error':
+            raise RuntimeError(value)
+        return value
+
+    def append(self, batch, upsert: bool = False) -> int:
+        """Append a DataFrame; returns the rows added once the group holding it is committed.
+
+        With upsert=True rows whose transaction_id is already stored are skipped
+        and not counted.
+        """
+        return self._request(('append', batch, None, upsert))
+
+    def append_chunk(self, batch, start_date, end_date, seed: int) -> int:
+        """Append a generated chunk together with its generation_manifest entry"""
+        return self._request(('append', batch, (start_date, end_date, seed)))
+
+    def completed_chunks(self, seed: int) -> set:
+        """(start_date, end_date) of the chunks generation_manifest records for seed"""
+        return self._request(('completed', seed))
+
+    def stats(self) -> dict:
+        """Groups, appends, rows and errors committed by the writer so far, and its process id"""
+        return self._request(('stats',))
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class WriterService:
+    """Runs run_writer in a dedicated process that owns the database's read-write connection"""
+
+    def __init__(self, db_path: str, address: str = None, memory_limit: str = None,
+                 group_max_rows: int = GROUP_MAX_ROWS, group_wait_ms: float = GROUP_WAIT_MS):
+        self.db_path = db_path
+        self.address = address or writer_address(db_path)
+        self.authkey = secrets.token_bytes(16)
+        self.memory_limit = memory_limit
+        self.group_max_rows = group_max_rows
+        self.group_wait_ms = group_wait_ms
+        self.process = None
+
+    def start(self) -> 'WriterService':
+        # Spawn (not fork) so the writer never inherits DuckDB threads or open connections
+        ctx = multiprocessing.get_context('spawn')
+        status, child_status = ctx.Pipe(duplex=False)
+        self.process = ctx.Process(
+            target=run_writer,
+            args=(self.db_path, self.address, self.authkey, child_status, self.memory_limit,
+                  self.group_max_rows, self.group_wait_ms),
+            daemon=True,
+        )
+        self.process.start()
+        child_status.close()
+        if not status.poll(STARTUP_TIMEOUT):
+            self.process.terminate()
+            raise RuntimeError(f"Writer for {self.db_path} did not start within {STARTUP_TIMEOUT}s")
+        try:
+            state, message = status.recv()
+        except EOFError:
+            state, message = 'error', 'writer process exited during startup'
+        if state != 'ready':
+            self.process.join()
+            raise RuntimeError(f"Writer for {self.db_path} failed to start: {message}")
+        return self
+
+    def client(self) -> WriterClient:
+        return WriterClient(self.address, self.authkey)
+
+    def stop(self) -> dict:
+        """Commit what is queued, checkpoint and shut the writer down; returns its final stats"""
+        if self.process is None or not self.process.is_alive():
+            return {}
+        client = self.client()
+        try:
+            stats = client.stats()
+            client._request(('stop',))
+        finally:
+            client.close()
+        self.process.join()
+        self.process = None
+        if sys.platform != 'win32':
+            _remove(self.address)
+        return stats
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# Writer services this process started with get_writer(), one per database file
+_shared_writers = {}
+
+
+def get_writer(db_path: str) -> WriterService:
+    """Writer service for db_path started by this process, on first use, and stopped at exit.
+
+    Producers in other processes find it with running_writer(db_path).
+    """
+    key = os.path.abspath(db_path)
+    writer = _shared_writers.get(key)
+    if writer is None or writer.process is None or not writer.process.is_alive():
+        writer = WriterService(db_path).start()
+        _shared_writers[key] = writer
+    return writer
+
+
+def running_writer(db_path: str):
+    """Connected client of the writer of db_path running in any process, or None when there is none"""
+    try:
+        with open(writer_key_path(db_path), 'rb') as f:
+            authkey = f.read()
+        client = WriterClient(writer_address(db_path), authkey)
+        client._conn = Client(client.address, authkey=authkey)
+        return client
+    except (OSError, EOFError, multiprocessing.AuthenticationError):
+        return None  # no key file, or one left behind by a writer that is gone
+
+
+@contextmanager
+def writer_client(db_path: str, memory_limit: str = None):
+    """Client of the running writer of db_path if there is one, else of a writer started for the with-block"""
+    client = running_writer(db_path)
+    service = None if client is not None else WriterService(db_path, memory_limit=memory_limit).start()
+    client = client or service.client()
+    try:
+        yield client
+    finally:
+        client.close()
+        if service is not None:
+            service.stop()
+
+
+def stop_writers() -> None:
+    """Stop every shared writer service, releasing their database locks"""
+    while _shared_writers:
+        _, writer = _shared_writers.popitem()
+        writer.stop()
+
+
+atexit.register(stop_writers)
+
+
+if __name__ == '__main__':
+    # Serve one database's writes until interrupted
+    if len(sys.argv) != 2:
+        sys.exit("usage: python writer_service.py DB_PATH")
+    service = WriterService(sys.argv[1]).start()
+    print(f"✍️ Writer for {os.path.abspath(sys.argv[1])} listening on {service.address}; Ctrl+C stops it", flush=True)
+    try:
+        service.process.join()
+    except KeyboardInterrupt:
+        stats = service.stop()
+        print(f"🛑 Writer stopped after {stats.get('rows', 0):,} rows in {stats.get('groups', 0):,} groups")
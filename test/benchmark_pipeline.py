@@ -0,0 +1,223 @@
+"""Benchmark harness for the generation and ingest pipeline.
+
+Runs each stage on fixed-size datasets in a fresh process and writes the
+results as JSON, so runs can be compared and regressions caught:
+
+    python test/benchmark_pipeline.py --rows 100000 1000000 --output bench.json
+    python test/benchmark_pipeline.py --rows 100000 --baseline bench.json
+"""
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import duckdb
+
+from batch_generator import DEFAULT_SEED, MAX_TRANSACTIONS_PER_DAY, generate_batch
+
+STAGES = ['generate_batch', 'generate_initial_data1', 'generate_initial_data2', 'save_to_duckdb', 'save_to_duckdb_table']
+DEFAULT_ROWS = [100_000, 1_000_000]
+BENCHMARK_START = datetime(1900, 1, 1)
+DEFAULT_TOLERANCE = 0.20
+
+
+def date_range_for_rows(target_rows: int):
+    """Fixed (start, end) range expected to hold about target_rows transactions"""
+    average_per_day = (1 + MAX_TRANSACTIONS_PER_DAY) / 2
+    days = max(1, math.ceil(target_rows / average_per_day))
+    return BENCHMARK_START, BENCHMARK_START + timedelta(days=days - 1)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and its finished children, in MB"""
+    unit = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * unit / (1024 * 1024)
+
+
+def db_size_mb(db_path: str) -> float:
+    """Size of a DuckDB file plus its WAL, in MB"""
+    size = sum(os.path.getsize(p) for p in (db_path, db_path + '.wal') if os.path.exists(p))
+    return size / (1024 * 1024)
+
+
+def run_stage(task: tuple) -> dict:
+    """Run one stage in this (fresh) process and return its measurements"""
+    stage, target_rows, seed, workers, workdir = task
+    import main  # imported here so the parent process stays small
+
+    start_date, end_date = date_range_for_rows(target_rows)
+    db_path = os.path.join(workdir, f"{stage}_{target_rows}.db")
+    for path in (db_path, db_path + '.wal'):
+        if os.path.exists(path):
+            os.remove(path)
+
+    timings = {}
+    rows = 0
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if stage == 'generate_batch':
+            t0 = time.perf_counter()
+            rows = len(generate_batch(start_date, end_date, seed=seed))
+            timings['generate'] = time.perf_counter() - t0
+
+        elif stage == 'generate_initial_data1':
+            t0 = time.perf_counter()
+            date_ranges = main.split_datetime_range(start_date, end_date)
+            main.generate_initial_data1(date_ranges, is_initial_generation=False, workers=workers,
+                                        seed=seed, db_path=db_path)
+            timings['generate_and_write'] = time.perf_counter() - t0
+
+        elif stage == 'generate_initial_data2':
+            t0 = time.perf_counter()
+            result = main.generate_initial_data2(f"{start_date:%Y-%m-%d %H:%M:%S}", f"{end_date:%Y-%m-%d %H:%M:%S}",
+                                                 db_path=db_path, seed=seed)
+            timings['generate_and_write'] = time.perf_counter() - t0
+            rows = result['total_transactions'] if isinstance(result, dict) else len(result)
+
+        elif stage in ('save_to_duckdb', 'save_to_duckdb_table'):
+            t0 = time.perf_counter()
+            batch = generate_batch(start_date, end_date, seed=seed)
+            timings['generate'] = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            if stage == 'save_to_duckdb':
+                main.save_to_duckdb(batch, db_path=db_path)
+            else:
+                main.save_to_duckdb_table(batch, db_path=db_path)
+            timings['write'] = time.perf_counter() - t0
+            rows = len(batch)
+
+        else:
+            raise ValueError(f"Unknown stage: {stage}")
+
+    if os.path.exists(db_path):
+        with duckdb.connect(db_path, read_only=True) as con:
+            rows = con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0]
+
+    wall = sum(timings.values())
+    result = {
+        'stage': stage,
+        'target_rows': target_rows,
+        'rows': int(rows),
+        'workers': workers,
+        'wall_seconds': round(wall, 4),
+        'stage_seconds': {name: round(seconds, 4) for name, seconds in timings.items()},
+        'rows_per_sec': round(rows / wall, 1) if wall > 0 else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'db_size_mb': round(db_size_mb(db_path), 3) if os.path.exists(db_path) else None,
+    }
+    for path in (db_path, db_path + '.wal'):
+        if os.path.exists(path):
+            os.remove(path)
+    return result
+
+
+def git_commit():
+    """Current git commit of the repository, if available"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(rows=DEFAULT_ROWS, stages=STAGES, seed: int = DEFAULT_SEED, workers: int = 1, workdir: str = None) -> dict:
+    """Run every stage for every dataset size, each in its own spawned process"""
+    owns_workdir = workdir is None
+    if owns_workdir:
+        workdir = tempfile.mkdtemp(prefix='csvanalyzer_bench_')
+
+    results = []
+    ctx = multiprocessing.get_context('spawn')
+    try:
+        for target_rows in rows:
+            for stage in stages:
+                print(f"⏱️ {stage} @ {target_rows:,} rows...")
+                # A fresh process per run so peak RSS belongs to this stage only
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as executor:
+                    result = executor.submit(run_stage, (stage, target_rows, seed, workers, workdir)).result()
+                results.append(result)
+                print(f"   ✅ {result['rows']:,} rows in {result['wall_seconds']:.2f}s "
+                      f"({result['rows_per_sec'] or 0:,.0f} rows/sec, peak RSS {result['peak_rss_mb']:.0f} MB)")
+    finally:
+        if owns_workdir:
+            for name in os.listdir(workdir):
+                os.remove(os.path.join(workdir, name))
+            os.rmdir(workdir)
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'duckdb': duckdb.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+        'results': results,
+    }
+
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """Return a message for every stage whose throughput dropped more than tolerance below the baseline"""
+    previous = {(r['stage'], r['target_rows'], r.get('workers', 1)): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        before = previous.get((result['stage'], result['target_rows'], result['workers']))
+        if not before or not before.get('rows_per_sec') or not result.get('rows_per_sec'):
+            continue
+        change = result['rows_per_sec'] / before['rows_per_sec'] - 1
+        print(f"  {result['stage']} @ {result['target_rows']:,}: {before['rows_per_sec']:,.0f} → "
+              f"{result['rows_per_sec']:,.0f} rows/sec ({change:+.1%})")
+        if change < -tolerance:
+            regressions.append(f"{result['stage']} @ {result['target_rows']:,} rows is {-change:.1%} slower")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the sales data generation and ingest pipeline")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help="Dataset sizes (approximate rows)")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help="Stages to run")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes for generate_initial_data1")
+    parser.add_argument('--output', help="Write the JSON report to this file (default: stdout)")
+    parser.add_argument('--baseline', help="JSON report of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed throughput drop against the baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    report = run_benchmark(rows=args.rows, stages=args.stages, seed=args.seed, workers=args.workers)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\n📊 Compared to {args.baseline}:")
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        if regressions:
+            for message in regressions:
+                print(f"❌ {message}")
+            return 1
+        print("✅ No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
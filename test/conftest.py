@@ -0,0 +1,44 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import app as app_module
+from batch_generator import generate_batch
+from connection_pool import ReadOnlyPool
+from storage import append_sales, ensure_schema
+
+
+@pytest.fixture
+def api_client(monkeypatch):
+    """Factory: a TestClient of the API serving db_path through its own ReadOnlyPool, closed after the test"""
+    opened = []
+
+    def connect(db_path, **pool_options):
+        pool = ReadOnlyPool(db_path, **pool_options)
+        monkeypatch.setattr(app_module, 'db_pool', pool)
+        test_client = TestClient(app_module.main())
+        test_client.__enter__()
+        opened.append((test_client, pool))
+        return test_client
+
+    yield connect
+    for test_client, pool in reversed(opened):
+        test_client.__exit__(None, None, None)
+        pool.close()
+
+
+@pytest.fixture
+def client(tmp_path, api_client):
+    """(TestClient, batch) of the API over a database holding 20 days of generated sales"""
+    db_path = str(tmp_path / 'api.db')
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 20))
+    with duckdb.connect(db_path) as con:
+        ensure_schema(con)
+        append_sales(con, batch)
+    return api_client(db_path), batch
@@ -0,0 +1,37 @@
+import os
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_generator import SALES_COLUMNS, MAX_TRANSACTIONS_PER_DAY, generate_batch
+
+
+def test_batch_has_sales_columns():
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 31))
+    assert list(batch.columns) == SALES_COLUMNS
+    assert 31 <= len(batch) <= 31 * MAX_TRANSACTIONS_PER_DAY
+    assert batch['transaction_id'].is_unique
+    assert batch['age'].between(18, 80).all()
+    assert (batch['total_amount_per_product_sgd'] == batch['units_sold'] * batch['unit_price_sgd']).all()
+
+
+def test_batch_is_independent_of_chunking():
+    whole = generate_batch(datetime(2024, 1, 1), datetime(2024, 3, 31), seed=7)
+    parts = pd.concat([
+        generate_batch(datetime(2024, 1, 1), datetime(2024, 2, 14), seed=7),
+        generate_batch(datetime(2024, 2, 15), datetime(2024, 3, 31), seed=7),
+    ], ignore_index=True)
+    assert whole.equals(parts)
+
+
+def test_seed_changes_output():
+    first = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 10), seed=1)
+    second = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 10), seed=2)
+    assert not first.equals(second)
+
+
+def test_empty_range():
+    assert len(generate_batch(datetime(2024, 1, 2), datetime(2024, 1, 1))) == 0
@@ -0,0 +1,25 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from benchmark_pipeline import compare_to_baseline, run_benchmark
+
+
+def test_benchmark_report_is_json(tmp_path):
+    report = run_benchmark(rows=[2_000], stages=['generate_batch', 'save_to_duckdb_table'], workdir=str(tmp_path))
+    assert [r['stage'] for r in report['results']] == ['generate_batch', 'save_to_duckdb_table']
+    for result in report['results']:
+        assert result['rows'] > 0
+        assert result['rows_per_sec'] > 0
+        assert result['peak_rss_mb'] > 0
+    assert report['results'][1]['db_size_mb'] > 0
+    assert json.loads(json.dumps(report)) == report
+
+
+def test_compare_flags_throughput_drop():
+    baseline = {'results': [{'stage': 'generate_batch', 'target_rows': 100, 'workers': 1, 'rows_per_sec': 1000.0}]}
+    slower = {'results': [{'stage': 'generate_batch', 'target_rows': 100, 'workers': 1, 'rows_per_sec': 700.0}]}
+    assert compare_to_baseline(slower, baseline, tolerance=0.2)
+    assert not compare_to_baseline(baseline, baseline, tolerance=0.2)
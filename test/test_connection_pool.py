@@ -0,0 +1,89 @@
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import duckdb
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_generator import generate_batch
+from connection_pool import ReadOnlyPool
+from storage import append_sales, ensure_schema
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'pool.db')
+    with duckdb.connect(path) as con:
+        ensure_schema(con)
+        append_sales(con, generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 10)))
+    return path
+
+
+def test_pool_reuses_cursors_and_applies_config(db_path):
+    pool = ReadOnlyPool(db_path, size=2, threads=2, memory_limit='256MB')
+    with pool.cursor() as con:
+        first = con
+        assert con.execute("SELECT current_setting('threads')").fetchone()[0] == 2
+        count = con.execute("SELECT COUNT(*) FROM sales_data").fetchone()[0]
+    # Kept open between requests unless release_after is set
+    time.sleep(0.2)
+    assert pool.stats()['open']
+    with pool.cursor() as con:
+        assert con is first
+        assert con.execute("SELECT COUNT(*) FROM sales_data").fetchone()[0] == count > 0
+    pool.close()
+    # The file is released: a writer can open it, and the pool reopens on demand
+    with duckdb.connect(db_path) as con:
+        con.execute("CHECKPOINT")
+    with pool.cursor() as con:
+        assert con is not first
+    pool.close()
+
+
+def test_pool_is_bounded(db_path):
+    pool = ReadOnlyPool(db_path, size=1, timeout=0.1)
+    with pool.cursor():
+        errors = []
+
+        def borrow():
+            try:
+                with pool.cursor():
+                    pass
+            except TimeoutError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=borrow)
+        thread.start()
+        thread.join()
+    assert len(errors) == 1
+    pool.close()
+
+
+def test_cursor_is_dropped_on_any_error(db_path):
+    pool = ReadOnlyPool(db_path, size=1, timeout=0.1)
+    with pytest.raises(ValueError):
+        with pool.cursor() as con:
+            first = con
+            raise ValueError("post-processing failed")
+    assert pool.stats()['idle'] == 0 and pool.stats()['busy'] == 0
+    with pool.cursor() as con:
+        assert con is not first
+        assert con.execute("SELECT 1").fetchone()[0] == 1
+    pool.close()
+
+
+def test_idle_pool_lets_writers_in(db_path):
+    pool = ReadOnlyPool(db_path, release_after=0.05)
+    with pool.cursor() as con:
+        before = con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0]
+    time.sleep(0.3)
+    assert not pool.stats()['open']
+    with duckdb.connect(db_path) as con:
+        append_sales(con, generate_batch(datetime(2024, 2, 1), datetime(2024, 2, 5)))
+    with pool.cursor() as con:
+        assert con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0] > before
+    pool.close()
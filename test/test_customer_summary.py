@@ -0,0 +1,53 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_generator import generate_batch
+from storage import append_sales, ensure_schema, rebuild_customer_summary
+
+
+SUMMARY_COLUMNS = "customer_id, age, country, total_sales, total_amount_cents, first_date, last_date"
+
+
+def test_customer_summary_follows_appends(tmp_path):
+    db_path = str(tmp_path / 'customers.db')
+    first = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 10))
+    second = generate_batch(datetime(2023, 12, 1), datetime(2023, 12, 5))
+    # Some earlier sales of customers already loaded by the first batch
+    second.loc[:19, 'customer_id'] = first['customer_id'].iloc[:20].values
+    with duckdb.connect(db_path) as con:
+        ensure_schema(con)
+        append_sales(con, first)
+        append_sales(con, second)
+        append_sales(con, second, upsert=True)
+        incremental = con.execute(f"SELECT {SUMMARY_COLUMNS} FROM customer_summary ORDER BY customer_id").fetchall()
+        rebuild_customer_summary(con)
+        rebuilt = con.execute(f"SELECT {SUMMARY_COLUMNS} FROM customer_summary ORDER BY customer_id").fetchall()
+        exact = con.execute("SELECT COUNT(DISTINCT customer_id), COUNT(*) FROM sales_fact").fetchone()
+    assert incremental == rebuilt
+    assert len(incremental) == exact[0]
+    assert sum(row[3] for row in incremental) == exact[1] == len(first) + len(second)
+
+
+def test_customer_pages_and_export(client):
+    test_client, batch = client
+    seen, after = [], None
+    while True:
+        params = {'page_size': 250}
+        if after is not None:
+            params['after'] = after
+        response = test_client.get('/customers/summary/', params=params)
+        page = response.json()
+        assert len(page) <= 250
+        seen += [int(customer['customer_id']) for customer in page]
+        after = response.headers.get('X-Next-Cursor')
+        if after is None:
+            break
+    assert seen == sorted(set(batch['customer_id'].astype(int)))
+
+    lines = test_client.get('/customers/export', params={'format': 'ndjson'}).text.splitlines()
+    assert len(lines) == len(seen)
@@ -0,0 +1,47 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_generator import generate_batch
+from dataset import open_dataset
+from storage import append_sales, ensure_schema
+
+
+def make_db(path):
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 15))
+    with duckdb.connect(path) as con:
+        ensure_schema(con)
+        append_sales(con, batch)
+    return batch
+
+
+def test_dataset_is_lazy_and_counts_from_stats(tmp_path):
+    db_path = str(tmp_path / 'lazy.db')
+    batch = make_db(db_path)
+    dataset = open_dataset(db_path)
+    assert len(dataset) == len(batch)
+    assert 'customer_id' in dataset.columns
+    assert len(dataset.head(5).fetchall()) == 5
+
+    rel = dataset.relation(['transaction_id', 'units_sold'], where='units_sold > ?', params=[3],
+                           order_by='transaction_id', limit=20)
+    expected = batch[batch['units_sold'] > 3].sort_values('transaction_id').head(20)
+    assert [row[0] for row in rel.fetchall()] == expected['transaction_id'].tolist()
+
+    # Closing releases the file for writers; the next call reopens it
+    dataset.close()
+    with duckdb.connect(db_path) as con:
+        con.execute("CHECKPOINT")
+    assert dataset.count() == len(batch)
+    dataset.close()
+
+
+def test_open_dataset_missing(tmp_path):
+    assert open_dataset(str(tmp_path / 'missing.db')) is None
+    with duckdb.connect(str(tmp_path / 'empty.db')):
+        pass
+    assert open_dataset(str(tmp_path / 'empty.db')) is None
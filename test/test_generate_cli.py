@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+
+import duckdb
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import generate
+
+
+def test_cli_generates_and_reports(tmp_path, capsys):
+    db_path = str(tmp_path / 'cli.db')
+    report_path = str(tmp_path / 'report.json')
+    exit_code = generate.main(['--start', '2024-01-01', '--end', '2024-01-31', '--seed', '7',
+                               '--db', db_path, '--json', report_path, '--quiet'])
+    assert exit_code == 0
+    assert 'Generation report' in capsys.readouterr().out
+
+    with open(report_path) as f:
+        report = json.load(f)
+    with duckdb.connect(db_path, read_only=True) as con:
+        rows = con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0]
+    assert report['rows'] == rows > 0
+    assert report['days'] == 31
+    assert report['rows_per_sec'] > 0
+    assert report['peak_rss_mb'] > 0
+    assert report['output_size_mb'] > 0
+
+
+def test_cli_rejects_reversed_range():
+    with pytest.raises(SystemExit) as exc:
+        generate.main(['--start', '2024-02-01', '--end', '2024-01-01'])
+    assert exc.value.code == 2
+
+
+def test_resource_figures_without_the_resource_module(monkeypatch):
+    # As on Windows, where the resource module does not exist
+    monkeypatch.setattr(generate, 'resource', None)
+    rss = generate.peak_rss_mb()
+    assert rss['main'] > 0 and rss['workers'] is None
+    cpu = generate.cpu_seconds()
+    assert cpu['user'] > 0 and cpu['system'] >= 0
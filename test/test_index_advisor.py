@@ -0,0 +1,49 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_generator import generate_batch
+from index_advisor import INDEX_CANDIDATES, advise_indexes
+from storage import CLUSTER_ORDER_WITH_CUSTOMER, append_sales, cluster_sales_fact, drop_star_indexes, ensure_schema
+
+
+def star_db():
+    con = duckdb.connect()
+    ensure_schema(con)
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 3, 31))
+    # Append out of date order, so clustering has something to do
+    append_sales(con, batch.sort_values('transaction_id', ascending=False, ignore_index=True))
+    return con, batch
+
+
+def index_names(con):
+    return {row[0] for row in con.execute("SELECT index_name FROM duckdb_indexes()").fetchall()}
+
+
+def test_cluster_sorts_fact_and_keeps_view():
+    con, batch = star_db()
+    con.execute("CREATE INDEX idx_customer ON sales_fact (customer_id)")
+    assert drop_star_indexes(con) == ['idx_customer']
+    assert cluster_sales_fact(con, CLUSTER_ORDER_WITH_CUSTOMER) == len(batch)
+
+    keys = con.execute("SELECT date, customer_id FROM sales_fact").fetchall()
+    assert keys == sorted(keys)
+    assert con.execute("SELECT COUNT(*) FROM sales_data").fetchone()[0] == len(batch)
+
+
+def test_advisor_records_timings_and_keeps_only_faster_indexes():
+    con, _ = star_db()
+    results = advise_indexes(con, min_speedup=0, repeats=1)
+    assert [r['index_name'] for r in results] == [c['name'] for c in INDEX_CANDIDATES]
+    assert index_names(con) == {c['name'] for c in INDEX_CANDIDATES}
+    assert all(r['before_ms'] > 0 and r['after_ms'] > 0 for r in results)
+
+    results = advise_indexes(con, min_speedup=float('inf'), repeats=1)
+    assert not any(r['kept'] for r in results)
+    assert index_names(con) == set()
+    advice = con.execute("SELECT index_name, kept FROM index_advice ORDER BY index_name").fetchall()
+    assert sorted((r['index_name'], r['kept']) for r in results) == advice
@@ -0,0 +1,46 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import memory_governor
+from memory_governor import MemoryGovernor
+
+
+def test_plan_covers_range_without_gaps():
+    governor = MemoryGovernor(budget_mb=4096, max_days=30)
+    chunks = list(governor.plan_chunks([(datetime(2024, 1, 1), datetime(2024, 12, 31))]))
+    assert chunks[0][0] == datetime(2024, 1, 1)
+    assert chunks[-1][1] == datetime(2024, 12, 31)
+    for (_, previous_end), (next_start, _) in zip(chunks, chunks[1:]):
+        assert next_start == previous_end + timedelta(days=1)
+    assert all((end - start).days + 1 <= 30 for start, end in chunks)
+
+
+def test_smaller_budget_means_smaller_chunks():
+    assert MemoryGovernor(budget_mb=4096).chunk_days() > MemoryGovernor(budget_mb=600).chunk_days()
+    assert MemoryGovernor(budget_mb=4096, in_flight=8).chunk_days() < MemoryGovernor(budget_mb=4096).chunk_days()
+
+
+def test_chunks_shrink_near_budget_and_grow_back(monkeypatch):
+    governor = MemoryGovernor(budget_mb=8192, max_days=1_000_000)
+    full = governor.chunk_days()
+    monkeypatch.setattr(memory_governor, 'current_rss_mb', lambda: 8000)
+    governor.after_flush()
+    assert governor.chunk_days() < full
+    monkeypatch.setattr(memory_governor, 'current_rss_mb', lambda: 100)
+    for _ in range(20):
+        governor.after_flush()
+    assert governor.chunk_days() == full
+
+
+def test_writer_rss_counts_against_the_budget(monkeypatch):
+    governor = MemoryGovernor(budget_mb=8192, max_days=1_000_000)
+    full = governor.chunk_days()
+    monkeypatch.setattr(memory_governor, 'current_rss_mb', lambda: 100)
+    monkeypatch.setattr(memory_governor, 'process_rss_mb', lambda pid: 7900 if pid == 4242 else 0)
+    assert governor.after_flush() == 100
+    governor.track_writer(4242)
+    assert governor.after_flush() == 8000
+    assert governor.chunk_days() < full and governor.peak_rss_mb == 8000
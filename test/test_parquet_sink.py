@@ -0,0 +1,39 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_generator import generate_batch
+from parquet_sink import chunk_label, parquet_dataset_source, write_parquet_chunk
+
+
+def test_chunks_are_partitioned_by_year_and_month(tmp_path):
+    dataset = str(tmp_path / 'sales_data')
+    first = generate_batch(datetime(2023, 12, 1), datetime(2024, 1, 31))
+    second = generate_batch(datetime(2024, 2, 1), datetime(2024, 2, 29))
+    write_parquet_chunk(first, dataset, chunk_label(datetime(2023, 12, 1), datetime(2024, 1, 31)))
+    write_parquet_chunk(second, dataset, chunk_label(datetime(2024, 2, 1), datetime(2024, 2, 29)))
+
+    assert os.path.isdir(os.path.join(dataset, 'year=2024', 'month=2'))
+    with duckdb.connect() as con:
+        total = con.execute(f"SELECT COUNT(*) FROM {parquet_dataset_source(dataset)}").fetchone()[0]
+        assert total == len(first) + len(second)
+        february = con.execute(
+            f"SELECT COUNT(*) FROM {parquet_dataset_source(dataset)} WHERE year = 2024 AND month = 2"
+        ).fetchone()[0]
+        assert february == int((first['date'].dt.month == 2).sum()) + int((second['date'].dt.month == 2).sum())
+
+
+def test_rewriting_a_chunk_does_not_duplicate_rows(tmp_path):
+    dataset = str(tmp_path / 'sales_data')
+    batch = generate_batch(datetime(2024, 3, 1), datetime(2024, 3, 15))
+    label = chunk_label(datetime(2024, 3, 1), datetime(2024, 3, 15))
+    write_parquet_chunk(batch, dataset, label)
+    write_parquet_chunk(batch, dataset, label)
+
+    with duckdb.connect() as con:
+        total = con.execute(f"SELECT COUNT(*) FROM {parquet_dataset_source(dataset)}").fetchone()[0]
+    assert total == len(batch)
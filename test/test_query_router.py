@@ -0,0 +1,171 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_generator import generate_batch
+from query_router import REPORTS, SALES_DAILY_ROLLUP, plan_query, report_plan
+from rollups import AGE_GROUP_SQL, INCOME_BAND_SQL, drop_rollups
+from sql_filters import execute
+from storage import append_sales, ensure_schema
+
+
+def rounded(rows):
+    return [tuple(round(float(v), 6) if isinstance(v, float) else v for v in row) for row in rows]
+
+
+def close_estimate(estimate, exact):
+    """Whether a HyperLogLog estimate is within its ~0.8% error (2%, or one for small counts) of the exact count"""
+    return abs(estimate - exact) <= max(1, 0.02 * exact)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'router.db')
+    with duckdb.connect(path) as con:
+        ensure_schema(con)
+        append_sales(con, generate_batch(datetime(2024, 1, 1), datetime(2024, 3, 10)))
+    return path
+
+
+@pytest.fixture
+def repeat_db_path(tmp_path):
+    """Three months of sales by 50 customers who buy again in other hours and products"""
+    path = str(tmp_path / 'repeat.db')
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 3, 31))
+    batch['customer_id'] = batch['customer_id'].iloc[:50].values.repeat(len(batch) // 50 + 1)[:len(batch)]
+    batch['date'] = batch['date'] + pd.to_timedelta(batch.index % 24, unit='h')
+    with duckdb.connect(path) as con:
+        ensure_schema(con)
+        append_sales(con, batch)
+    return path
+
+
+def test_routes_to_smallest_covering_source(db_path):
+    request = dict(measures=['transactions', 'revenue', 'avg_price'], dimensions=['country', 'age_group'],
+                   filters={'start_date': '2024-02-01', 'end_date': '2024-02-29'}, grain='week')
+    with duckdb.connect(db_path) as con:
+        rollup = plan_query(con, **request)
+        assert rollup.source == 'sales_daily_rollup'
+        # The rollup only estimates distinct counts
+        assert plan_query(con, ['customers'], ['country']).source == 'sales_data'
+        assert plan_query(con, ['revenue', 'receipts'], ['month_text']).source == 'sales_data'
+        assert plan_query(con, ['transactions', 'revenue'], ['customer_id']).source == 'customer_summary'
+        assert plan_query(con, ['transactions'], ['hour_of_day'], grain='hour').source == 'sales_daily_rollup'
+        from_rollup = execute(con, rollup.sql, rollup.params).fetchall()
+
+        drop_rollups(con)
+        fallback = plan_query(con, **request)
+        assert fallback.source == 'sales_data'
+        from_fact = execute(con, fallback.sql, fallback.params).fetchall()
+        february = con.execute("SELECT COUNT(*) FROM sales_fact WHERE date >= '2024-02-01' AND date < '2024-03-01'").fetchone()[0]
+        with pytest.raises(ValueError):
+            plan_query(con, ['profit'])
+
+    assert from_rollup and rounded(from_rollup) == rounded(from_fact)
+    assert sum(row[3] for row in from_rollup) == february
+
+
+def test_plans_are_exact_unless_asked_otherwise(db_path):
+    assert set(SALES_DAILY_ROLLUP.approximate) == {'customers', 'receipts'}
+    with duckdb.connect(db_path) as con:
+        exact = plan_query(con, ['customers', 'receipts'], ['country'])
+        estimate = plan_query(con, ['customers', 'receipts'], ['country'], exact=False)
+        assert (exact.source, estimate.source) == ('sales_data', 'sales_daily_rollup')
+        # Exact measures take the rollup either way
+        assert plan_query(con, ['revenue'], ['country']).source == 'sales_daily_rollup'
+        expected = execute(con, exact.sql, exact.params).fetchall()
+        estimated = execute(con, estimate.sql, estimate.params).fetchall()
+    assert [row[0] for row in estimated] == [row[0] for row in expected]
+    assert all(close_estimate(row[i], exact_row[i]) for row, exact_row in zip(estimated, expected) for i in (1, 2))
+
+
+def test_reports_match_on_every_source(db_path):
+    # Columns of each report holding a customer count estimate, and derived from one
+    estimated = {
+        'monthly_trends': ({2, 4}, {6}),
+        'customer_demographics': ({2}, {5}),
+        'hourly_distribution': ({3}, set()),
+        'geographic_distribution': ({2}, set()),
+        'income_levels': ({1}, {5}),
+    }
+    with duckdb.connect(db_path) as con:
+        routed = {}
+        for name in REPORTS:
+            plan = report_plan(con, name)
+            assert plan.source == 'sales_daily_rollup', name
+            routed[name] = execute(con, plan.sql, plan.params).fetchall()
+        drop_rollups(con)
+        for name in REPORTS:
+            plan = report_plan(con, name)
+            assert plan.source == 'sales_data'
+            exact = rounded(execute(con, plan.sql, plan.params).fetchall())
+            counts, derived = estimated.get(name, (set(), set()))
+            assert len(exact) == len(routed[name]) > 0, name
+            for row, exact_row in zip(rounded(routed[name]), exact):
+                for i, (value, exact_value) in enumerate(zip(row, exact_row)):
+                    if i in counts:
+                        assert value is None and exact_value is None or close_estimate(value, exact_value), name
+                    elif i not in derived:
+                        assert value == exact_value, name
+
+
+def test_reports_count_repeat_customers_once(repeat_db_path):
+    fact = """
+        FROM sales_fact f
+        LEFT JOIN dim_customer c ON c.customer_id = f.customer_id
+        LEFT JOIN dim_city ci ON ci.city_key = f.city_key
+    """
+    expected = {
+        'monthly_trends': f"SELECT DATE_TRUNC('month', f.date), COUNT(DISTINCT f.customer_id) {fact} GROUP BY 1",
+        'customer_demographics': f"""
+            SELECT {AGE_GROUP_SQL.format(age='c.age')}, c.gender, COUNT(DISTINCT f.customer_id) {fact} GROUP BY 1, 2
+        """,
+        'hourly_distribution': f"SELECT EXTRACT(hour FROM f.date), COUNT(DISTINCT f.customer_id) {fact} GROUP BY 1",
+        'geographic_distribution': f"SELECT ci.country, COUNT(DISTINCT f.customer_id) {fact} GROUP BY 1",
+        'income_levels': f"""
+            SELECT {INCOME_BAND_SQL.format(income_cents='c.income_cents')}, COUNT(DISTINCT f.customer_id) {fact} GROUP BY 1
+        """,
+    }
+    # Position of each report's key columns and its customer count
+    columns = {
+        'monthly_trends': ([0], 2),
+        'customer_demographics': ([0, 1], 2),
+        'hourly_distribution': ([0], 3),
+        'geographic_distribution': ([0], 2),
+        'income_levels': ([0], 1),
+    }
+    with duckdb.connect(repeat_db_path) as con:
+        assert con.execute("SELECT COUNT(DISTINCT EXTRACT(hour FROM date)) FROM sales_fact").fetchone()[0] == 24
+        for name, sql in expected.items():
+            plan = report_plan(con, name)
+            keys, count = columns[name]
+            routed = {tuple(row[k] for k in keys): row[count] for row in execute(con, plan.sql, plan.params).fetchall()}
+            direct = {tuple(row[:-1]): row[-1] for row in con.execute(sql).fetchall()}
+            assert plan.source == 'sales_daily_rollup', name
+            assert routed and all(close_estimate(routed[key], direct[key]) for key in routed), name
+            assert max(routed.values()) <= 51, name
+
+
+def test_analytics_query_endpoint(db_path, api_client):
+    client = api_client(db_path)
+    response = client.get('/analytics/query', params={
+        'measures': ['transactions', 'revenue'], 'group_by': ['gender'], 'grain': 'month', 'format': 'columns'
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body['source'] == 'sales_daily_rollup'
+    assert list(body['data']) == ['month', 'gender', 'transactions', 'revenue']
+    assert body['rows'] == len(body['data']['month']) > 0
+
+    exact = client.get('/analytics/query', params={'measures': 'customers', 'group_by': 'country'}).json()
+    assert exact['source'] == 'sales_data'
+    estimate = client.get('/analytics/query', params={'measures': 'customers', 'group_by': 'country', 'exact': False}).json()
+    assert estimate['source'] == 'sales_daily_rollup'
+    assert [row['country'] for row in estimate['data']] == [row['country'] for row in exact['data']]
+    assert client.get('/analytics/query', params={'measures': 'profit'}).status_code == 400
@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+from datetime import datetime
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import app as app_module
+from batch_generator import generate_batch
+from result_cache import ResultCache, cached_endpoint, file_version
+from storage import append_sales, ensure_schema
+
+
+def test_lru_evicts_by_size_and_disk_tier_survives(tmp_path):
+    cache = ResultCache(max_bytes=3000, disk_dir=str(tmp_path / 'cache'))
+    for i in range(5):
+        cache.put(('k', i), 'x' * 1000)
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['bytes'] <= 3000
+
+    # A fresh cache (e.g. after a restart) reads evicted entries back from disk
+    restarted = ResultCache(max_bytes=3000, disk_dir=str(tmp_path / 'cache'))
+    assert restarted.get(('k', 0)) == 'x' * 1000
+    assert restarted.stats()['disk_hits'] == 1
+    assert restarted.get(('k', 99)) is None
+
+
+def test_cached_endpoint_recomputes_after_a_write(tmp_path):
+    db_path = str(tmp_path / 'cache.db')
+    with duckdb.connect(db_path) as con:
+        ensure_schema(con)
+        append_sales(con, generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 5)))
+
+    calls = []
+    cache = ResultCache()
+
+    @cached_endpoint(cache, 'count', lambda: file_version(db_path))
+    def count():
+        calls.append(1)
+        with duckdb.connect(db_path, read_only=True) as con:
+            return con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0]
+
+    first = count()
+    assert count() == first and len(calls) == 1
+
+    with duckdb.connect(db_path) as con:
+        append_sales(con, generate_batch(datetime(2024, 2, 1), datetime(2024, 2, 5)))
+    assert count() > first and len(calls) == 2
+
+
+def test_api_cache_hits_keep_a_released_pool_closed(tmp_path, monkeypatch, api_client):
+    db_path = str(tmp_path / 'api.db')
+    with duckdb.connect(db_path) as con:
+        ensure_schema(con)
+        append_sales(con, generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 5)))
+    monkeypatch.setattr(app_module, 'result_cache', ResultCache())
+    client = api_client(db_path, release_after=0.05)
+    first = client.get('/summary/').json()['total_records']
+    time.sleep(0.3)
+    assert not app_module.db_pool.stats()['open']
+    assert client.get('/summary/').json()['total_records'] == first
+    assert not app_module.db_pool.stats()['open']
+    with duckdb.connect(db_path) as con:
+        append_sales(con, generate_batch(datetime(2024, 2, 1), datetime(2024, 2, 5)))
+    assert client.get('/summary/').json()['total_records'] > first
@@ -0,0 +1,101 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import main
+import storage
+from batch_generator import generate_batch
+from memory_governor import MemoryGovernor
+from writer_service import WriterClient
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    """Cap chunks at 20 days so every run commits several of them"""
+    monkeypatch.setattr(main, 'MemoryGovernor', lambda budget_mb, in_flight=1: MemoryGovernor(budget_mb, in_flight, max_days=20))
+
+
+def manifest_days(db_path):
+    with duckdb.connect(db_path, read_only=True) as con:
+        return con.execute("SELECT SUM(DATE_DIFF('day', start_date, end_date) + 1) FROM generation_manifest").fetchone()[0]
+
+
+def fact_rows(db_path):
+    with duckdb.connect(db_path, read_only=True) as con:
+        return con.execute("SELECT COUNT(*), COUNT(DISTINCT transaction_id) FROM sales_fact").fetchone()
+
+
+def test_rerun_skips_completed_chunks(tmp_path):
+    ranges = main.split_datetime_range(datetime(2024, 1, 1), datetime(2024, 6, 30))
+    full_db = str(tmp_path / 'full.db')
+    main.generate_initial_data1(ranges, is_initial_generation=False, db_path=full_db)
+
+    db_path = str(tmp_path / 'resumed.db')
+    main.generate_initial_data1(ranges[:3], is_initial_generation=False, db_path=db_path)
+    main.generate_initial_data1(ranges, is_initial_generation=False, db_path=db_path)
+    main.generate_initial_data1(ranges, is_initial_generation=False, db_path=db_path)
+
+    assert fact_rows(db_path) == fact_rows(full_db)
+    assert manifest_days(db_path) == 182
+
+
+def test_resume_with_different_chunking(tmp_path, monkeypatch):
+    full_db = str(tmp_path / 'full.db')
+    main.generate_initial_data1([(datetime(2024, 1, 1), datetime(2024, 6, 30))], is_initial_generation=False, db_path=full_db)
+
+    db_path = str(tmp_path / 'resumed.db')
+    main.generate_initial_data1([(datetime(2024, 2, 10), datetime(2024, 3, 5))], is_initial_generation=False, db_path=db_path)
+    monkeypatch.setattr(main, 'MemoryGovernor', lambda budget_mb, in_flight=1: MemoryGovernor(budget_mb, in_flight, max_days=7))
+    main.generate_initial_data1(main.split_datetime_range(datetime(2024, 1, 1), datetime(2024, 6, 30)),
+                                is_initial_generation=False, db_path=db_path)
+
+    assert fact_rows(db_path) == fact_rows(full_db)
+    assert manifest_days(db_path) == 182
+
+
+def test_failed_chunk_is_rolled_back(tmp_path, monkeypatch):
+    con = duckdb.connect(str(tmp_path / 'rollback.db'))
+    storage.ensure_schema(con)
+    original = storage.append_sales
+
+    def failing_append(con, source, upsert=False):
+        # Write part of the chunk, then die before the commit
+        con.execute("INSERT INTO sales_fact (transaction_id) VALUES (-1)")
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(storage, 'append_sales', failing_append)
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 5))
+    with pytest.raises(RuntimeError):
+        storage.append_chunk(con, batch, datetime(2024, 1, 1), datetime(2024, 1, 5), 42)
+    monkeypatch.setattr(storage, 'append_sales', original)
+    assert con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0] == 0
+    assert con.execute("SELECT COUNT(*) FROM generation_manifest").fetchone()[0] == 0
+
+
+def test_interrupted_generation_resumes(tmp_path, monkeypatch):
+    ranges = main.split_datetime_range(datetime(2024, 1, 1), datetime(2024, 3, 31))
+    db_path = str(tmp_path / 'sales.db')
+    original = WriterClient.append_chunk
+    calls = []
+
+    def failing_append(self, batch, start_date, end_date, seed):
+        calls.append(start_date)
+        if len(calls) == 3:
+            raise RuntimeError("interrupted")
+        return original(self, batch, start_date, end_date, seed)
+
+    monkeypatch.setattr(WriterClient, 'append_chunk', failing_append)
+    with pytest.raises(RuntimeError):
+        main.generate_initial_data1(ranges, is_initial_generation=False, db_path=db_path)
+    monkeypatch.setattr(WriterClient, 'append_chunk', original)
+    assert manifest_days(db_path) < 91
+
+    main.generate_initial_data1(ranges, is_initial_generation=False, db_path=db_path)
+    rows, distinct = fact_rows(db_path)
+    assert rows == distinct
+    assert manifest_days(db_path) == 91
@@ -0,0 +1,77 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_generator import generate_batch
+from query_router import report_plan
+from rollups import rebuild_rollups
+from sql_filters import execute
+from storage import append_sales, ensure_schema
+
+
+def rollup_rows(con):
+    return con.execute("SELECT * FROM sales_daily_rollup ORDER BY ALL").fetchall()
+
+
+def test_rollup_follows_appends():
+    con = duckdb.connect()
+    ensure_schema(con)
+    first = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 10))
+    append_sales(con, first)
+    # Overlapping days are recomputed, a reload is a no-op
+    append_sales(con, generate_batch(datetime(2024, 1, 5), datetime(2024, 1, 15)))
+    append_sales(con, first, upsert=True)
+    incremental = rollup_rows(con)
+    rebuild_rollups(con)
+    assert incremental == rollup_rows(con)
+    assert con.execute("SELECT SUM(transactions) FROM sales_daily_rollup").fetchone()[0] == \
+        con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0]
+
+
+def run_report(con, name):
+    plan = report_plan(con, name)
+    return execute(con, plan.sql, plan.params).fetchall()
+
+
+def test_reports_match_fact_queries():
+    con = duckdb.connect()
+    ensure_schema(con)
+    append_sales(con, generate_batch(datetime(2023, 11, 1), datetime(2024, 2, 1)))
+    monthly = run_report(con, 'monthly_trends')
+    expected = con.execute("""
+        SELECT DATE_TRUNC('month', date), SUM(total_amount_cents) / 100.0, COUNT(DISTINCT customer_id)
+        FROM sales_fact GROUP BY 1 ORDER BY 1
+    """).fetchall()
+    assert [row[:2] for row in monthly] == [row[:2] for row in expected]
+    # Customer counts are merged HyperLogLog estimates
+    assert all(abs(row[2] - exact[2]) <= 0.02 * exact[2] for row, exact in zip(monthly, expected))
+
+    products = run_report(con, 'top_products')
+    expected = con.execute("""
+        SELECT p.product_id, p.product_name, COUNT(*), SUM(units_sold), SUM(total_amount_cents) / 100.0
+        FROM sales_fact f JOIN dim_product p USING (product_key)
+        GROUP BY ALL ORDER BY 5 DESC LIMIT 20
+    """).fetchall()
+    assert [row[:5] for row in products] == expected
+
+
+def test_customer_counts_merge_across_rollup_rows():
+    con = duckdb.connect()
+    ensure_schema(con)
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 3, 31))
+    # 50 customers buying again and again, in many hours, cities and products
+    batch['customer_id'] = batch['customer_id'].iloc[:50].values.repeat(len(batch) // 50 + 1)[:len(batch)]
+    append_sales(con, batch)
+
+    monthly = run_report(con, 'monthly_trends')
+    expected = con.execute("""
+        SELECT DATE_TRUNC('month', date), COUNT(DISTINCT customer_id) FROM sales_fact GROUP BY 1 ORDER BY 1
+    """).fetchall()
+    # A customer buying in many rows of a month counts once
+    assert [(row[0], row[2]) for row in monthly] == expected
+    # Every customer has one age and gender, so the groups split the 50 customers
+    assert sum(row[2] for row in run_report(con, 'customer_demographics')) == 50
@@ -0,0 +1,45 @@
+import gzip
+import io
+import json
+import os
+import sys
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from exports import arrow_available
+
+
+def test_export_formats_return_all_matching_rows(client, tmp_path):
+    test_client, batch = client
+    expected = batch[batch['age'] >= 40]
+    params = {'min_age': 40}
+
+    response = test_client.get('/sales/export', params={**params, 'format': 'ndjson'})
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == len(expected)
+    assert sorted(row['transaction_id'] for row in rows) == sorted(expected['transaction_id'])
+
+    response = test_client.get('/sales/export', params={**params, 'format': 'csv'})
+    assert 'sales.csv.gz' in response.headers['content-disposition']
+    frame = pd.read_csv(io.BytesIO(gzip.decompress(response.content)))
+    assert len(frame) == len(expected) and 'receipt_total_sgd' in frame.columns
+
+    response = test_client.get('/sales/export', params={**params, 'format': 'parquet'})
+    path = tmp_path / 'out.parquet'
+    path.write_bytes(response.content)
+    assert duckdb.sql(f"SELECT COUNT(*) FROM read_parquet('{path}')").fetchone()[0] == len(expected)
+
+
+def test_export_rejects_unknown_format_and_reports_missing_arrow(client):
+    test_client, batch = client
+    assert test_client.get('/sales/export', params={'format': 'xml'}).status_code == 422
+    response = test_client.get('/sales/export', params={'format': 'arrow'})
+    if arrow_available():
+        import pyarrow as pa
+        assert pa.ipc.open_stream(response.content).read_all().num_rows == len(batch)
+    else:
+        assert response.status_code == 501
@@ -0,0 +1,104 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_generator import generate_batch
+from storage import append_sales, ensure_schema
+
+
+def test_keyset_pages_cover_all_rows_in_order(client):
+    test_client, batch = client
+    seen, cursor = [], None
+    while True:
+        params = {'page_size': 100}
+        if cursor:
+            params['cursor'] = cursor
+        body = test_client.get('/sales/', params=params).json()
+        assert body['total_records'] is None
+        seen += [(sale['date'], int(sale['transaction_id'])) for sale in body['sales']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == len(batch)
+    assert seen == sorted(seen, reverse=True)
+
+    # The first keyset page after page 1 is the same as OFFSET page 2
+    first = test_client.get('/sales/', params={'page_size': 100}).json()
+    by_cursor = test_client.get('/sales/', params={'page_size': 100, 'cursor': first['next_cursor']}).json()
+    by_offset = test_client.get('/sales/', params={'page_size': 100, 'page': 2}).json()
+    assert by_cursor['sales'] == by_offset['sales']
+
+
+def test_include_total_and_bad_cursor(client):
+    test_client, batch = client
+    assert test_client.get('/sales/', params={'include_total': True}).json()['total_records'] == len(batch)
+    filtered = test_client.get('/sales/', params={'include_total': True, 'min_age': 60}).json()
+    assert filtered['total_records'] == int((batch['age'] >= 60).sum())
+    product_id = int(batch['product_id'].iloc[0])
+    by_product = test_client.get('/sales/', params={'include_total': True, 'product_id': product_id}).json()
+    assert by_product['total_records'] == int((batch['product_id'] == product_id).sum())
+    assert {int(sale['product_id']) for sale in by_product['sales']} == {product_id}
+    assert test_client.get('/sales/', params={'cursor': 'not-a-cursor'}).status_code == 400
+
+
+def test_columns_layout_matches_rows(client):
+    test_client, _ = client
+    rows = test_client.get('/sales/', params={'page_size': 20}).json()
+    columns = test_client.get('/sales/', params={'page_size': 20, 'format': 'columns'}).json()
+    assert columns['next_cursor'] == rows['next_cursor']
+    assert [dict(zip(columns['sales'], values)) for values in zip(*columns['sales'].values())] == rows['sales']
+    assert isinstance(rows['sales'][0]['transaction_id'], str)
+    assert isinstance(rows['sales'][0]['unit_price_sgd'], float)
+
+    customers = test_client.get('/customers/summary/', params={'format': 'columns'}).json()
+    assert set(customers) == {'customer_id', 'age', 'country', 'total_sales', 'total_amount'}
+    assert len(customers['customer_id']) == len(test_client.get('/customers/summary/').json())
+
+
+def test_rows_without_a_date_are_paged_and_counted(tmp_path, api_client):
+    db_path = str(tmp_path / 'nulls.db')
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 3))
+    batch['date'] = batch['date'].astype(object)
+    batch.loc[batch.index[::7], 'date'] = None
+    with duckdb.connect(db_path) as con:
+        ensure_schema(con)
+        append_sales(con, batch)
+        assert con.execute("SELECT COUNT(*) FROM sales_fact WHERE date IS NULL").fetchone()[0] > 5
+    test_client = api_client(db_path)
+    seen, params = [], {'page_size': 5, 'include_total': True}
+    while True:
+        body = test_client.get('/sales/', params=params).json()
+        seen += [sale['transaction_id'] for sale in body['sales']]
+        if body['next_cursor'] is None:
+            break
+        params['cursor'] = body['next_cursor']
+    assert len(seen) == len(set(seen)) == body['total_records'] == len(batch)
+
+
+def test_rows_without_a_transaction_id_are_paged(tmp_path, api_client):
+    db_path = str(tmp_path / 'null_ids.db')
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 3))
+    batch['transaction_id'] = batch['transaction_id'].astype(object)
+    batch.loc[batch.index[::3], 'transaction_id'] = None
+    batch['date'] = batch['date'].astype(object)
+    batch.loc[batch.index[::5], 'date'] = None
+    with duckdb.connect(db_path) as con:
+        ensure_schema(con)
+        append_sales(con, batch)
+        assert con.execute("SELECT COUNT(*) FROM sales_fact WHERE transaction_id IS NULL").fetchone()[0] > 5
+    test_client = api_client(db_path)
+    seen, params = [], {'page_size': 4, 'include_total': True}
+    while True:
+        body = test_client.get('/sales/', params=params).json()
+        seen += [(sale['date'], sale['transaction_id'], sale['receipt_number']) for sale in body['sales']]
+        if body['next_cursor'] is None:
+            break
+        params['cursor'] = body['next_cursor']
+    assert len(seen) == len(set(seen)) == body['total_records'] == len(batch)
+    # NULL ids come after the other rows of their date
+    for (date, transaction_id, _), (next_date, next_id, _) in zip(seen, seen[1:]):
+        assert date != next_date or transaction_id is not None or next_id is None
@@ -0,0 +1,43 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from batch_generator import generate_batch
+from sql_filters import SALES_DATA_FILTERS, SALES_FACT_FILTERS, compile_filters, execute, parse_cache
+from storage import append_sales, ensure_schema
+
+
+def test_compiled_filters_bind_values_and_match_pandas():
+    con = duckdb.connect()
+    ensure_schema(con)
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 20))
+    append_sales(con, batch)
+
+    values = {'min_age': 30, 'max_age': 50, 'start_date': '2024-01-05'}
+    expected = int(((batch['age'] >= 30) & (batch['age'] <= 50) & (batch['date'] >= '2024-01-05')).sum())
+    for filters, table in ((SALES_DATA_FILTERS, 'sales_data'), (SALES_FACT_FILTERS, 'sales_fact')):
+        where, params = compile_filters(filters, values)
+        assert '30' not in where and params.count(30) == 1
+        assert execute(con, f"SELECT COUNT(*) FROM {table}{where}", params).fetchone()[0] == expected
+
+    # Values are data, not SQL
+    where, params = compile_filters(SALES_DATA_FILTERS, {'country': "x' OR '1'='1"})
+    assert execute(con, f"SELECT COUNT(*) FROM sales_data{where}", params).fetchone()[0] == 0
+
+
+def test_statements_are_parsed_once_per_connection():
+    con = duckdb.connect()
+    cache = parse_cache(con)
+    for value in range(5):
+        assert execute(con, "SELECT ? + 1", [value]).fetchone()[0] == value + 1
+    assert (cache.misses, cache.hits) == (1, 4)
+    assert parse_cache(con.cursor()) is not cache
+
+    cache.max_size = 2
+    for i in range(3):
+        execute(con, f"SELECT {i}")
+    assert len(cache._statements) == 2
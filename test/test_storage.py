@@ -0,0 +1,148 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage
+from batch_generator import SALES_COLUMNS, PRODUCTS, generate_batch
+from storage import SCHEMA_VERSION, append_group_rows, append_sales, convert_wide_table, drop_schema, ensure_schema, get_schema_version, migrate_schema, object_type
+
+
+def test_append_round_trips_through_view():
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 2, 29))
+    con = duckdb.connect()
+    ensure_schema(con)
+    assert append_sales(con, batch) == len(batch)
+
+    assert [row[0] for row in con.execute("DESCRIBE sales_data").fetchall()] == SALES_COLUMNS
+    assert con.execute("SELECT COUNT(*) FROM sales_fact WHERE product_key IS NULL OR city_key IS NULL").fetchone()[0] == 0
+    view = con.execute("SELECT product_id, product_name, city FROM sales_data ORDER BY transaction_id").df()
+    expected = batch.sort_values('transaction_id')
+    assert list(view['product_id']) == list(expected['product_id'])
+    assert list(view['product_name']) == list(expected['product_name'].astype(str))
+    assert list(view['city']) == list(expected['city'].astype(str))
+    assert set(expected['product_id']) <= {p['product_id'] for p in PRODUCTS}
+
+
+def test_dimensions_are_not_duplicated():
+    con = duckdb.connect()
+    ensure_schema(con)
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 31))
+    append_sales(con, batch)
+    append_sales(con, batch)
+    cities = con.execute("SELECT COUNT(*) FROM dim_city").fetchone()[0]
+    assert con.execute("SELECT COUNT(*) FROM dim_customer").fetchone()[0] == batch['customer_id'].nunique()
+    assert con.execute("SELECT COUNT(*) FROM dim_product").fetchone()[0] == batch['product_name'].nunique()
+    assert con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0] == 2 * len(batch)
+    ensure_schema(con)
+    assert con.execute("SELECT COUNT(*) FROM dim_city").fetchone()[0] == cities
+
+
+def test_wide_table_is_converted():
+    con = duckdb.connect()
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 10))
+    con.execute("CREATE TABLE sales_data AS SELECT * FROM batch")
+    ensure_schema(con)
+    assert object_type(con, 'sales_data') == 'VIEW'
+    assert con.execute("SELECT COUNT(*) FROM sales_data").fetchone()[0] == len(batch)
+    drop_schema(con)
+    assert object_type(con, 'sales_data') is None
+
+
+def test_wide_table_conversion_resumes(monkeypatch):
+    con = duckdb.connect()
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 20))
+    con.execute("CREATE TABLE sales_data AS SELECT * FROM batch")
+    calls = []
+
+    def failing_append(con, source, upsert=False):
+        calls.append(source)
+        if len(calls) == 3:
+            raise RuntimeError("interrupted")
+        return append_sales(con, source, upsert)
+
+    monkeypatch.setattr(storage, 'append_sales', failing_append)
+    with pytest.raises(RuntimeError):
+        convert_wide_table(con, batch_rows=250)
+    con.execute("ROLLBACK")
+    # Two batches were committed; the conversion goes on from the third
+    assert get_schema_version(con) == 0
+    assert con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0] == 500
+    monkeypatch.undo()
+    ensure_schema(con)
+    assert get_schema_version(con) == SCHEMA_VERSION
+    assert object_type(con, 'sales_data_wide') is None and object_type(con, 'schema_migration') is None
+    assert con.execute("SELECT COUNT(*), COUNT(DISTINCT transaction_id) FROM sales_data").fetchone() == (len(batch), len(batch))
+
+
+def test_upserted_chunk_manifest_counts_added_rows():
+    con = duckdb.connect()
+    ensure_schema(con)
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 10))
+    append_sales(con, batch.head(100))
+    manifest = (datetime(2024, 1, 1), datetime(2024, 1, 10), 7)
+    assert append_group_rows(con, [(batch, manifest)], upsert=True) == [len(batch) - 100]
+    assert con.execute("SELECT row_count FROM generation_manifest").fetchall() == [(len(batch) - 100,)]
+
+
+def test_types_and_cents():
+    con = duckdb.connect()
+    ensure_schema(con)
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 5))
+    append_sales(con, batch)
+    types = dict(con.execute("SELECT column_name, data_type FROM information_schema.columns WHERE table_name = 'sales_fact'").fetchall())
+    assert types['transaction_id'] == 'BIGINT'
+    assert types['total_amount_cents'] == 'BIGINT'
+    assert types['transaction_desc'].startswith('ENUM')
+    total = con.execute("SELECT SUM(total_amount_cents) FROM sales_fact").fetchone()[0]
+    assert total == round(batch['total_amount_per_product_sgd'].sum() * 100)
+    assert get_schema_version(con) == SCHEMA_VERSION
+
+
+def test_migrate_v1_in_batches():
+    con = duckdb.connect()
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 20))
+    # Version 1 layout: VARCHAR ids and DECIMAL amounts
+    con.execute("CREATE TABLE dim_product AS SELECT ROW_NUMBER() OVER () :: INTEGER AS product_key, product_id::VARCHAR AS product_id, product_name FROM (SELECT DISTINCT product_id, product_name::VARCHAR AS product_name FROM batch)")
+    con.execute("CREATE TABLE dim_city AS SELECT ROW_NUMBER() OVER () :: INTEGER AS city_key, city, country_id, country FROM (SELECT DISTINCT city::VARCHAR AS city, country_id::VARCHAR AS country_id, country::VARCHAR AS country FROM batch)")
+    con.execute("CREATE TABLE dim_customer AS SELECT customer_id::VARCHAR AS customer_id, age, gender::VARCHAR AS gender, income::DECIMAL(10,2) AS income FROM batch")
+    con.execute("""
+        CREATE TABLE sales_fact AS
+        SELECT b.date, b.transaction_id::VARCHAR AS transaction_id, b.transaction_desc::VARCHAR AS transaction_desc,
+               b.customer_id::VARCHAR AS customer_id, b.receipt_number::VARCHAR AS receipt_number, p.product_key, c.city_key,
+               b.units_sold, b.unit_price_sgd::DECIMAL(10,2) AS unit_price_sgd,
+               b.total_amount_per_product_sgd::DECIMAL(10,2) AS total_amount_per_product_sgd,
+               b.receipt_total_sgd::DECIMAL(10,2) AS receipt_total_sgd
+        FROM batch b
+        JOIN dim_product p ON p.product_name = b.product_name::VARCHAR
+        JOIN dim_city c ON c.city = b.city::VARCHAR
+    """)
+    assert get_schema_version(con) == 1
+
+    assert migrate_schema(con, batch_rows=250) == len(batch)
+    assert get_schema_version(con) == SCHEMA_VERSION
+    assert object_type(con, 'sales_fact_v1') is None
+    assert con.execute("SELECT COUNT(*) FROM sales_data").fetchone()[0] == len(batch)
+    assert con.execute("SELECT SUM(total_amount_per_product_sgd) FROM sales_data").fetchone()[0] == round(batch['total_amount_per_product_sgd'].sum(), 2)
+
+
+def test_save_to_duckdb_streams_file_with_missing_columns(tmp_path):
+    import main
+
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 10))
+    csv_path = str(tmp_path / 'sales.csv')
+    batch.drop(columns=['income']).to_csv(csv_path, index=False)
+    db_path = str(tmp_path / 'saved.db')
+    main.save_to_duckdb(csv_path, db_path=db_path)
+
+    with duckdb.connect(db_path, read_only=True) as con:
+        count, income, amount = con.execute(
+            "SELECT COUNT(*), SUM(income), SUM(total_amount_per_product_sgd) FROM sales_data"
+        ).fetchone()
+        assert count == len(batch)
+        assert income == 0 and amount == 0
+        assert con.execute("SELECT COUNT(DISTINCT customer_id) FROM sales_data").fetchone()[0] == batch['customer_id'].nunique()
@@ -0,0 +1,65 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import hll
+from batch_generator import generate_batch
+from storage import append_sales, ensure_schema, read_table_stats, rebuild_table_stats
+
+
+def test_hll_estimate_is_close():
+    con = duckdb.connect()
+    hashes = con.execute("SELECT hash(range) AS h FROM range(200000)").fetchnumpy()['h']
+    sketch = hll.add_hashes(hll.empty_sketch(), hashes)
+    assert abs(hll.estimate(sketch) - 200_000) / 200_000 < 0.03
+    # Adding the same values again, or merging with itself, changes nothing
+    assert hll.estimate(hll.add_hashes(sketch.copy(), hashes)) == hll.estimate(sketch)
+    assert hll.estimate(hll.merge(sketch, sketch)) == hll.estimate(sketch)
+    assert hll.estimate(hll.from_bytes(hll.to_bytes(sketch))) == hll.estimate(sketch)
+    assert hll.estimate(hll.empty_sketch()) == 0
+
+
+def test_sql_registers_match_numpy_sketch():
+    con = duckdb.connect()
+    con.execute("CREATE TABLE ids AS SELECT CASE WHEN range % 97 = 0 THEN NULL ELSE range % 50000 END AS id FROM range(200000)")
+    hashes = con.execute("SELECT hash(id) AS h FROM ids WHERE id IS NOT NULL").fetchnumpy()['h']
+    from_sql = hll.from_registers(con.execute(hll.registers_sql('id', 'ids')).fetchnumpy())
+    assert (from_sql == hll.add_hashes(hll.empty_sketch(), hashes)).all()
+    assert len(con.execute(hll.registers_sql('id', 'ids')).fetchall()) <= hll.HLL_REGISTERS
+
+
+def test_summary_labels_estimates(client):
+    test_client, batch = client
+    summary = test_client.get('/summary/').json()
+    assert summary['total_records'] == len(batch)
+    assert summary['approximate'] == ['unique_customers', 'unique_receipts']
+
+
+def test_stats_follow_appends():
+    con = duckdb.connect()
+    ensure_schema(con)
+    assert read_table_stats(con)['row_count'] == 0
+    append_sales(con, generate_batch(datetime(2024, 1, 1), datetime(2024, 3, 31)))
+    append_sales(con, generate_batch(datetime(2024, 3, 1), datetime(2024, 6, 30)))
+
+    stats = read_table_stats(con)
+    exact = con.execute("""
+        SELECT COUNT(*), SUM(total_amount_cents), MIN(date), MAX(date),
+               COUNT(DISTINCT customer_id), COUNT(DISTINCT receipt_number),
+               COUNT(*) FILTER (WHERE transaction_desc = 'Product Sale')
+        FROM sales_fact
+    """).fetchone()
+    assert (stats['row_count'], stats['revenue_cents'], stats['min_date'], stats['max_date']) == exact[:4]
+    assert stats['sale_count'] == exact[6]
+    # March was appended twice: the sketches count its customers once
+    assert abs(stats['unique_customers'] - exact[4]) / exact[4] < 0.03
+    assert abs(stats['unique_receipts'] - exact[5]) / exact[5] < 0.03
+
+    rebuild_table_stats(con)
+    rebuilt = read_table_stats(con)
+    for key in ('row_count', 'revenue_cents', 'unique_customers', 'unique_receipts', 'sale_days'):
+        assert rebuilt[key] == stats[key]
@@ -0,0 +1,67 @@
+import os
+import sys
+from datetime import datetime
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import main
+import timeseries
+from batch_generator import generate_batch
+from storage import read_table_stats, upsert_rows
+from writer_service import WriterService
+
+
+def test_saving_same_chunk_twice_does_not_duplicate(tmp_path):
+    db_path = str(tmp_path / 'upsert.db')
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 10))
+    main.save_to_duckdb_table(batch, db_path=db_path)
+    # Second load repeats the whole chunk plus a duplicated row inside the batch
+    main.save_to_duckdb_table(pd.concat([batch, batch.head(1)], ignore_index=True), db_path=db_path)
+
+    with duckdb.connect(db_path, read_only=True) as con:
+        assert con.execute("SELECT COUNT(*), COUNT(DISTINCT transaction_id) FROM sales_fact").fetchone() == (len(batch), len(batch))
+        assert read_table_stats(con)['row_count'] == len(batch)
+        assert con.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE table_name = 'upsert_staging'").fetchone()[0] == 0
+
+
+def test_writer_upserts_do_not_duplicate(tmp_path):
+    db_path = str(tmp_path / 'writer.db')
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 5))
+    with WriterService(db_path) as writer:
+        client = writer.client()
+        client.append(batch, upsert=True)
+        client.append(batch, upsert=True)
+        client.close()
+    with duckdb.connect(db_path, read_only=True) as con:
+        assert con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0] == len(batch)
+
+
+def test_upsert_rows_creates_skips_and_replaces():
+    con = duckdb.connect()
+    first = pd.DataFrame({'transaction_id': [1, 2, 2, 3], 'amount': [10, 20, 20, 30]})
+    assert upsert_rows(con, 'analyzed', first) == (3, 1)
+    second = pd.DataFrame({'transaction_id': [3, 4], 'amount': [33, 40]})
+    assert upsert_rows(con, 'analyzed', second) == (1, 1)
+    assert con.execute("SELECT amount FROM analyzed WHERE transaction_id = 3").fetchone()[0] == 30
+
+    assert upsert_rows(con, 'analyzed', second, update_existing=True) == (2, 0)
+    assert con.execute("SELECT transaction_id, amount FROM analyzed ORDER BY 1").fetchall() == [
+        (1, 10), (2, 20), (3, 33), (4, 40)]
+
+
+def test_create_duckdb_table_replaces_unless_upserting(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    source = duckdb.connect()
+    source.execute("CREATE TABLE csv_data AS SELECT * FROM (VALUES (1, 'a'), (2, 'b')) t(transaction_id, value)")
+    timeseries.create_duckdb_table(source)
+    source.execute("CREATE OR REPLACE TABLE csv_data AS SELECT * FROM (VALUES (2, 'b'), (3, 'c')) t(transaction_id, value)")
+    timeseries.create_duckdb_table(source)
+    with duckdb.connect('transformed_data.db', read_only=True) as con:
+        assert con.execute("SELECT transaction_id FROM all_data ORDER BY 1").fetchall() == [(2,), (3,)]
+    source.execute("CREATE OR REPLACE TABLE csv_data AS SELECT * FROM (VALUES (3, 'c'), (4, 'd')) t(transaction_id, value)")
+    timeseries.create_duckdb_table(source, upsert=True)
+    with duckdb.connect('transformed_data.db', read_only=True) as con:
+        assert con.execute("SELECT transaction_id FROM all_data ORDER BY 1").fetchall() == [(2,), (3,), (4,)]
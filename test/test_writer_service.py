@@ -0,0 +1,114 @@
+import os
+import signal
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import multiprocessing
+
+import duckdb
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import main
+from batch_generator import generate_batch
+import writer_service
+from writer_service import WriterService, get_writer, running_writer, stop_writers, writer_key_path
+
+
+def produce(task):
+    """Producer process: append one month per batch through the writer"""
+    client, producer, batches = task
+    rows = 0
+    for i in range(batches):
+        start = datetime(2000 + producer, 1, 1) + timedelta(days=31 * i)
+        rows += client.append(generate_batch(start, start + timedelta(days=30)))
+    client.close()
+    return rows
+
+
+def test_concurrent_producers_are_group_committed(tmp_path):
+    db_path = str(tmp_path / 'writer.db')
+    with WriterService(db_path, group_wait_ms=50) as writer:
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=4, mp_context=ctx) as executor:
+            sent = sum(executor.map(produce, [(writer.client(), producer, 3) for producer in range(4)]))
+        stats = writer.stop()
+
+    assert stats['appends'] == 12 and stats['rows'] == sent and stats['errors'] == 0
+    assert stats['groups'] <= stats['appends']
+    with duckdb.connect(db_path, read_only=True) as con:
+        assert con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0] == sent
+        assert con.execute("SELECT COUNT(DISTINCT transaction_id) FROM sales_fact").fetchone()[0] == sent
+
+
+def test_bad_batch_fails_alone_and_manifest_commits(tmp_path):
+    db_path = str(tmp_path / 'writer.db')
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 31))
+    with WriterService(db_path) as writer:
+        client = writer.client()
+        assert client.append_chunk(batch, datetime(2024, 1, 1), datetime(2024, 1, 31), 142) == len(batch)
+        try:
+            client.append(pd.DataFrame({'unexpected': [1]}))
+            assert False, "append of a malformed batch should fail"
+        except RuntimeError:
+            pass
+        client.close()
+
+    with duckdb.connect(db_path, read_only=True) as con:
+        assert con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0] == len(batch)
+        assert con.execute("SELECT row_count FROM generation_manifest").fetchall() == [(len(batch),)]
+
+
+def test_save_to_duckdb_table_uses_shared_writer(tmp_path):
+    db_path = str(tmp_path / 'shared.db')
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 10))
+    get_writer(db_path)
+    main.save_to_duckdb_table(batch, db_path=db_path)
+    client = running_writer(db_path)
+    assert client.stats()['rows'] == len(batch)
+    client.close()
+    stop_writers()
+    assert running_writer(db_path) is None and not os.path.exists(writer_key_path(db_path))
+    # Without a writer the chunk is saved on a direct connection
+    main.save_to_duckdb_table(generate_batch(datetime(2024, 2, 1), datetime(2024, 2, 5)), db_path=db_path)
+    assert running_writer(db_path) is None
+    with duckdb.connect(db_path, read_only=True) as con:
+        assert con.execute("SELECT COUNT(*) FROM sales_fact WHERE date < '2024-02-01'").fetchone()[0] == len(batch)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="stops the writer with SIGINT")
+def test_writer_in_another_process_is_found(tmp_path):
+    db_path = str(tmp_path / 'served.db')
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 10))
+    server = subprocess.Popen([sys.executable, writer_service.__file__, db_path], stdout=subprocess.PIPE, text=True)
+    try:
+        assert 'listening' in server.stdout.readline()
+        main.save_to_duckdb_table(batch, db_path=db_path)
+        client = running_writer(db_path)
+        assert client.stats()['rows'] == len(batch)
+        client.close()
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait(timeout=60)
+    assert running_writer(db_path) is None
+    with duckdb.connect(db_path, read_only=True) as con:
+        assert con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0] == len(batch)
+
+
+def test_upserts_count_the_rows_they_add(tmp_path):
+    db_path = str(tmp_path / 'upsert.db')
+    batch = generate_batch(datetime(2024, 1, 1), datetime(2024, 1, 10))
+    with WriterService(db_path) as writer:
+        client = writer.client()
+        assert client.append(batch, upsert=True) == len(batch)
+        assert client.append(pd.concat([batch.head(5), generate_batch(datetime(2024, 2, 1), datetime(2024, 2, 1))]), upsert=True) \
+            == client.stats()['rows'] - len(batch)
+        assert client.append(batch, upsert=True) == 0
+        assert client.completed_chunks(42) == set()
+        client.close()
+        stats = writer.stop()
+    with duckdb.connect(db_path, read_only=True) as con:
+        assert con.execute("SELECT COUNT(*) FROM sales_fact").fetchone()[0] == stats['rows']